@@ -0,0 +1,3 @@
+#!/bin/bash -ex
+moon fmt && moon info --target native
+moon build --target native --release
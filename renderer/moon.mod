@@ -0,0 +1,27 @@
+name = "gmlewis/fonts/renderer"
+
+version = "0.1.0"
+
+import {
+  "gmlewis/base64@0.16.10",
+  "gmlewis/flate@0.36.8",
+  "gmlewis/fonts@0.19.13",
+  "gmlewis/fonts/loader@0.19.6",
+  "gmlewis/gzip@0.34.8",
+  "gmlewis/io@0.23.11",
+  "moonbitlang/async@0.19.1",
+  "moonbitlang/regexp@0.3.5",
+  "moonbitlang/x@0.4.45",
+}
+
+readme = "README.md"
+
+repository = "https://github.com/gmlewis/moonbit-fonts"
+
+license = "Apache-2.0"
+
+keywords = [ "html5 canvas", "pdf", "svg", "open source", "fonts" ]
+
+preferred_target = "native"
+
+description = "Precompiled, data-driven text renderer used by the scripts/ tools."
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Benchmarks font loading, path generation and rendering across all fonts.
+
+Runs the `bench/` binary (built on demand, like the renderer) over the fonts
+of all-fonts.txt in batches, collects its per-font measurements into a JSON
+report and, with `--baseline`, compares the report against a saved one and
+exits with status 1 if a metric regressed by more than `--threshold` percent.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import statistics
+import sys
+
+from framing import MemorySink
+from jobrunner import JobRunner, JobTimeout, add_runner_arguments, run_main, runner_options
+from renderer import SOURCE_DIRS, RendererError, ensure_binary
+
+BENCH_DIR = "bench"
+BENCH_SOURCE_DIRS = [d for d in SOURCE_DIRS if d != "renderer"] + [BENCH_DIR]
+REPORT_VERSION = 1
+DEFAULT_OUTPUT = "bench-report.json"
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_THRESHOLD = 10.0
+CORPORA = ["pangram", "ascii", "lorem", "glyphs"]
+
+def get_font_names():
+    """Reads all-fonts.txt and returns the short font names."""
+    if not os.path.exists("all-fonts.txt"):
+        print("Error: all-fonts.txt not found.")
+        sys.exit(1)
+
+    with open("all-fonts.txt", "r") as f:
+        return [line.strip().split('/')[-1] for line in f if line.strip()]
+
+def bench_command(binary, fonts, args):
+    cmd = [binary, "--framed", "--repeat", str(args.repeat), "--doc-lines", str(args.doc_lines)]
+    for corpus in args.corpus or []:
+        cmd += ["--corpus", corpus]
+    return cmd + fonts
+
+async def run_batches(binary, batches, args, root_dir):
+    """Runs the bench binary over each batch of fonts.
+
+    Returns ({font: record}, {font: error}, [batch stats]).
+    """
+    runner = JobRunner(**runner_options(args))
+    env = dict(os.environ)
+    env.setdefault("MOONBIT_FONTS_DIR", root_dir)
+    records, failed, batch_stats = {}, {}, []
+
+    async def run_batch(i, fonts):
+        usage = {}
+        try:
+            returncode, reader, stderr = await runner.run_framed(
+                bench_command(binary, fonts, args), lambda name: MemorySink(), cwd=root_dir, env=env,
+                usage=usage, job=f"batch-{i + 1}", compiles=False)
+        except JobTimeout as e:
+            returncode, reader, stderr = None, None, str(e)
+        sink = reader.frames.get("bench") if reader and returncode == 0 else None
+        if sink is None:
+            error = stderr.strip().splitlines()[-1] if stderr.strip() else f"bench exited with status {returncode}"
+            for font in fonts:
+                failed[font] = error
+        else:
+            for line in sink.text().splitlines():
+                record = json.loads(line)
+                if "error" in record:
+                    failed[record["font"]] = record["error"]
+                else:
+                    records[record["font"]] = record
+        batch_stats.append({"fonts": len(fonts), "seconds": round(usage.get("seconds", 0.0), 3), "peak_rss": usage.get("peak_rss")})
+        print(f"Batch {i + 1}/{len(batches)}: {len(fonts)} fonts in {usage.get('seconds', 0.0):.1f}s", file=sys.stderr)
+
+    tasks = [asyncio.ensure_future(run_batch(i, fonts)) for i, fonts in enumerate(batches)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return records, failed, batch_stats
+
+def percentile(values, p):
+    """Returns the `p`th percentile (nearest rank) of `values`."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+def summarize(records):
+    """Returns the summary metrics ({name: value}) of per-font records."""
+    load_ms = [r["load"]["us"] / 1000 for r in records.values()]
+    summary = {
+        "fonts": len(records),
+        "load.total_ms": sum(load_ms),
+        "load.median_ms": statistics.median(load_ms) if load_ms else 0.0,
+        "load.p95_ms": percentile(load_ms, 95),
+        "memory.rss_growth_mb": sum(r["load"]["rss_growth"] or 0 for r in records.values()) / 1e6,
+        "memory.path_data_mb": sum(r["load"]["path_data_bytes"] for r in records.values()) / 1e6,
+        "render.layout_ms": sum(r["render"]["layout_us"] for r in records.values()) / 1000,
+        "render.svg_ms": sum(r["render"]["svg_us"] for r in records.values()) / 1000,
+    }
+    corpora = sorted({c for r in records.values() for c in r["gen_path"]}, key=lambda c: (CORPORA + [c]).index(c))
+    for corpus in corpora:
+        runs = [r["gen_path"][corpus] for r in records.values() if corpus in r["gen_path"]]
+        us = sum(run["us"] for run in runs)
+        summary[f"gen_path.{corpus}.glyphs_per_sec"] = sum(run["glyphs"] for run in runs) * 1e6 / us if us else 0.0
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in summary.items()}
+
+def higher_is_better(metric):
+    return metric.endswith("_per_sec")
+
+def font_time_us(record):
+    """Returns the total measured time of a font's benchmarks."""
+    return (record["load"]["us"] + sum(run["us"] for run in record["gen_path"].values())
+            + record["render"]["layout_us"] + record["render"]["svg_us"])
+
+def compare_reports(report, baseline, threshold, top=10):
+    """Prints the change of each summary metric (over the fonts both reports have)
+    and the fonts that slowed down the most. Returns the regressed metric names."""
+    common = sorted(set(report["fonts"]) & set(baseline["fonts"]))
+    if not common:
+        print("No fonts in common with the baseline.")
+        return []
+    new = summarize({f: report["fonts"][f] for f in common})
+    old = summarize({f: baseline["fonts"][f] for f in common})
+    if len(common) < max(len(report["fonts"]), len(baseline["fonts"])):
+        print(f"Comparing the {len(common)} fonts present in both reports.")
+
+    regressions = []
+    print(f"{'metric':<34} {'baseline':>12} {'current':>12} {'change':>9}")
+    for metric in new:
+        if metric == "fonts" or metric not in old:
+            continue
+        before, after = old[metric], new[metric]
+        change = (after - before) / before * 100 if before else 0.0
+        worse = -change if higher_is_better(metric) else change
+        flag = ""
+        if worse > threshold:
+            regressions.append(metric)
+            flag = "  REGRESSION"
+        print(f"{metric:<34} {before:12.3f} {after:12.3f} {change:+8.1f}%{flag}")
+
+    slower = []
+    for font in common:
+        before, after = font_time_us(baseline["fonts"][font]), font_time_us(report["fonts"][font])
+        if before and (after - before) / before * 100 > threshold:
+            slower.append(((after - before) / before * 100, font, before, after))
+    if slower:
+        print(f"\nFonts more than {threshold:g}% slower ({len(slower)}):")
+        for change, font, before, after in sorted(slower, reverse=True)[:top]:
+            print(f"  {font:<32} {before / 1000:10.1f}ms -> {after / 1000:10.1f}ms ({change:+.1f}%)")
+    return regressions
+
+def load_report(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: could not read report {path}: {e}")
+        sys.exit(1)
+    if report.get("version") != REPORT_VERSION:
+        print(f"Error: {path} is not a version {REPORT_VERSION} bench report")
+        sys.exit(1)
+    return report
+
+def write_report(report, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark font loading, gen_path throughput and rendering across all fonts")
+    parser.add_argument("fonts", nargs="*", help="Short font names to benchmark (default: all fonts in all-fonts.txt)")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help=f"Report file to write (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--baseline", help="Saved report to compare against; exits with status 1 on a regression")
+    parser.add_argument("--report", help="Compare this saved report against --baseline instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"Percent change counted as a regression (default: {DEFAULT_THRESHOLD:g})")
+    parser.add_argument("--limit", type=int, help="Only benchmark the first N fonts")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Fonts per bench process (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--corpus", action="append", choices=CORPORA, help="gen_path corpus to run (repeatable; default: all)")
+    parser.add_argument("--repeat", type=int, default=20, help="gen_path calls per corpus (default: 20)")
+    parser.add_argument("--doc-lines", type=int, default=200, help="Lines of the rendered document (default: 200)")
+    parser.add_argument("--bench", help="Path to a prebuilt bench binary (default: build bench/ on demand)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the bench binary even if it is up to date")
+    parser.add_argument("--workers", type=int, default=1, help="Bench processes running at once (default: 1, for stable timings)")
+    add_runner_arguments(parser, workers=False)
+    args = parser.parse_args()
+
+    if args.report:
+        if not args.baseline:
+            parser.error("--report requires --baseline")
+        report = load_report(args.report)
+    else:
+        root_dir = os.path.abspath(os.getcwd())
+        fonts = args.fonts or get_font_names()
+        if args.limit:
+            fonts = fonts[:args.limit]
+        try:
+            binary = args.bench or ensure_binary(root_dir, BENCH_DIR, BENCH_SOURCE_DIRS, args.rebuild)
+        except RendererError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        batch_size = max(1, args.batch_size)
+        batches = [fonts[i:i + batch_size] for i in range(0, len(fonts), batch_size)]
+        print(f"Benchmarking {len(fonts)} fonts in {len(batches)} batches...", file=sys.stderr)
+        records, failed, batch_stats = run_main(run_batches(binary, batches, args, root_dir))
+
+        report = {
+            "version": REPORT_VERSION,
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "settings": {"repeat": args.repeat, "doc_lines": args.doc_lines, "corpora": args.corpus or CORPORA},
+            "summary": summarize(records),
+            "fonts": records,
+            "failed": failed,
+            "batches": batch_stats,
+        }
+        write_report(report, args.output)
+        for font, error in sorted(failed.items()):
+            print(f"FAILED: {font}: {error}")
+        print(f"Wrote {args.output}: {len(records)} fonts benchmarked, {len(failed)} failed")
+        for metric, value in report["summary"].items():
+            print(f"  {metric:<34} {value}")
+
+    if args.baseline:
+        baseline = load_report(args.baseline)
+        if baseline["settings"] != report["settings"]:
+            print(f"Warning: the baseline was run with different settings: {baseline['settings']}")
+        print(f"\nComparing against {args.baseline}:")
+        regressions = compare_reports(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.threshold:g}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
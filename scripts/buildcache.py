@@ -0,0 +1,212 @@
+"""Persistent, reusable workspaces for the MoonBit projects generated by the scripts.
+
+Every generated project used to live in a fresh `tempfile.mkdtemp` directory
+that was removed afterwards, so `gmlewis/fonts` and the `mbt-fonts-*` font
+packages were recompiled from scratch on every run. A cached workspace is
+keyed by a hash of the generated `moon.mod.json`/`moon.pkg.json` (i.e. the
+dependency and import set) plus the root `moon.mod` version, so its `_build`
+and `target` artifacts are reused by later runs with the same imports.
+
+Workspaces are evicted least-recently-used first once the cache grows past
+its size cap.
+"""
+import asyncio
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "moonbit-fonts", "build")
+DEFAULT_CACHE_SIZE_GB = 10.0
+
+# Marker file written in each workspace; its mtime records the last use
+# and its content records the workspace size for eviction.
+MARKER = ".last-used"
+
+def add_cache_arguments(parser):
+    """Adds the shared build-cache options to an argparse parser."""
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"Persistent build cache directory (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_CACHE_SIZE_GB, help=f"Maximum build cache size in GB before LRU eviction (default: {DEFAULT_CACHE_SIZE_GB:g})")
+    parser.add_argument("--no-cache", action="store_true", help="Build in a throwaway temporary directory instead of the build cache")
+
+def cache_options(args):
+    """Returns (cache_dir, max_bytes) from parsed args; cache_dir is None with --no-cache."""
+    if args.no_cache:
+        return None, 0
+    return os.path.abspath(os.path.expanduser(args.cache_dir)), int(args.cache_size * 1024 ** 3)
+
+def root_version(root_dir):
+    """Returns the `version` from the root `moon.mod` (or "" if unknown)."""
+    try:
+        with open(os.path.join(root_dir, "moon.mod"), "r") as f:
+            m = re.search(r'^version\s*=\s*"([^"]*)"', f.read(), re.MULTILINE)
+            return m.group(1) if m else ""
+    except OSError:
+        return ""
+
+def cache_key(files, root_dir):
+    """Hashes the project's module/package definitions plus the root version."""
+    h = hashlib.sha256()
+    h.update(root_version(root_dir).encode())
+    for name in sorted(files):
+        if name.startswith("moon."):
+            h.update(name.encode())
+            h.update(files[name].encode())
+    return h.hexdigest()[:24]
+
+def write_if_changed(path, content):
+    """Writes `content` only if it differs, preserving mtimes for incremental builds."""
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return
+    except OSError:
+        pass
+    with open(path, "w") as f:
+        f.write(content)
+
+def dir_size(path):
+    """Returns the total size in bytes of all files below `path`."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+def open_lock(lock_path, blocking=True):
+    """Opens and exclusively locks `lock_path`; returns the open file, or None if
+    `blocking` is False and another run holds the lock.
+
+    `evict` removes the lock file of a workspace it deletes, so a lock taken on
+    a file that has meanwhile been unlinked (or replaced) protects nothing: the
+    lock is then retried on the file now at `lock_path`.
+    """
+    while True:
+        lock = open(lock_path, "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+        try:
+            if os.fstat(lock.fileno()).st_ino == os.stat(lock_path).st_ino:
+                return lock
+        except FileNotFoundError:
+            pass
+        lock.close()
+
+def evict(cache_dir, max_bytes, protect=None):
+    """Removes least-recently-used workspaces until the cache fits in `max_bytes`.
+
+    Workspaces that are currently locked by another run (and the `protect`
+    key, usually the workspace that was just used) are never removed.
+    Returns the list of evicted workspace keys.
+    """
+    entries = []
+    for key in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, key)
+        if not os.path.isdir(path):
+            continue
+        marker = os.path.join(path, MARKER)
+        try:
+            with open(marker, "r") as f:
+                size = json.load(f).get("size", 0)
+            last_used = os.path.getmtime(marker)
+        except (OSError, ValueError):
+            # No (valid) marker, e.g. the first build in the workspace crashed:
+            # the directory's own mtime stands in for its last use.
+            size = dir_size(path)
+            try:
+                last_used = os.path.getmtime(marker)
+            except OSError:
+                last_used = os.path.getmtime(path)
+        entries.append((last_used, key, size))
+
+    total = sum(size for _, _, size in entries)
+    evicted = []
+    for _, key, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if key == protect:
+            continue
+        lock_path = os.path.join(cache_dir, key + ".lock")
+        lock = open_lock(lock_path, blocking=False)
+        if lock is None:
+            continue
+        with lock:
+            shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+            # Unlinked while still locked: a run waiting on this lock notices
+            # (see `open_lock`) and locks a new file instead.
+            os.remove(lock_path)
+            total -= size
+            evicted.append(key)
+    return evicted
+
+@contextlib.contextmanager
+def project_dir(files, root_dir, cache_dir=None, max_bytes=0, prefix="moon-", keep=False):
+    """Yields a directory containing the generated project `files` ({name: content}).
+
+    With `cache_dir`, the directory is a persistent workspace shared by every
+    run with the same dependency set; it is locked for the duration of the
+    `with` block. Without it, a temporary directory is created and removed
+    afterwards (unless `keep` is set).
+    """
+    if cache_dir is None:
+        tmp_dir = tempfile.mkdtemp(prefix=prefix)
+        try:
+            for name, content in files.items():
+                with open(os.path.join(tmp_dir, name), "w") as f:
+                    f.write(content)
+            yield tmp_dir
+        finally:
+            if not keep:
+                shutil.rmtree(tmp_dir)
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    key = cache_key(files, root_dir)
+    work_dir = os.path.join(cache_dir, key)
+    with open_lock(os.path.join(cache_dir, key + ".lock")) as lock:
+        try:
+            os.makedirs(work_dir, exist_ok=True)
+            for name, content in files.items():
+                write_if_changed(os.path.join(work_dir, name), content)
+            yield work_dir
+        finally:
+            with open(os.path.join(work_dir, MARKER), "w") as f:
+                json.dump({"size": dir_size(work_dir), "last_used": time.time()}, f)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    if max_bytes > 0:
+        evict(cache_dir, max_bytes, protect=key)
+
+@contextlib.asynccontextmanager
+async def async_project_dir(files, root_dir, cache_dir=None, max_bytes=0, prefix="moon-", keep=False):
+    """`project_dir` for coroutines: the directory is set up and released (waiting for its
+    lock, writing files, evicting) in a worker thread, off the event loop."""
+    cm = project_dir(files, root_dir, cache_dir, max_bytes, prefix, keep)
+    enter = asyncio.ensure_future(asyncio.to_thread(cm.__enter__))
+    try:
+        work_dir = await asyncio.shield(enter)
+    except asyncio.CancelledError:
+        # The thread cannot be interrupted: let the setup finish, then undo it.
+        await enter
+        await asyncio.to_thread(cm.__exit__, None, None, None)
+        raise
+    try:
+        yield work_dir
+    except BaseException:
+        if not await asyncio.to_thread(cm.__exit__, *sys.exc_info()):
+            raise
+    else:
+        await asyncio.to_thread(cm.__exit__, None, None, None)
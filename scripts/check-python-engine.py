@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Checks that the pure-Python engine (`textpath.py`) matches the renderer.
+
+Each selected font renders the same text with both engines and the two SVGs
+are compared token by token: the command letters and attributes must be
+identical and every number must agree within `--tolerance`.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+
+from renderer import RendererError, ensure_renderer, run_renderer
+import textpath
+
+NUM_RE = re.compile(r"-?[0-9]+(?:\.[0-9]+)?(?:e[-+]?[0-9]+)?")
+
+DEFAULT_TEXT = ["The quick brown fox", "jumps over the lazy dog.", "0123456789 !?&@#"]
+
+def compare_svgs(want, got, tolerance):
+    """Returns None if the SVGs match, else a description of the first difference."""
+    want_nums, got_nums = NUM_RE.findall(want), NUM_RE.findall(got)
+    want_rest, got_rest = NUM_RE.sub("#", want), NUM_RE.sub("#", got)
+    if want_rest != got_rest:
+        for i, (a, b) in enumerate(zip(want_rest, got_rest)):
+            if a != b:
+                return f"structure differs at offset {i}: {want_rest[i:i+40]!r} != {got_rest[i:i+40]!r}"
+        return f"structure differs in length: {len(want_rest)} != {len(got_rest)}"
+    for i, (a, b) in enumerate(zip(want_nums, got_nums)):
+        if abs(float(a) - float(b)) > tolerance:
+            return f"number #{i} differs: renderer={a} python={b}"
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the pure-Python text engine against the MoonBit renderer")
+    parser.add_argument("fonts", nargs="*", help="Font names to check (default: a sample from all-fonts.txt)")
+    parser.add_argument("-n", "--sample", type=int, default=20, help="Number of fonts to sample when none are given (default: 20)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the font sample (default: 0)")
+    parser.add_argument("-t", "--text", action="append", help="Line of text to render (repeatable)")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="Maximum absolute difference per number (default: 1e-9)")
+    parser.add_argument("--renderer", help="Path to a prebuilt renderer binary (default: build renderer/ on demand)")
+    args = parser.parse_args()
+
+    root_dir = os.getcwd()
+    fonts = args.fonts
+    if not fonts:
+        if not os.path.exists("all-fonts.txt"):
+            print("Error: all-fonts.txt not found. Run scripts/enumerate-all-fonts.py first.")
+            sys.exit(1)
+        with open("all-fonts.txt", "r") as f:
+            names = [line.strip().split('/')[-1] for line in f if line.strip()]
+        fonts = random.Random(args.seed).sample(names, min(args.sample, len(names)))
+
+    try:
+        binary = args.renderer or ensure_renderer(root_dir)
+    except RendererError as e:
+        print(e)
+        sys.exit(1)
+
+    lines = args.text or DEFAULT_TEXT
+    fonts_dir = os.path.join(root_dir, "all-fonts")
+    failures = 0
+    for name in fonts:
+        family_info = {'regular': name}
+        for align in ['left', 'center', 'right']:
+            result = run_renderer(binary, family_info, lines, align, False, "svg", root_dir)
+            if result.returncode != 0:
+                print(f"{name} ({align}): renderer failed: {result.stderr.strip()}")
+                failures += 1
+                continue
+            try:
+                font = textpath.load_font(name, fonts_dir)
+            except textpath.FontError as e:
+                print(f"{name}: {e}")
+                failures += 1
+                break
+            got = textpath.render_svg(lines, font, align=align, y_up=False)
+            diff = compare_svgs(result.stdout.rstrip("\n"), got, args.tolerance)
+            if diff:
+                print(f"{name} ({align}): {diff}")
+                failures += 1
+
+    print(f"Checked {len(fonts)} fonts: {failures} mismatches")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,42 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import os
 import sys
-import tempfile
-import subprocess
-import shutil
-import concurrent.futures
+import gzip
+import hashlib
+import json
+import time
 from pathlib import Path
 
+from buildcache import add_cache_arguments, async_project_dir, cache_options, root_version
+from fontpack import PACK_NAME, write_pack
+from fontsources import load_font_sources
+from framing import FileSink, mbt_frame
+from glyphindex import has_glyph_index, remove_glyph_index, write_glyph_index
+from glyphstore import STORE_DIR, TABLE_SUFFIX, remove_store_table, store_is_current, write_glyph_store
+from jobrunner import JobRunner, add_runner_arguments, run_main, runner_options
+from pathcodec import PACKED_SUFFIX, optimize_font, remove_packed_font, write_packed_font
+from timings import TIMINGS, add_timing_arguments, timing_options
+
+DEFAULT_BATCH_SIZE = 40
+DEFAULT_BATCH_MB = 64
+
+# Records, per font, the hash of the inputs its `.json.gz` was generated from.
+MANIFEST = "manifest.json"
+
+# Same default as the `gzip` command line tool.
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# Peak RSS of a batch is estimated as MIN_BATCH_RSS plus its source bytes times a
+# ratio that starts at DEFAULT_RSS_PER_SOURCE_BYTE and is replaced by the largest
+# ratio measured once batches complete.
+MIN_BATCH_RSS = 256 * 1024 ** 2
+DEFAULT_RSS_PER_SOURCE_BYTE = 40
+
+# Default --max-rss, as a fraction of the physical memory.
+DEFAULT_MAX_RSS_FRACTION = 0.75
+
 def get_font_packages():
     """Reads all-fonts.txt and returns a list of package names."""
     if not os.path.exists("all-fonts.txt"):
@@ -17,105 +46,400 @@ def get_font_packages():
     with open("all-fonts.txt", "r") as f:
         return [line.strip() for line in f if line.strip()]
 
-def generate_moon_mod(font_pkg, root_dir):
-    """Generates moon.mod.json content."""
+def font_source_dir(font_pkg, root_dir):
+    """Returns the ../mbt-fonts-*/<font> directory holding the font package sources."""
     parts = font_pkg.split('/')
-    if len(parts) < 3:
+    repo_suffix = parts[1].split('-')[-1]
+    return os.path.abspath(os.path.join(root_dir, "..", f"mbt-fonts-{repo_suffix}", parts[-1]))
+
+def font_source_size(font_pkg, root_dir):
+    """Returns the total size in bytes of the font package's *.mbt sources."""
+    src_dir = font_source_dir(font_pkg, root_dir)
+    total = 0
+    for path in Path(src_dir).glob("*.mbt"):
+        total += path.stat().st_size
+    return total
+
+def font_source_sizes(font_packages, root_dir):
+    """Returns {package: source bytes}, from `all-fonts.json` where it has the package.
+
+    Packages missing from the manifest (or all of them, without one) fall
+    back to `font_source_size`. Run scripts/enumerate-all-fonts.py to
+    refresh the manifest after the sources change.
+    """
+    sources = load_font_sources()
+    sizes = {}
+    for pkg in font_packages:
+        entry = sources.get(pkg)
+        sizes[pkg] = entry["source_bytes"] if entry is not None else font_source_size(pkg, root_dir)
+    return sizes
+
+def font_source_hash(font_pkg, root_dir, version):
+    """Hashes the font package's *.mbt sources plus the root `moon.mod` version."""
+    h = hashlib.sha256()
+    h.update(version.encode())
+    for path in sorted(Path(font_source_dir(font_pkg, root_dir)).glob("*.mbt")):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+def load_manifest(outdir):
+    """Returns the {font_name: {"package", "hash"}} manifest, or {} if there is none."""
+    try:
+        with open(os.path.join(outdir, MANIFEST), "r") as f:
+            return json.load(f).get("fonts", {})
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(outdir, fonts):
+    """Atomically writes the manifest."""
+    path = os.path.join(outdir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"fonts": dict(sorted(fonts.items()))}, f, indent=2)
+        f.write("\n")
+    os.replace(path + ".tmp", path)
+
+def prune_removed_fonts(outdir, manifest, font_packages, dry_run=False):
+    """Reports (and unless `dry_run`, deletes) outputs of fonts no longer in all-fonts.txt."""
+    known = {pkg.split('/')[-1] for pkg in font_packages}
+    outputs = {name[:-len(".json.gz")] for name in os.listdir(outdir)
+               if name.endswith(".json.gz") and not name.endswith(PACKED_SUFFIX) and not name.endswith(TABLE_SUFFIX)}
+    outputs |= {name[:-len(TABLE_SUFFIX)] for name in os.listdir(outdir) if name.endswith(TABLE_SUFFIX)}
+    removed = sorted((outputs | set(manifest)) - known)
+    for font_name in removed:
+        print(f"{'Stale' if dry_run else 'Pruning'}: {font_name} is no longer in all-fonts.txt")
+        if dry_run:
+            continue
+        manifest.pop(font_name, None)
+        path = os.path.join(outdir, f"{font_name}.json.gz")
+        if os.path.exists(path):
+            os.remove(path)
+        remove_glyph_index(outdir, font_name)
+        remove_store_table(outdir, font_name)
+        remove_packed_font(outdir, font_name)
+    return removed
+
+def has_output(outdir, font_name, glyph_index=False, packed_paths=False):
+    """Returns True if the font has a `.json.gz` or a glyph store table, plus the
+    sidecars requested with `glyph_index` and `packed_paths`."""
+    if not (os.path.exists(os.path.join(outdir, f"{font_name}.json.gz")) or
+            os.path.exists(os.path.join(outdir, font_name + TABLE_SUFFIX))):
+        return False
+    if glyph_index and not has_glyph_index(outdir, font_name):
+        return False
+    return not packed_paths or os.path.exists(os.path.join(outdir, font_name + PACKED_SUFFIX))
+
+def make_batches(font_packages, sizes, batch_size, batch_bytes):
+    """Groups fonts into batches of at most `batch_size` fonts and `batch_bytes` of source.
+
+    The compiled program and its output grow with the amount of font source
+    it imports, so the byte budget keeps per-batch memory bounded. A single
+    font larger than the budget gets a batch of its own. Fonts are taken
+    largest first, so the batches come out in decreasing order of source
+    size (their estimated cost).
+    """
+    batches = []
+    current, current_bytes = [], 0
+    for pkg in sorted(font_packages, key=lambda pkg: -sizes[pkg]):
+        size = sizes[pkg]
+        if current and (len(current) >= batch_size or current_bytes + size > batch_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(pkg)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    batches.sort(key=lambda batch: -sum(sizes[pkg] for pkg in batch))
+    return batches
+
+def physical_memory():
+    """Returns the physical memory in bytes, or None if it is unknown."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
         return None
-    
-    repo = '/'.join(parts[:2]) # e.g. gmlewis/fonts-a
-    repo_suffix = repo.split('-')[-1]
-    phys_repo_path = os.path.abspath(os.path.join(root_dir, "..", f"mbt-fonts-{repo_suffix}"))
 
-    import json
+def format_gb(n):
+    return f"{n / 1024 ** 3:.2f} GB"
+
+def format_usage(stats):
+    """Returns e.g. "12.3s, peak RSS 1.20 GB, batch of 5" for a batch's stats."""
+    text = f"{stats['seconds']:.1f}s"
+    if stats.get("peak_rss") is not None:
+        text += f", peak RSS {format_gb(stats['peak_rss'])}"
+    if stats["fonts"] > 1:
+        text += f", batch of {stats['fonts']}"
+    return text
+
+def generate_moon_mod(font_pkgs, root_dir):
+    """Generates moon.mod.json content."""
+    deps = {
+        "gmlewis/fonts": { "path": root_dir }
+    }
+    for font_pkg in font_pkgs:
+        repo = '/'.join(font_pkg.split('/')[:2]) # e.g. gmlewis/fonts-a
+        repo_suffix = repo.split('-')[-1]
+        deps[repo] = { "path": os.path.abspath(os.path.join(root_dir, "..", f"mbt-fonts-{repo_suffix}")) }
+
     return json.dumps({
         "name": "temp-compress",
         "version": "0.1.0",
-        "deps": {
-            "gmlewis/fonts": { "path": root_dir },
-            repo: { "path": phys_repo_path }
-        }
+        "deps": deps
     }, indent=2)
 
-def generate_moon_pkg(font_pkg):
+def generate_moon_pkg(font_pkgs):
     """Generates moon.pkg.json content."""
-    import json
     return json.dumps({
         "is-main": True,
         "import": [
             "gmlewis/fonts",
-            font_pkg
-        ]
+        ] + font_pkgs
     }, indent=2)
 
-def generate_main_mbt(font_pkg):
-    """Generates main.mbt content."""
-    alias = font_pkg.split('/')[-1]
-    return f"""
-fn main {{
-  println(@{alias}.font.to_json().stringify())
-}}
-"""
-
-def compress_font(font_pkg, root_dir, outdir):
-    font_name = font_pkg.split('/')[-1]
-    output_json = os.path.join(outdir, f"{font_name}.json")
-    
-    tmp_dir = tempfile.mkdtemp(prefix=f"moon-compress-{font_name}-")
-    try:
-        moon_mod = generate_moon_mod(font_pkg, root_dir)
-        if not moon_mod:
-            return font_pkg, False, f"Skipping {font_pkg}: unexpected format"
-
-        with open(os.path.join(tmp_dir, "moon.mod.json"), "w") as f:
-            f.write(moon_mod)
-        with open(os.path.join(tmp_dir, "moon.pkg.json"), "w") as f:
-            f.write(generate_moon_pkg(font_pkg))
-        with open(os.path.join(tmp_dir, "main.mbt"), "w") as f:
-            f.write(generate_main_mbt(font_pkg))
-
-        result = subprocess.run(["moon", "run", "main.mbt", "--target", "native"], cwd=tmp_dir, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            error_msg = f"Error running moon run for {font_name}:\n{result.stderr}"
-            return font_pkg, False, error_msg
-
-        stdout = result.stdout.strip()
-        start_idx = stdout.find('{')
-        end_idx = stdout.rfind('}')
-        
-        if start_idx == -1 or end_idx == -1 or end_idx < start_idx:
-            error_msg = f"Error: Could not find JSON content in moon output for {font_name}.\nSTDOUT: {stdout}\nSTDERR: {result.stderr}"
-            return font_pkg, False, error_msg
-
-        json_output = stdout[start_idx:end_idx+1]
-
-        with open(output_json, "w") as f:
-            f.write(json_output)
-        
-        subprocess.run(["gzip", "-f", output_json], check=True)
-        return font_pkg, True, None
+def generate_main_mbt(font_pkgs):
+    """Generates main.mbt content printing each font's JSON as a frame (see `framing.py`)."""
+    mbt = ["fn main {"]
+    for font_pkg in font_pkgs:
+        alias = font_pkg.split('/')[-1]
+        mbt.extend(mbt_frame(alias, f"@{alias}.font.to_json().stringify()"))
+    mbt.append("}")
+    return "\n".join(mbt) + "\n"
+
+async def run_batch(runner, tmp_dir, outdir, compression_level, usage=None, job=None):
+    """Runs the batch program, streaming each font's frame into its gzipped output.
+
+    Outputs are written to `{font_name}.json.gz.tmp` and only renamed into
+    place if the program succeeds. `usage` receives the run's time and peak
+    RSS (see `jobrunner.JobRunner.run_framed`); phase timings are recorded
+    under `job`. Returns (returncode, completed font names, stderr).
+    """
+    def open_sink(font_name):
+        return FileSink(os.path.join(outdir, f"{font_name}.json.gz"), compression_level, TIMINGS.timer(job))
 
+    returncode, reader, stderr = await runner.run_framed(["moon", "run", "main.mbt", "--target", "native"], open_sink, cwd=tmp_dir, usage=usage, job=job)
+    if returncode != 0:
+        reader.abort()
+        return returncode, set(), stderr
+    return returncode, set(reader.commit()), stderr
+
+def path_options(args):
+    """Returns the `pathcodec.optimize_font` keyword arguments, or None if paths are kept as generated."""
+    if args.precision is None and not args.relative:
+        return None
+    return {"precision": args.precision, "relative": args.relative, "tolerance": args.bbox_tolerance}
+
+def write_sidecars(font_name, outdir, compression_level, glyph_index, packed_paths, path_options=None):
+    """Rewrites the paths of a compressed font (with `path_options`, see
+    `pathcodec.optimize_font`) and writes its glyph index and/or packed path sidecars."""
+    path = os.path.join(outdir, f"{font_name}.json.gz")
+    with gzip.open(path, "rb") as f:
+        font = json.load(f)
+    if path_options:
+        kept = optimize_font(font, **path_options)
+        if kept:
+            print(f"{font_name}: kept {kept} glyph paths whose bounding box would move more than the tolerance")
+        with open(path + ".tmp", "wb") as raw:
+            with gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=compression_level, mtime=0) as f:
+                f.write(json.dumps(font, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        os.replace(path + ".tmp", path)
+    if glyph_index:
+        write_glyph_index(font, outdir, font_name, compression_level=compression_level)
+    if packed_paths:
+        write_packed_font(font, outdir, font_name, compression_level=compression_level)
+
+async def compress_batch(runner, font_pkgs, root_dir, outdir, cache_dir=None, max_bytes=0, compression_level=DEFAULT_COMPRESSION_LEVEL, glyph_index=False, packed_paths=False, path_options=None):
+    """Compiles and runs one program for all `font_pkgs`, writing each `{font_name}.json.gz`.
+
+    Returns a list of (font_pkg, success, error_msg, stats), where stats has
+    the wall time ("seconds", including the build), "peak_rss" (bytes, or
+    None if unknown) and the number of "fonts" of the run that produced the
+    font. If the batch program fails to build or run, each font is retried on
+    its own so that a single broken font package does not fail the whole
+    batch.
+    """
+    label = font_pkgs[0].split('/')[-1] if len(font_pkgs) == 1 else f"batch-{len(font_pkgs)}"
+    # Timings job, e.g. "airstream" or "airstream+39".
+    job = font_pkgs[0].split('/')[-1] + (f"+{len(font_pkgs) - 1}" if len(font_pkgs) > 1 else "")
+    start = time.monotonic()
+    generate_start = TIMINGS.now()
+    files = {
+        "moon.mod.json": generate_moon_mod(font_pkgs, root_dir),
+        "moon.pkg.json": generate_moon_pkg(font_pkgs),
+        "main.mbt": generate_main_mbt(font_pkgs),
+    }
+    usage = {}
+    try:
+        async with async_project_dir(files, root_dir, cache_dir, max_bytes, prefix=f"moon-compress-{label}-") as tmp_dir:
+            TIMINGS.record(job, "generate", generate_start, TIMINGS.now())
+            returncode, completed, stderr = await run_batch(runner, tmp_dir, outdir, compression_level, usage, job)
     except Exception as e:
-        return font_pkg, False, f"Exception during {font_name}: {str(e)}"
+        stats = {"seconds": time.monotonic() - start, "peak_rss": usage.get("peak_rss"), "fonts": len(font_pkgs)}
+        return [(pkg, False, f"Exception during {label}: {str(e)}", stats) for pkg in font_pkgs]
+    stats = {"seconds": time.monotonic() - start, "peak_rss": usage.get("peak_rss"), "fonts": len(font_pkgs)}
+
+    if returncode != 0:
+        if len(font_pkgs) > 1:
+            results = []
+            for pkg in font_pkgs:
+                results.extend(await compress_batch(runner, [pkg], root_dir, outdir, cache_dir, max_bytes, compression_level, glyph_index, packed_paths, path_options))
+            return results
+        return [(font_pkgs[0], False, f"Error running moon run for {label}:\n{stderr}", stats)]
+
+    results = []
+    for font_pkg in font_pkgs:
+        font_name = font_pkg.split('/')[-1]
+        if font_name not in completed:
+            error_msg = f"Error: Could not find JSON content in moon output for {font_name}.\nSTDERR: {stderr}"
+            results.append((font_pkg, False, error_msg, stats))
+            continue
+        # Sidecars left by an earlier run with --glyph-index or --packed-paths
+        # would shadow the new font.
+        if not glyph_index:
+            remove_glyph_index(outdir, font_name)
+        if not packed_paths:
+            remove_packed_font(outdir, font_name)
+        if glyph_index or packed_paths or path_options:
+            try:
+                with TIMINGS.span(job, "sidecars", font=font_name):
+                    await asyncio.to_thread(write_sidecars, font_name, outdir, compression_level, glyph_index, packed_paths, path_options)
+            except Exception as e:
+                results.append((font_pkg, False, f"Error writing sidecars for {font_name}: {str(e)}", stats))
+                continue
+        results.append((font_pkg, True, None, stats))
+    return results
+
+async def run_batches(batches, sizes, root_dir, outdir, cache_dir, max_bytes, args, manifest, hashes):
+    """Compresses all batches in parallel, updating the manifest; returns the success count.
+
+    Batches are started in the given (largest first) order, at most
+    `args.workers` at a time and, when `args.max_rss` is set, only while the
+    sum of the running batches' estimated peak RSS stays within it. A batch
+    that does not fit waits while smaller batches behind it that do fit are
+    started; one batch always runs, however large.
+    """
+    total = sum(len(batch) for batch in batches)
+    workers = min(args.workers, len(batches))
+    max_rss = args.max_rss
+    rss_per_byte = None
+    pending = list(batches)
+    running = {}
+    slowest = []
+    success_count = 0
+
+    def estimate(batch):
+        ratio = DEFAULT_RSS_PER_SOURCE_BYTE if rss_per_byte is None else rss_per_byte
+        return MIN_BATCH_RSS + ratio * sum(sizes[pkg] for pkg in batch)
+
+    runner = JobRunner(**dict(runner_options(args), concurrency=workers))
+    completed = 0
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                in_use = sum(est for _, est in running.values())
+                choice = None
+                for i, batch in enumerate(pending):
+                    if not running or not max_rss or in_use + estimate(batch) <= max_rss:
+                        choice = i
+                        break
+                if choice is None:
+                    break
+                batch = pending.pop(choice)
+                task = asyncio.ensure_future(compress_batch(runner, batch, root_dir, outdir, cache_dir, max_bytes, args.compression_level, args.glyph_index, args.packed_paths, path_options(args)))
+                running[task] = (batch, estimate(batch))
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                batch, _ = running.pop(task)
+                for pkg, success, error_msg, stats in task.result():
+                    completed += 1
+                    if success:
+                        success_count += 1
+                        manifest[pkg.split('/')[-1]] = {
+                            "package": pkg,
+                            "hash": hashes[pkg],
+                            "seconds": round(stats["seconds"], 3),
+                            "peak_rss": stats["peak_rss"],
+                        }
+                        print(f"[{completed}/{total}] Success: {pkg} ({format_usage(stats)})")
+                    else:
+                        print(f"[{completed}/{total}] FAILED: {pkg} ({format_usage(stats)})")
+                        print(error_msg, file=sys.stderr)
+                    if stats["fonts"] == len(batch) and stats.get("peak_rss"):
+                        # Calibrate the estimate against the batch as it ran.
+                        batch_bytes = sum(sizes[p] for p in batch)
+                        if batch_bytes > 0:
+                            ratio = max(0, stats["peak_rss"] - MIN_BATCH_RSS) / batch_bytes
+                            rss_per_byte = ratio if rss_per_byte is None else max(rss_per_byte, ratio)
+                    slowest.append((stats["seconds"], pkg))
+                save_manifest(outdir, manifest)
     finally:
-        shutil.rmtree(tmp_dir)
+        # On Ctrl-C (or an unexpected error), stop the running batches and let them clean up.
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    slowest.sort(reverse=True)
+    if slowest:
+        print("\nSlowest fonts:")
+        for seconds, pkg in slowest[:5]:
+            print(f"  {seconds:8.1f}s  {pkg}")
+    return success_count
 
 def main():
     parser = argparse.ArgumentParser(description="Compress all fonts to JSON.gz")
     parser.add_argument("--outdir", default="all-fonts", help="Output directory (default: all-fonts)")
     parser.add_argument("--limit", type=int, help="Limit the number of fonts to process")
-    parser.add_argument("--workers", type=int, default=20, help="Number of parallel workers (default: 20)")
-    parser.add_argument("--force", action="store_true", help="Force re-compression even if output file exists")
+    parser.add_argument("--workers", type=int, default=20, help="Maximum number of batch programs running at once (default: 20)")
+    parser.add_argument("--force", action="store_true", help="Force re-compression even if the font's inputs are unchanged")
+    parser.add_argument("--glyph-index", action="store_true", help="Also write per-font glyph index sidecars ({name}.glyphs.json/.glyphs.{hash}.bin) for lazy glyph loading")
+    parser.add_argument("--packed-paths", action="store_true", help=f"Also write per-font pre-parsed path sidecars ({{name}}{PACKED_SUFFIX}) with numeric glyph paths")
+    parser.add_argument("--pack", action="store_true", help=f"Also write every compressed font into a single memory-mappable {PACK_NAME} archive in the output directory")
+    parser.add_argument("--glyph-store", action="store_true", help=f"Store each unique glyph once in a shared, content-addressed {STORE_DIR}/ and replace each font's .json.gz with a small {{name}}{TABLE_SUFFIX} table")
+    parser.add_argument("--precision", type=float, help="Round path coordinates to multiples of this many font units (e.g. 1 or 0.5), recomputing the glyph bounding boxes")
+    parser.add_argument("--relative", action="store_true", help="Rewrite glyph paths with relative SVG commands (m, l, c, q, z)")
+    parser.add_argument("--bbox-tolerance", type=float, help="Keep a glyph's original path if rewriting it moves its bounding box by more than this many font units (default: --precision)")
+    parser.add_argument("--no-prune", action="store_true", help="Only report, instead of deleting, outputs of fonts removed from all-fonts.txt")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Maximum number of fonts compiled into one program (default: {DEFAULT_BATCH_SIZE}; 1 = one program per font)")
+    parser.add_argument("--compression-level", type=int, choices=range(0, 10), default=DEFAULT_COMPRESSION_LEVEL, metavar="{0..9}", help=f"gzip compression level (default: {DEFAULT_COMPRESSION_LEVEL})")
+    parser.add_argument("--max-rss", type=float, default=None, help=f"Memory budget in GB: batches only start while the estimated peak RSS of the running batches fits (default: {DEFAULT_MAX_RSS_FRACTION * 100:.0f}%% of the physical memory; 0 = no limit)")
+    parser.add_argument("--batch-mb", type=float, default=DEFAULT_BATCH_MB, help=f"Maximum MB of font sources per batch, bounding per-batch memory (default: {DEFAULT_BATCH_MB})")
+    add_cache_arguments(parser)
+    add_runner_arguments(parser, workers=False)
+    add_timing_arguments(parser)
     parser.add_argument("fonts", nargs="*", help="Specific font names or packages to process")
     args = parser.parse_args()
+    if args.precision is not None and args.precision <= 0:
+        parser.error("--precision must be positive")
+    if args.pack and args.glyph_store:
+        parser.error("--pack archives the .json.gz files that --glyph-store replaces; use one or the other")
+    timing_options(args)
+
+    if args.max_rss is None:
+        memory = physical_memory()
+        args.max_rss = int(memory * DEFAULT_MAX_RSS_FRACTION) if memory else 0
+    else:
+        args.max_rss = int(args.max_rss * 1024 ** 3)
 
     outdir = os.path.abspath(args.outdir)
     if not os.path.exists(outdir):
         os.makedirs(outdir)
 
-    font_packages = get_font_packages()
-    
+    root_dir = os.path.abspath(os.getcwd())
+    cache_dir, max_bytes = cache_options(args)
+    version = root_version(root_dir)
+
+    font_packages = []
+    for pkg in get_font_packages():
+        if len(pkg.split('/')) < 3:
+            print(f"Skipping {pkg}: unexpected format")
+            continue
+        font_packages.append(pkg)
+
+    manifest = load_manifest(outdir)
+    pruned = bool(prune_removed_fonts(outdir, manifest, font_packages, dry_run=args.no_prune)) and not args.no_prune
+    if pruned:
+        save_manifest(outdir, manifest)
+
     if args.fonts:
         filtered = []
         for pkg in font_packages:
@@ -124,45 +448,58 @@ def main():
                 filtered.append(pkg)
         font_packages = filtered
 
+    # Changing the path options regenerates the fonts.
+    options = path_options(args)
+    inputs = version if options is None else f"{version} {json.dumps(options, sort_keys=True)}"
+    hashes = {pkg: font_source_hash(pkg, root_dir, inputs) for pkg in font_packages}
     if not args.force:
         remaining = []
         for pkg in font_packages:
             font_name = pkg.split('/')[-1]
-            if not os.path.exists(os.path.join(outdir, f"{font_name}.json.gz")):
+            entry = manifest.get(font_name, {})
+            # A requested sidecar that is missing also regenerates the font.
+            if entry.get("hash") != hashes[pkg] or not has_output(outdir, font_name, args.glyph_index, args.packed_paths):
                 remaining.append(pkg)
-        
+
         skipped = len(font_packages) - len(remaining)
         if skipped > 0:
-            print(f"Skipping {skipped} fonts that are already compressed. Use --force to re-process.")
+            print(f"Skipping {skipped} fonts whose inputs are unchanged. Use --force to re-process.")
         font_packages = remaining
 
     if args.limit:
         font_packages = font_packages[:args.limit]
-    
-    root_dir = os.path.abspath(os.getcwd())
+
     total = len(font_packages)
+    success_count = 0
     if total == 0:
         print("No fonts to process.")
-        return
+    else:
+        sizes = font_source_sizes(font_packages, root_dir)
+        batches = make_batches(font_packages, sizes, max(1, args.batch_size), args.batch_mb * 1024 * 1024)
+        workers = min(args.workers, len(batches))
+        budget = f" within {format_gb(args.max_rss)} of estimated peak RSS" if args.max_rss else ""
+        print(f"Processing {total} fonts in {len(batches)} batches (largest first) using up to {workers} workers{budget}...")
+        success_count = run_main(run_batches(batches, sizes, root_dir, outdir, cache_dir, max_bytes, args, manifest, hashes))
+        print(f"\nDone. Successfully compressed {success_count}/{total} fonts into {outdir}")
 
-    print(f"Processing {total} fonts using {args.workers} workers...")
+    # The Python engine prefers fonts.pack to the .json.gz files, so an existing
+    # archive is rebuilt whenever a font changes, and removed by --glyph-store
+    # (which replaces the files it archives).
+    pack_path = os.path.join(outdir, PACK_NAME)
+    if args.glyph_store and os.path.exists(pack_path):
+        os.remove(pack_path)
+        print(f"Removed {pack_path}: --glyph-store replaces the .json.gz files it archives")
+    elif args.pack or (os.path.exists(pack_path) and (success_count or pruned)):
+        fonts = [(name, os.path.join(outdir, f"{name}.json.gz")) for name in sorted(manifest)]
+        fonts = [(name, path) for name, path in fonts if os.path.exists(path)]
+        count = write_pack(pack_path, fonts)
+        print(f"Packed {count} fonts into {pack_path}")
 
-    success_count = 0
-    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as executor:
-        future_to_pkg = {executor.submit(compress_font, pkg, root_dir, outdir): pkg for pkg in font_packages}
-        
-        completed = 0
-        for future in concurrent.futures.as_completed(future_to_pkg):
-            pkg, success, error_msg = future.result()
-            completed += 1
-            if success:
-                success_count += 1
-                print(f"[{completed}/{total}] Success: {pkg}")
-            else:
-                print(f"[{completed}/{total}] FAILED: {pkg}")
-                print(error_msg, file=sys.stderr)
-    
-    print(f"\nDone. Successfully compressed {success_count}/{total} fonts into {outdir}")
+    if args.glyph_store:
+        fonts = [name for name in sorted(manifest) if has_output(outdir, name)]
+        if not store_is_current(outdir, fonts):
+            count, glyphs, unique = write_glyph_store(outdir, fonts, args.compression_level)
+            print(f"Stored {unique} unique of {glyphs} glyphs of {count} fonts in {os.path.join(outdir, STORE_DIR)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,33 +1,49 @@
 #!/usr/bin/env python3
+import argparse
+import concurrent.futures
 import glob
 import os
 
+from fontsources import SOURCES_MANIFEST, load_font_sources, scan_font_dir, source_stamp, write_font_sources
+
+def package_name(path):
+    """Returns the package name of a ../mbt-fonts-x/fontname/moon.pkg.json path."""
+    # Example path: ../mbt-fonts-a/airstream/moon.pkg.json
+    # Normalize path to handle separators consistently.
+    parts = path.replace('\\', '/').split('/')
+    
+    # We expect: [.., "mbt-fonts-x", "fontname", "moon.pkg.json"]
+    if len(parts) < 3:
+        return None
+    repo_dir = parts[-3]
+    font_dir = parts[-2]
+    
+    # Remove 'mbt-' prefix from the repo directory name
+    if repo_dir.startswith("mbt-"):
+        repo_name = repo_dir[4:] # skip 'mbt-'
+    else:
+        repo_name = repo_dir
+        
+    return f"gmlewis/{repo_name}/{font_dir}"
+
 def main():
+    parser = argparse.ArgumentParser(description=f"List the font packages in ../mbt-fonts-* into all-fonts.txt and their source statistics into {SOURCES_MANIFEST}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help=f"Number of font directories scanned in parallel (default: {os.cpu_count() or 1})")
+    parser.add_argument("--force", action="store_true", help="Rescan every font, even if its sources are unchanged")
+    args = parser.parse_args()
+
     # The pattern is ../mbt-fonts-*/*/moon.pkg.json
     # We want to find all moon.pkg.json files in the sibling directories.
     pattern = "../mbt-fonts-*/*/moon.pkg.json"
     paths = glob.glob(pattern)
     paths.sort()
     
-    font_packages = []
+    font_dirs = {}
     for path in paths:
-        # Example path: ../mbt-fonts-a/airstream/moon.pkg.json
-        # Normalize path to handle separators consistently.
-        parts = path.replace('\\', '/').split('/')
-        
-        # We expect: [.., "mbt-fonts-x", "fontname", "moon.pkg.json"]
-        if len(parts) >= 3:
-            repo_dir = parts[-3]
-            font_dir = parts[-2]
-            
-            # Remove 'mbt-' prefix from the repo directory name
-            if repo_dir.startswith("mbt-"):
-                repo_name = repo_dir[4:] # skip 'mbt-'
-            else:
-                repo_name = repo_dir
-                
-            package_name = f"gmlewis/{repo_name}/{font_dir}"
-            font_packages.append(package_name)
+        package = package_name(path)
+        if package:
+            font_dirs[package] = os.path.dirname(path).replace('\\', '/')
+    font_packages = list(font_dirs)
             
     # Write all these strings to the file "all-fonts.txt" in the root of the repo.
     # Since the script is intended to be run from the root, we use "all-fonts.txt".
@@ -35,5 +51,25 @@ def main():
         for pkg in font_packages:
             f.write(pkg + "\n")
 
+    # Reuse the statistics of fonts whose sources are unchanged; scan the rest in parallel.
+    previous = {} if args.force else load_font_sources()
+    fonts = {}
+    to_scan = []
+    for pkg, font_dir in font_dirs.items():
+        entry = previous.get(pkg)
+        if entry is not None and entry.get("dir") == font_dir and entry.get("stamp") == source_stamp(font_dir):
+            fonts[pkg] = entry
+        else:
+            to_scan.append(pkg)
+
+    if to_scan:
+        workers = max(1, min(args.workers, len(to_scan)))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            dirs = [font_dirs[pkg] for pkg in to_scan]
+            for pkg, entry in zip(to_scan, executor.map(scan_font_dir, dirs, chunksize=8)):
+                fonts[pkg] = entry
+    write_font_sources(fonts)
+    print(f"Found {len(font_packages)} fonts ({len(to_scan)} scanned); wrote all-fonts.txt and {SOURCES_MANIFEST}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,250 @@
+"""Cached, pre-indexed catalog of the fonts listed in `all-fonts.txt`.
+
+The catalog maps each family to its variants ({variant: package}) using the
+family/variant heuristic shared by the render scripts, and keeps per-font
+metadata (glyph count, `units_per_em` and compressed size of
+`all-fonts/{font_name}.json.gz`). It is serialized under the cache
+directory and rebuilt only when the mtime (or size) of `all-fonts.txt`
+changes; metadata entries are refreshed individually when their compressed
+font changes, and written back once per batch of lookups (`info_many`) rather
+than once per entry. Within a process, `load_catalog` returns the same object until
+`all-fonts.txt` changes, so lookups stay off the hot path.
+
+Fuzzy lookups (`find_family`, `find_font`) use sorted-key prefix indexes and
+run in O(log n).
+"""
+import bisect
+import gzip
+import hashlib
+import json
+import os
+
+from buildcache import DEFAULT_CACHE_DIR
+from glyphstore import TABLE_SUFFIX
+from pathcodec import mbt_num
+
+DEFAULT_CATALOG_DIR = os.path.join(os.path.dirname(DEFAULT_CACHE_DIR), "catalog")
+FONT_LIST = "all-fonts.txt"
+
+# Bump when the serialized layout or the family/variant heuristic changes.
+CATALOG_VERSION = 1
+
+VARIANTS = ['regular', 'italic', 'bold', 'bolditalic']
+
+class CatalogError(Exception):
+    """Raised when `all-fonts.txt` cannot be read."""
+
+def split_family(full_name):
+    """Returns the (family, variant) of a font name such as `abeezee_italic`."""
+    if '_' in full_name:
+        family, variant = full_name.rsplit('_', 1)
+        if variant in VARIANTS:
+            pass
+        elif 'italic' in variant and 'bold' in variant:
+            variant = 'bolditalic'
+        elif 'bold' in variant:
+            variant = 'bold'
+        elif 'italic' in variant:
+            variant = 'italic'
+        return family, variant
+    family = full_name
+    variant = 'regular'
+    if 'bolditalic' in full_name.lower(): variant = 'bolditalic'
+    elif 'bold' in full_name.lower(): variant = 'bold'
+    elif 'italic' in full_name.lower(): variant = 'italic'
+    elif 'regular' in full_name.lower(): variant = 'regular'
+    return family, variant
+
+def build_families(packages):
+    """Returns {family: {variant: package}} for a list of packages."""
+    font_map = {}
+    for pkg in packages:
+        # Example: gmlewis/fonts-a/abeezee_italic
+        full_name = pkg.split('/')[-1]
+        family, variant = split_family(full_name)
+        if family not in font_map:
+            font_map[family] = {}
+        if variant == 'regular' or variant not in font_map[family]:
+            font_map[family][variant] = pkg
+        elif variant in ['bold', 'italic', 'bolditalic']:
+            if '_' + variant in full_name:
+                font_map[family][variant] = pkg
+    return font_map
+
+def prefix_lookup(keys, query):
+    """Returns the first key of sorted `keys` that starts with `query`, or None."""
+    i = bisect.bisect_left(keys, query)
+    if i < len(keys) and keys[i].startswith(query):
+        return keys[i]
+    return None
+
+def compressed_font_path(fonts_dir, font_name):
+    """Returns the font's `.json.gz`, or its glyph store table if it only has that."""
+    path = os.path.join(fonts_dir, f"{font_name}.json.gz")
+    table_path = os.path.join(fonts_dir, font_name + TABLE_SUFFIX)
+    return table_path if not os.path.exists(path) and os.path.exists(table_path) else path
+
+def font_metadata(fonts_dir, font_name):
+    """Returns {glyphs, units_per_em, compressed_size, stamp} for a compressed font, or None."""
+    path = compressed_font_path(fonts_dir, font_name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    index_path = os.path.join(fonts_dir, f"{font_name}.glyphs.json")
+    if os.path.exists(index_path):
+        # The glyph index sidecar has the same metrics without decompressing the font.
+        with open(index_path, "r", encoding="utf-8") as f:
+            font = json.load(f)
+    else:
+        with gzip.open(path, "rb") as f:
+            font = json.load(f)
+    return {
+        "glyphs": len(font["glyphs"]),
+        "units_per_em": font["units_per_em"],
+        "compressed_size": st.st_size,
+        "stamp": [st.st_mtime_ns, st.st_size],
+    }
+
+def format_info(entry):
+    """Returns a one-line summary of the metadata returned by `FontCatalog.info`."""
+    return f"{entry['glyphs']} glyphs, {mbt_num(entry['units_per_em'])} units/em, {entry['compressed_size'] / 1024:.1f} KB"
+
+class FontCatalog:
+    """Families, packages and per-font metadata of `all-fonts.txt`."""
+
+    def __init__(self, data, path, fonts_dir, cache_path=None):
+        self.dirty = False
+        self.path = path
+        self.fonts_dir = fonts_dir
+        self.cache_path = cache_path
+        self.stamp = data["stamp"]
+        self.packages = data["packages"]
+        self.families = data["families"]
+        self.metadata = data.get("metadata", {})
+        self.family_names = sorted(self.families)
+        self.by_name = {}
+        for pkg in self.packages:
+            self.by_name.setdefault(pkg.split('/')[-1], pkg)
+        self.font_names = sorted(self.by_name)
+
+    def to_json(self):
+        return {
+            "version": CATALOG_VERSION,
+            "path": self.path,
+            "stamp": self.stamp,
+            "packages": self.packages,
+            "families": self.families,
+            "metadata": self.metadata,
+        }
+
+    def save(self):
+        """Writes the catalog to its cache file (atomically), if it has one."""
+        if self.cache_path is None:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, separators=(",", ":"))
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
+
+    def find_family(self, query):
+        """Returns `query` if it is a family, else the first family (sorted) it prefixes, or None."""
+        if query in self.families:
+            return query
+        return prefix_lookup(self.family_names, query)
+
+    def find_font(self, query):
+        """Returns the package whose font name (or package) is `query`, else the first
+        package whose font name `query` prefixes, or None."""
+        if query in self.by_name:
+            return self.by_name[query]
+        if '/' in query:
+            return query if query in self.packages else None
+        name = prefix_lookup(self.font_names, query)
+        return self.by_name[name] if name is not None else None
+
+    def info(self, font_name):
+        """Returns the metadata of a compressed font (None if it is not compressed).
+
+        Metadata is computed on first use and refreshed when the compressed font
+        changes. Updates mark the catalog `dirty` until the next `save`.
+        """
+        path = compressed_font_path(self.fonts_dir, font_name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        entry = self.metadata.get(font_name)
+        if entry is not None and entry["stamp"] == [st.st_mtime_ns, st.st_size]:
+            return entry
+        entry = font_metadata(self.fonts_dir, font_name)
+        self.metadata[font_name] = entry
+        self.dirty = True
+        return entry
+
+    def info_many(self, font_names):
+        """Returns {font_name: metadata} (see `info`), saving the catalog once if
+        any entry was computed."""
+        infos = {font_name: self.info(font_name) for font_name in font_names}
+        if self.dirty:
+            self.save()
+        return infos
+
+def catalog_cache_path(path, cache_dir):
+    key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{key}.json")
+
+def read_packages(path):
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+_loaded = {}
+
+def load_catalog(path=FONT_LIST, fonts_dir="all-fonts", cache_dir=DEFAULT_CATALOG_DIR):
+    """Returns the `FontCatalog` of `path`, from memory or the cache when still valid.
+
+    Pass `cache_dir=None` to skip the on-disk cache. Raises `CatalogError`
+    if `path` does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise CatalogError(f"{path} not found. Run scripts/enumerate-all-fonts.py first.")
+    stamp = [st.st_mtime_ns, st.st_size]
+    fonts_dir = os.path.abspath(fonts_dir)
+    key = (os.path.abspath(path), fonts_dir, cache_dir)
+    catalog = _loaded.get(key)
+    if catalog is not None and catalog.stamp == stamp:
+        return catalog
+
+    cache_path = catalog_cache_path(path, cache_dir) if cache_dir else None
+    cached = None
+    if cache_path is not None:
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+        if cached is not None and cached.get("version") != CATALOG_VERSION:
+            cached = None
+
+    if cached is not None and cached["stamp"] == stamp:
+        catalog = FontCatalog(cached, key[0], fonts_dir, cache_path)
+    else:
+        packages = read_packages(path)
+        data = {
+            "stamp": stamp,
+            "packages": packages,
+            "families": build_families(packages),
+            "metadata": {},
+        }
+        if cached is not None:
+            # Metadata stays valid per font (see `FontCatalog.info`).
+            names = {pkg.split('/')[-1] for pkg in packages}
+            data["metadata"] = {name: entry for name, entry in cached.get("metadata", {}).items() if name in names}
+        catalog = FontCatalog(data, key[0], fonts_dir, cache_path)
+        catalog.save()
+    _loaded[key] = catalog
+    return catalog
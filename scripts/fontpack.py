@@ -0,0 +1,135 @@
+"""Packed, memory-mappable archive of the compressed fonts in `all-fonts/`.
+
+Instead of one `{font_name}.json.gz` file per font, the archive stores every
+font's gzip blob in a single file with a sorted name index, so a font can be
+found with a binary search over the memory-mapped index from one open file.
+
+Layout (all integers little-endian):
+
+    header   magic "MBFPACK1", u32 version, u32 count
+    index    count x (u32 name_offset, u16 name_len, u16 reserved,
+                      u64 blob_offset, u64 blob_len), sorted by name
+    names    UTF-8 font names referenced by the index
+    blobs    the `{font_name}.json.gz` contents, back to back
+
+Offsets are relative to the start of the file.
+"""
+import gzip
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b"MBFPACK1"
+VERSION = 1
+PACK_NAME = "fonts.pack"
+
+HEADER = struct.Struct("<8sII")
+ENTRY = struct.Struct("<IHHQQ")
+
+class FontPackError(Exception):
+    """Raised when a pack file is invalid or does not contain a font."""
+
+def write_pack(path, fonts):
+    """Writes a pack from `fonts`, a list of (font_name, path to `.json.gz`).
+
+    The pack is written to a temporary file and renamed into place.
+    """
+    entries = sorted((name.encode("utf-8"), src) for name, src in fonts)
+    names_offset = HEADER.size + ENTRY.size * len(entries)
+    name_offsets = []
+    pos = names_offset
+    for name, _ in entries:
+        name_offsets.append(pos)
+        pos += len(name)
+    blob_offset = pos
+    blob_offsets = []
+    for _, src in entries:
+        blob_offsets.append(blob_offset)
+        blob_offset += os.path.getsize(src)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for (name, src), name_offset, offset in zip(entries, name_offsets, blob_offsets):
+            f.write(ENTRY.pack(name_offset, len(name), 0, offset, os.path.getsize(src)))
+        for name, _ in entries:
+            f.write(name)
+        for _, src in entries:
+            with open(src, "rb") as blob:
+                while True:
+                    chunk = blob.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+class FontPack:
+    """Read-only view of a pack file; use as a context manager or call `close`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise FontPackError(f"{path}: empty pack file")
+        if len(self.mm) < HEADER.size:
+            self.close()
+            raise FontPackError(f"{path}: truncated pack header")
+        magic, version, self.count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise FontPackError(f"{path}: not a version {VERSION} font pack")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        self.file.close()
+
+    def entry(self, i):
+        """Returns (name bytes, blob_offset, blob_len) for index entry `i`."""
+        name_offset, name_len, _, offset, length = ENTRY.unpack_from(self.mm, HEADER.size + i * ENTRY.size)
+        return self.mm[name_offset:name_offset + name_len], offset, length
+
+    def names(self):
+        return [self.entry(i)[0].decode("utf-8") for i in range(self.count)]
+
+    def find(self, font_name):
+        """Returns (blob_offset, blob_len) for `font_name` or None, by binary search."""
+        key = font_name.encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name, offset, length = self.entry(mid)
+            if name < key:
+                lo = mid + 1
+            elif name > key:
+                hi = mid
+            else:
+                return offset, length
+        return None
+
+    def __contains__(self, font_name):
+        return self.find(font_name) is not None
+
+    def read(self, font_name):
+        """Returns the gzip-compressed JSON of `font_name`."""
+        found = self.find(font_name)
+        if found is None:
+            raise FontPackError(f"Font '{font_name}' not found in {self.path}")
+        offset, length = found
+        return self.mm[offset:offset + length]
+
+    def load(self, font_name):
+        """Returns the decoded `Font` JSON dict of `font_name`."""
+        return json.loads(gzip.decompress(self.read(font_name)))
@@ -0,0 +1,79 @@
+"""Per-font source statistics written next to `all-fonts.txt` as `all-fonts.json`.
+
+`scripts/enumerate-all-fonts.py` scans every `../mbt-fonts-*/<font>/` package
+and records, for each font package:
+
+    {"dir": "../mbt-fonts-a/airstream", "source_bytes": 1234567,
+     "mbt_files": 2, "lines": 40321, "longest_line": 9876, "glyphs": 221,
+     "stamp": [[name, mtime_ns, size], ...]}
+
+`longest_line` is in bytes and `glyphs` counts the `char: "..."` fields of
+the glyph literals. `stamp` lets a later scan reuse the entry while the
+sources are unchanged. Schedulers, splitters and the font catalog read these
+numbers instead of re-reading multi-megabyte sources.
+"""
+import json
+import os
+import re
+from pathlib import Path
+
+SOURCES_MANIFEST = "all-fonts.json"
+SOURCES_VERSION = 1
+
+GLYPH_RE = re.compile(rb'^\s*char:\s*"', re.MULTILINE)
+
+def source_files(font_dir):
+    """Returns the sorted *.mbt sources of a font package directory."""
+    return sorted(str(p) for p in Path(font_dir).glob("*.mbt"))
+
+def source_stamp(font_dir):
+    """Returns [[file name, mtime_ns, size], ...] for a font package's sources."""
+    stamp = []
+    for path in source_files(font_dir):
+        st = os.stat(path)
+        stamp.append([os.path.basename(path), st.st_mtime_ns, st.st_size])
+    return stamp
+
+def scan_font_dir(font_dir):
+    """Reads a font package's *.mbt sources and returns its statistics."""
+    source_bytes = lines = longest_line = glyphs = 0
+    files = source_files(font_dir)
+    for path in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        source_bytes += len(data)
+        glyphs += len(GLYPH_RE.findall(data))
+        if data:
+            file_lines = data.split(b"\n")
+            if not file_lines[-1]:
+                file_lines.pop()
+            lines += len(file_lines)
+            longest_line = max([longest_line] + [len(line) for line in file_lines])
+    return {
+        "dir": font_dir,
+        "source_bytes": source_bytes,
+        "mbt_files": len(files),
+        "lines": lines,
+        "longest_line": longest_line,
+        "glyphs": glyphs,
+        "stamp": source_stamp(font_dir),
+    }
+
+def load_font_sources(path=SOURCES_MANIFEST):
+    """Returns {package: statistics} from `all-fonts.json`, or {} if it is missing or stale."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != SOURCES_VERSION:
+        return {}
+    return data.get("fonts", {})
+
+def write_font_sources(fonts, path=SOURCES_MANIFEST):
+    """Writes `all-fonts.json` atomically, with packages in sorted order."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": SOURCES_VERSION, "fonts": dict(sorted(fonts.items()))}, f, indent=1)
+        f.write("\n")
+    os.replace(tmp_path, path)
@@ -0,0 +1,148 @@
+"""On-disk cache of per-font specimen cells for `scripts/sample-all-fonts.py`.
+
+Each font's cell (its label plus the sample text) is rendered once by
+`@svg.from_graphic` at the origin and stored as an SVG fragment keyed by
+the font package, a hash of the sample text, the label font package and the
+`gmlewis/fonts` version. Pages are then assembled in Python by translating
+the cached cells into their grid positions, so re-paginating or adding a
+font only renders the cells that are missing. Empty cells (a font that failed
+to render) are never written to disk, and fragments are evicted
+least-recently-used first once the cache grows past its size cap.
+"""
+import hashlib
+import json
+import os
+import re
+
+from buildcache import DEFAULT_CACHE_DIR
+from pathcodec import mbt_num, round_to_fixed
+
+DEFAULT_FRAGMENT_DIR = os.path.join(os.path.dirname(DEFAULT_CACHE_DIR), "fragments")
+DEFAULT_FRAGMENT_CACHE_SIZE_GB = 1.0
+
+# Bump when the generated cell program changes in a way that alters its output.
+FRAGMENT_VERSION = 1
+
+VIEWBOX_RE = re.compile(r'<svg[^>]*viewBox="([^"]*)"[^>]*>\n?(.*)</svg>', re.DOTALL)
+
+def fragment_key(font_pkg, sample_text, label_font_pkg, version):
+    """Returns the cache key of a font's cell."""
+    text_hash = hashlib.sha256(sample_text.encode("utf-8")).hexdigest()
+    ident = json.dumps([FRAGMENT_VERSION, font_pkg, text_hash, label_font_pkg, version])
+    return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+class FragmentCache:
+    """Maps fragment keys to SVG fragments; memory-only if `directory` is None.
+
+    A fragment's mtime records its last use; `evict` keeps the directory
+    within `max_bytes` (no limit if 0).
+    """
+
+    def __init__(self, directory=None, max_bytes=0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory = {}
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".svg")
+
+    def get(self, key):
+        svg = self.memory.get(key)
+        if svg is not None or self.directory is None:
+            return svg
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                svg = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        if parse_fragment(svg) is None:
+            # An empty cell cached by an older version: render it again.
+            return None
+        self.memory[key] = svg
+        return svg
+
+    def put(self, key, svg):
+        self.memory[key] = svg
+        if self.directory is None or parse_fragment(svg) is None:
+            return
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(svg)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Removes least-recently-used fragments until the cache fits in `max_bytes`.
+
+        Fragments used by this run are never removed. Returns the number of
+        evicted fragments.
+        """
+        if self.directory is None or self.max_bytes <= 0:
+            return 0
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".svg"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, path, st.st_size, name[:-len(".svg")]))
+
+        total = sum(size for _, _, size, _ in entries)
+        evicted = 0
+        for _, path, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key in self.memory:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        return evicted
+
+def parse_fragment(svg):
+    """Returns ((min_x, min_y, width, height), body) of a cell, or None if it is empty."""
+    m = VIEWBOX_RE.search(svg)
+    if not m:
+        return None
+    min_x, min_y, width, height = (float(v) for v in m.group(1).split())
+    return (min_x, min_y, width, height), m.group(2).rstrip("\n")
+
+def assemble_page(cells, margin=0.5, background="#FFFFFF"):
+    """Assembles a page from a list of (x, y, fragment SVG).
+
+    Like `scene.with_margin(...).with_background(...)` followed by
+    `@svg.from_graphic(y_up=false)`: the view box is the union of the cells'
+    boxes plus `margin`, behind a `background` rectangle.
+    """
+    placed = []
+    bbox = None
+    for x, y, svg in cells:
+        parsed = parse_fragment(svg)
+        if parsed is None:
+            continue
+        (min_x, min_y, width, height), body = parsed
+        box = (x + min_x, y + min_y, x + min_x + width, y + min_y + height)
+        if bbox is None:
+            bbox = box
+        else:
+            bbox = (min(bbox[0], box[0]), min(bbox[1], box[1]), max(bbox[2], box[2]), max(bbox[3], box[3]))
+        placed.append(f'  <g transform="translate({mbt_num(x)} {mbt_num(y)})">\n{body}\n  </g>')
+    if bbox is None:
+        return "<svg></svg>"
+    r = lambda v: mbt_num(round_to_fixed(v, 4))
+    xmin, ymin = bbox[0] - margin, bbox[1] - margin
+    xmax, ymax = bbox[2] + margin, bbox[3] + margin
+    rect = f"M{r(xmin)} {r(ymin)}L{r(xmax)} {r(ymin)}L{r(xmax)} {r(ymax)}L{r(xmin)} {r(ymax)}Z"
+    lines = [f'  <path d="{rect}" stroke="none" fill="{background}"/>'] + placed
+    body = "\n".join(lines)
+    return f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{r(xmin)} {r(ymin)} {r(xmax - xmin)} {r(ymax - ymin)}">\n{body}\n</svg>'
@@ -0,0 +1,301 @@
+"""Sentinel-framed output protocol between generated MoonBit programs and the drivers.
+
+A program prints each of its outputs between two marker lines:
+
+    ### moonbit-fonts begin NAME
+    <payload: any text, possibly one very long line>
+    ### moonbit-fonts end NAME
+
+The newline before the end marker is not part of the payload. Anything
+printed outside of a frame (e.g. `moon run` build progress) is kept, up to
+`MAX_TEXT` bytes, for error messages.
+
+`FrameReader` consumes the program's stdout in chunks and writes each payload
+into a sink as it arrives, so peak memory is bounded by the chunk size rather
+than by the size of the output. `jobrunner.JobRunner.run_framed` runs a
+program and feeds its stdout to a `FrameReader`.
+"""
+import gzip
+import os
+import sys
+import time
+
+BEGIN_MARKER = "### moonbit-fonts begin "
+END_MARKER = "### moonbit-fonts end "
+
+STREAM_CHUNK_SIZE = 256 * 1024
+MAX_TEXT = 64 * 1024
+
+def mbt_frame(name, expr, indent="  "):
+    """Returns the MoonBit lines that print `expr` (a `String` expression) as frame `name`."""
+    return [
+        f'{indent}println("{BEGIN_MARKER}{name}")',
+        f"{indent}println({expr})",
+        f'{indent}println("{END_MARKER}{name}")',
+    ]
+
+class TimedFile:
+    """A binary file whose writes are timed into `timer("write", seconds)`."""
+
+    def __init__(self, f, timer):
+        self.f = f
+        self.timer = timer
+        self.seconds = 0.0
+
+    def write(self, data):
+        start = time.perf_counter()
+        n = self.f.write(data)
+        self.seconds += time.perf_counter() - start
+        return n
+
+    def flush(self):
+        self.f.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+class FileSink:
+    """Writes a payload to `path` (gzipped if `compression_level` is set).
+
+    Data goes to `{path}.tmp` until `commit` renames it into place. With a
+    `timer(phase, seconds)` (see `timings.py`), the time spent compressing
+    and writing is reported as "compress" and "write".
+    """
+
+    def __init__(self, path, compression_level=None, timer=None):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.timer = timer
+        self.raw = open(self.tmp_path, "wb")
+        self.file = TimedFile(self.raw, timer) if timer is not None else self.raw
+        self.out = self.file
+        if compression_level is not None:
+            self.out = gzip.GzipFile(filename="", mode="wb", fileobj=self.file, compresslevel=compression_level, mtime=0)
+
+    def write(self, data):
+        if self.timer is None:
+            self.out.write(data)
+            return
+        start = time.perf_counter()
+        written = self.file.seconds
+        self.out.write(data)
+        self.report(time.perf_counter() - start, self.file.seconds - written)
+
+    def report(self, seconds, write_seconds):
+        if self.out is not self.file:
+            self.timer("compress", seconds - write_seconds)
+        self.timer("write", write_seconds)
+
+    def close(self):
+        if self.raw.closed:
+            return
+        if self.timer is None:
+            if self.out is not self.raw:
+                self.out.close()
+            self.raw.close()
+            return
+        start = time.perf_counter()
+        written = self.file.seconds
+        if self.out is not self.file:
+            # Flushes the compressor.
+            self.out.close()
+        flushed = time.perf_counter()
+        self.raw.close()
+        self.report(flushed - start, self.file.seconds - written)
+        self.timer("write", time.perf_counter() - flushed)
+
+    def abort(self):
+        self.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def commit(self):
+        self.close()
+        start = time.perf_counter()
+        os.replace(self.tmp_path, self.path)
+        if self.timer is not None:
+            self.timer("write", time.perf_counter() - start)
+
+class StdoutSink:
+    """Writes a payload straight to stdout, followed by a newline on `commit`.
+
+    With a `timer(phase, seconds)`, the time spent writing is reported as "write".
+    """
+
+    def __init__(self, timer=None):
+        self.timer = timer
+
+    def write(self, data):
+        if self.timer is None:
+            sys.stdout.buffer.write(data)
+            return
+        start = time.perf_counter()
+        sys.stdout.buffer.write(data)
+        self.timer("write", time.perf_counter() - start)
+
+    def close(self):
+        sys.stdout.buffer.flush()
+
+    def abort(self):
+        self.close()
+
+    def commit(self):
+        sys.stdout.buffer.write(b"\n")
+        self.close()
+
+class MemorySink:
+    """Keeps a (small) payload in memory; see `text`."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def text(self):
+        return self.data.decode("utf-8")
+
+def output_sink(path=None, compression_level=None, timer=None):
+    """Returns a `FileSink` for `path`, or a `StdoutSink` if `path` is None."""
+    if path is None:
+        return StdoutSink(timer)
+    return FileSink(path, compression_level, timer)
+
+class FrameReader:
+    """Splits a program's stdout into frames, incrementally.
+
+    `open_sink(name)` is called for each frame and returns the sink (with
+    `write`, `close` and `abort`) that receives its payload. Completed frames
+    are closed and recorded in `frames` ({name: sink}); call `commit` or
+    `abort` on them once the program's exit status is known.
+
+    With a `timer(phase, seconds)`, the time `feed` spends outside of the
+    sinks is reported as "extract". Payload bytes reach the sink as soon as
+    they arrive, except for a trailing newline (and what follows it) that
+    may begin the end marker. `first_frame_at` is the `perf_counter`
+    time at which the first frame began (None until then).
+    """
+
+    def __init__(self, open_sink, timer=None):
+        self.open_sink = open_sink
+        self.timer = timer
+        self.sink_seconds = 0.0
+        self.first_frame_at = None
+        self.frames = {}
+        self.text = bytearray()
+        self.line = bytearray()
+        self.name = None
+        self.sink = None
+        self.end = None
+        self.buf = bytearray()
+        self.skip = 0
+
+    def feed(self, chunk):
+        """Processes the next chunk of bytes from the program's stdout."""
+        if self.timer is None:
+            self.feed_chunk(chunk)
+            return
+        start = time.perf_counter()
+        sink_seconds = self.sink_seconds
+        self.feed_chunk(chunk)
+        self.timer("extract", time.perf_counter() - start - (self.sink_seconds - sink_seconds))
+
+    def feed_chunk(self, chunk):
+        while chunk:
+            if self.name is None:
+                idx = chunk.find(b"\n")
+                if idx == -1:
+                    self.line += chunk
+                    return
+                self.line += chunk[:idx]
+                chunk = chunk[idx + 1:]
+                line = self.line.decode("utf-8", errors="replace").rstrip("\r")
+                self.line = bytearray()
+                if line.startswith(BEGIN_MARKER):
+                    self.start(line[len(BEGIN_MARKER):])
+                elif len(self.text) < MAX_TEXT:
+                    self.text += (line + "\n").encode("utf-8")[:MAX_TEXT - len(self.text)]
+            else:
+                chunk = self.feed_payload(chunk)
+
+    def start(self, name):
+        if self.first_frame_at is None:
+            self.first_frame_at = time.perf_counter()
+        self.name = name
+        self.sink = self.open_sink(name)
+        self.end = f"\n{END_MARKER}{name}\n".encode("utf-8")
+        # The begin line's newline doubles as the end sequence's leading
+        # newline for an empty payload; it is never written to the sink.
+        self.buf = bytearray(b"\n")
+        self.skip = 1
+
+    def feed_payload(self, chunk):
+        """Writes `chunk` up to the end marker of the current frame; returns the rest."""
+        self.buf += chunk
+        idx = self.buf.find(self.end)
+        if idx == -1:
+            keep = self.partial_end()
+            if len(self.buf) - keep > self.skip:
+                self.write(bytes(self.buf[self.skip:len(self.buf) - keep]))
+                del self.buf[:len(self.buf) - keep]
+                self.skip = 0
+            return b""
+        if idx > self.skip:
+            self.write(bytes(self.buf[self.skip:idx]))
+        rest = bytes(self.buf[idx + len(self.end):])
+        self.write(None)
+        self.frames[self.name] = self.sink
+        self.name = self.sink = None
+        self.buf = bytearray()
+        return rest
+
+    def partial_end(self):
+        """Returns the length of the longest suffix of `buf` that could begin the end
+        sequence, i.e. the bytes to hold back until more output arrives."""
+        i = self.buf.find(b"\n", max(0, len(self.buf) - len(self.end) + 1))
+        while i != -1:
+            if self.end.startswith(self.buf[i:]):
+                return len(self.buf) - i
+            i = self.buf.find(b"\n", i + 1)
+        return 0
+
+    def write(self, data):
+        """Writes `data` to the current sink (or closes it if `data` is None), timing the sink."""
+        start = time.perf_counter() if self.timer is not None else 0.0
+        if data is None:
+            self.sink.close()
+        else:
+            self.sink.write(data)
+        if self.timer is not None:
+            self.sink_seconds += time.perf_counter() - start
+
+    def output(self):
+        """Returns the text printed outside of frames (truncated to `MAX_TEXT`)."""
+        return self.text.decode("utf-8", errors="replace")
+
+    def abort(self):
+        """Aborts the unterminated frame, if any, and every completed frame."""
+        if self.sink is not None:
+            self.sink.abort()
+            self.name = self.sink = None
+        for sink in self.frames.values():
+            sink.abort()
+        self.frames = {}
+
+    def commit(self):
+        """Commits every completed frame (aborting an unterminated one); returns their names."""
+        if self.sink is not None:
+            self.sink.abort()
+            self.name = self.sink = None
+        for sink in self.frames.values():
+            sink.commit()
+        return list(self.frames)
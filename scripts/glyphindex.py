@@ -0,0 +1,152 @@
+"""Per-glyph sidecar index for lazily loading only the glyphs a string needs.
+
+For each font, two files are written next to `{font_name}.json.gz`:
+
+* `{font_name}.glyphs.{hash}.bin`: the glyphs' JSON (as produced by
+  `Glyph::to_json`), sorted by character and grouped into blocks of
+  `BLOCK_GLYPHS` glyphs; each block is an independent gzip member. `hash` is
+  a hash of the payload content.
+* `{font_name}.glyphs.json`: the font metrics plus the index, e.g.
+
+      {"id": "baloo", "horiz_adv_x": 540, "units_per_em": 1000,
+       "ascent": 800, "descent": -200,
+       "payload": "baloo.glyphs.5d0e4c1f3a9b8e27.bin",
+       "blocks": [{"offset": 0, "length": 1234}, ...],
+       "glyphs": {"A": {"block": 0, "start": 0, "end": 210}, ...}}
+
+  where `offset`/`length` locate a compressed block in the `payload` file and
+  `start`/`end` locate a glyph's JSON bytes within the decompressed block.
+
+A rewrite adds a new payload and then switches the index to it with a single
+rename, keeping the previous payload until the next rewrite, so a reader
+always reads the byte ranges of the payload its index was written for.
+
+`load_font_lazy` returns a font dict whose `glyphs` only decodes the blocks
+that are actually looked up. The MoonBit counterpart is
+`@loader.load_font_for_text`.
+"""
+import glob
+import gzip
+import hashlib
+import json
+import os
+
+BLOCK_GLYPHS = 32
+INDEX_SUFFIX = ".glyphs.json"
+PAYLOAD_SUFFIX = ".bin"
+HASH_LENGTH = 16
+METRICS = ["id", "horiz_adv_x", "units_per_em", "ascent", "descent"]
+
+def write_glyph_index(font, outdir, font_name, block_glyphs=BLOCK_GLYPHS, compression_level=6):
+    """Writes the `{font_name}.glyphs.json` index and `.glyphs.bin` payload for a font dict."""
+    index = {key: font[key] for key in METRICS}
+    index["blocks"] = []
+    index["glyphs"] = {}
+    chars = sorted(font["glyphs"])
+    payload = bytearray()
+    for block_num, i in enumerate(range(0, len(chars), block_glyphs)):
+        block = bytearray()
+        for c in chars[i:i + block_glyphs]:
+            data = json.dumps(font["glyphs"][c], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            index["glyphs"][c] = {"block": block_num, "start": len(block), "end": len(block) + len(data)}
+            block += data
+        compressed = gzip.compress(bytes(block), compresslevel=compression_level, mtime=0)
+        index["blocks"].append({"offset": len(payload), "length": len(compressed)})
+        payload += compressed
+    digest = hashlib.sha256(payload).hexdigest()[:HASH_LENGTH]
+    index["payload"] = f"{font_name}.glyphs.{digest}{PAYLOAD_SUFFIX}"
+    payload_path = os.path.join(outdir, index["payload"])
+    if not os.path.exists(payload_path):
+        with open(payload_path + ".tmp", "wb") as f:
+            f.write(payload)
+        os.replace(payload_path + ".tmp", payload_path)
+
+    previous = glyph_index_payload(outdir, font_name)
+    index_path = os.path.join(outdir, font_name + INDEX_SUFFIX)
+    with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(index_path + ".tmp", index_path)
+    # A reader may still hold the previous index; older payloads go.
+    keep = {payload_path, previous}
+    for path in payload_paths(outdir, font_name):
+        if path not in keep:
+            os.remove(path)
+
+def payload_paths(outdir, font_name):
+    """Returns the paths of all the payloads of a font in `outdir`."""
+    return glob.glob(os.path.join(glob.escape(outdir), f"{glob.escape(font_name)}.glyphs.*{PAYLOAD_SUFFIX}"))
+
+def glyph_index_payload(fonts_dir, font_name):
+    """Returns the path of the payload that a font's index refers to, or None if
+    the font has no index or its payload is missing."""
+    try:
+        with open(os.path.join(fonts_dir, font_name + INDEX_SUFFIX), "r", encoding="utf-8") as f:
+            path = os.path.join(fonts_dir, json.load(f)["payload"])
+    except (OSError, ValueError, KeyError):
+        return None
+    return path if os.path.exists(path) else None
+
+def remove_glyph_index(outdir, font_name):
+    """Removes a font's sidecar files, if any."""
+    path = os.path.join(outdir, font_name + INDEX_SUFFIX)
+    if os.path.exists(path):
+        os.remove(path)
+    for path in payload_paths(outdir, font_name):
+        os.remove(path)
+
+class LazyGlyphs:
+    """Read-only {char: glyph} mapping that decompresses blocks on first use."""
+
+    def __init__(self, payload_path, blocks, index):
+        self.payload_path = payload_path
+        self.blocks = blocks
+        self.index = index
+        self.decoded = {}
+        self.glyphs = {}
+
+    def block(self, block_num):
+        data = self.decoded.get(block_num)
+        if data is None:
+            entry = self.blocks[block_num]
+            with open(self.payload_path, "rb") as f:
+                f.seek(entry["offset"])
+                data = gzip.decompress(f.read(entry["length"]))
+            self.decoded[block_num] = data
+        return data
+
+    def get(self, c, default=None):
+        glyph = self.glyphs.get(c)
+        if glyph is not None:
+            return glyph
+        ref = self.index.get(c)
+        if ref is None:
+            return default
+        glyph = json.loads(self.block(ref["block"])[ref["start"]:ref["end"]])
+        self.glyphs[c] = glyph
+        return glyph
+
+    def __getitem__(self, c):
+        glyph = self.get(c)
+        if glyph is None:
+            raise KeyError(c)
+        return glyph
+
+    def __contains__(self, c):
+        return c in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+def has_glyph_index(fonts_dir, font_name):
+    return glyph_index_payload(fonts_dir, font_name) is not None
+
+def load_font_lazy(fonts_dir, font_name):
+    """Returns a font dict whose `glyphs` are decoded lazily from the sidecar files."""
+    with open(os.path.join(fonts_dir, font_name + INDEX_SUFFIX), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    font = {key: index[key] for key in METRICS}
+    font["glyphs"] = LazyGlyphs(os.path.join(fonts_dir, index["payload"]), index["blocks"], index["glyphs"])
+    return font
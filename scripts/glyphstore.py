@@ -0,0 +1,216 @@
+"""Content-addressed glyph store shared by all the fonts in `all-fonts/`.
+
+Font families repeat many byte-identical glyphs (digits, punctuation and
+symbols of `aileron_black` and `aileron_blackitalic`, say). With
+`compress-all-fonts.py --glyph-store`, each unique glyph is stored once,
+under the hash of its JSON, and each font becomes a small table:
+
+* `glyphstore/{version}/{owner}.json.gz`: {hash: glyph} for the glyphs first
+  seen in the font `owner` (fonts are visited in sorted order, so the
+  variants of a family mostly point at the shard of its first variant);
+  `version` is a hash of the store content,
+* `{font_name}.table.json.gz`: the font metrics plus the store version and
+  shards it uses and its glyph hashes, e.g.
+
+      {"id": "baloo", "horiz_adv_x": 540, "units_per_em": 1000,
+       "ascent": 800, "descent": -200, "store": "5d0e4c1f3a9b8e27",
+       "shards": ["baloo"], "glyphs": {"A": "3f9c0e51d2a4b786", ...}}
+
+* `glyphstore/index.json`: the fonts and version of the current store.
+
+A rebuild writes a new version directory and only then rewrites the tables,
+and it keeps the previous version until the next rebuild, so a reader never
+sees a table whose shards are missing or have changed.
+
+Decoded shards are kept in a cache shared by all fonts, so fonts that share
+glyphs also share the decoded glyph dicts. The MoonBit counterpart is
+`@loader.load_font`, which falls back to the table when there is no
+`{font_name}.json.gz`.
+"""
+import collections
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from glyphindex import METRICS
+
+STORE_DIR = "glyphstore"
+STORE_INDEX = "index.json"
+TABLE_SUFFIX = ".table.json.gz"
+HASH_LENGTH = 16
+
+# Shards decoded while rebuilding the store (which can read every font).
+REBUILD_SHARD_CACHE = 64
+
+class GlyphStoreError(Exception):
+    """Raised when a font table refers to a glyph or shard the store does not have."""
+
+def glyph_hash(glyph):
+    """Returns the content hash of a glyph dict."""
+    data = json.dumps(glyph, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+def has_store_table(fonts_dir, font_name):
+    return os.path.exists(os.path.join(fonts_dir, font_name + TABLE_SUFFIX))
+
+def read_json_gz(path):
+    with gzip.open(path, "rb") as f:
+        return json.load(f)
+
+def write_json_gz(data, path, compression_level):
+    """Writes `data` gzipped to `path`, keeping an existing file whose content is identical."""
+    blob = gzip.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                         compresslevel=compression_level, mtime=0)
+    try:
+        with open(path, "rb") as f:
+            if f.read() == blob:
+                return
+    except OSError:
+        pass
+    with open(path + ".tmp", "wb") as f:
+        f.write(blob)
+    os.replace(path + ".tmp", path)
+
+class ShardCache:
+    """Decoded shards ({hash: glyph}) by path, optionally bounded (least recently used first out)."""
+
+    def __init__(self, max_shards=None):
+        self.max_shards = max_shards
+        self.shards = collections.OrderedDict()
+
+    def get(self, path):
+        shard = self.shards.get(path)
+        if shard is None:
+            shard = read_json_gz(path)
+            self.shards[path] = shard
+            if self.max_shards and len(self.shards) > self.max_shards:
+                self.shards.popitem(last=False)
+        else:
+            self.shards.move_to_end(path)
+        return shard
+
+# The cache shared by the fonts loaded with `load_store_font`.
+SHARD_CACHE = ShardCache()
+
+def load_store_font(fonts_dir, font_name, cache=SHARD_CACHE):
+    """Returns the font dict of `font_name`, resolving its table through the glyph store."""
+    table = read_json_gz(os.path.join(fonts_dir, font_name + TABLE_SUFFIX))
+    store_dir = os.path.join(fonts_dir, STORE_DIR, table["store"])
+    glyphs = {}
+    for shard_name in table["shards"]:
+        shard_path = os.path.join(store_dir, f"{shard_name}.json.gz")
+        try:
+            shard = cache.get(shard_path)
+        except OSError as e:
+            raise GlyphStoreError(f"{font_name}: cannot read glyph store shard {shard_path}: {e}")
+        for char, h in table["glyphs"].items():
+            if char not in glyphs and h in shard:
+                glyphs[char] = shard[h]
+    missing = [char for char in table["glyphs"] if char not in glyphs]
+    if missing:
+        raise GlyphStoreError(f"{font_name}: {len(missing)} glyphs missing from the glyph store in {store_dir}")
+    font = {key: table[key] for key in METRICS}
+    font["glyphs"] = glyphs
+    return font
+
+def read_store_index(outdir):
+    """Returns the `glyphstore/index.json` of `outdir`, or {} if there is none."""
+    try:
+        with open(os.path.join(outdir, STORE_DIR, STORE_INDEX), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def store_version(owners):
+    """Returns the content hash that names the store of `owners` ({glyph hash: owner font})."""
+    data = json.dumps(sorted(owners.items()), separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+def store_is_current(outdir, font_names):
+    """Returns True if the store was built from exactly `font_names` and has all their tables
+    (and no `.json.gz` waits to be moved into it)."""
+    index = read_store_index(outdir)
+    if "version" not in index or not os.path.isdir(os.path.join(outdir, STORE_DIR, index["version"])):
+        return False
+    return sorted(index.get("fonts", [])) == sorted(font_names) and all(
+        has_store_table(outdir, name) and not os.path.exists(os.path.join(outdir, f"{name}.json.gz"))
+        for name in font_names)
+
+def read_font(outdir, font_name, cache):
+    """Reads a font from its `.json.gz` if there is one, else from the (current) store."""
+    path = os.path.join(outdir, f"{font_name}.json.gz")
+    if os.path.exists(path):
+        return read_json_gz(path)
+    return load_store_font(outdir, font_name, cache)
+
+def write_glyph_store(outdir, font_names, compression_level=6):
+    """Rebuilds the glyph store and the font tables of `font_names` and removes their
+    `.json.gz` files. Returns (fonts, glyphs, unique glyphs).
+
+    Fonts are read from their `.json.gz` or from the current store. The new
+    store is written to its own version directory before any table points at
+    it; older versions than the one it replaces are then removed.
+    """
+    font_names = sorted(font_names)
+    cache = ShardCache(REBUILD_SHARD_CACHE)
+    owners = {}
+    total = 0
+    for name in font_names:
+        for glyph in read_font(outdir, name, cache)["glyphs"].values():
+            owners.setdefault(glyph_hash(glyph), name)
+            total += 1
+
+    store_dir = os.path.join(outdir, STORE_DIR)
+    version = store_version(owners)
+    version_dir = os.path.join(store_dir, version)
+    # A complete version directory has exactly this content already.
+    new_dir = None if os.path.isdir(version_dir) else version_dir + ".tmp"
+    if new_dir is not None:
+        shutil.rmtree(new_dir, ignore_errors=True)
+        os.makedirs(new_dir)
+
+    tables = {}
+    for name in font_names:
+        font = read_font(outdir, name, cache)
+        hashes = {char: glyph_hash(glyph) for char, glyph in font["glyphs"].items()}
+        shard = {h: font["glyphs"][char] for char, h in hashes.items() if owners[h] == name}
+        if shard and new_dir is not None:
+            write_json_gz(shard, os.path.join(new_dir, f"{name}.json.gz"), compression_level)
+        table = {key: font[key] for key in METRICS}
+        table["store"] = version
+        table["shards"] = sorted({owners[h] for h in hashes.values()})
+        table["glyphs"] = hashes
+        tables[name] = table
+    if new_dir is not None:
+        os.replace(new_dir, version_dir)
+
+    # Only now can tables point at the new version.
+    for name, table in tables.items():
+        write_json_gz(table, os.path.join(outdir, name + TABLE_SUFFIX), compression_level)
+        path = os.path.join(outdir, f"{name}.json.gz")
+        if os.path.exists(path):
+            os.remove(path)
+
+    previous = read_store_index(outdir).get("version")
+    index_path = os.path.join(store_dir, STORE_INDEX)
+    with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"fonts": font_names, "version": version, "glyphs": total, "unique_glyphs": len(owners)}, f, indent=1)
+        f.write("\n")
+    os.replace(index_path + ".tmp", index_path)
+    # A reader may still hold a table of the previous version; older ones go.
+    for entry in os.listdir(store_dir):
+        if entry not in (version, previous, STORE_INDEX):
+            path = os.path.join(store_dir, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+    return len(font_names), total, len(owners)
+
+def remove_store_table(outdir, font_name):
+    """Removes a font's table, if any. Its glyphs leave the store when it is rebuilt."""
+    path = os.path.join(outdir, font_name + TABLE_SUFFIX)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,235 @@
+"""Shared asyncio runner for the subprocess jobs of the scripts.
+
+The compress, sample and render scripts spend nearly all of their time
+waiting for `moon run` (or the renderer binary). Rather than parking a
+Python worker process or thread on each of those, every job is an
+`asyncio.create_subprocess_exec` child of one event loop, and a semaphore
+bounds how many run at once (`--workers`).
+
+Each run streams the program's stdout through a `framing.FrameReader`, can
+be given a timeout (`--timeout`), and is retried with exponential backoff
+(`--retries`) when it fails in a way that looks transient (see
+`is_transient`). Cancellation, including Ctrl-C under `run_main`, kills the
+running programs, aborts their partial outputs and lets the `async with`
+blocks of `buildcache.async_project_dir` remove their temporary projects.
+"""
+import asyncio
+import os
+import re
+import signal
+import sys
+import time
+
+from framing import STREAM_CHUNK_SIZE, FrameReader
+from timings import TIMINGS
+
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+
+# Seconds between two samples of the RSS of the running jobs' process trees.
+RSS_SAMPLE_INTERVAL = 0.25
+
+# Failures worth retrying: the program was killed (e.g. by the OOM killer), or
+# stderr reports a temporary resource or file-system condition.
+TRANSIENT_RE = re.compile(
+    r"Resource temporarily unavailable|Too many open files|Cannot allocate memory|Text file busy|"
+    r"Device or resource busy|No space left on device")
+
+class JobTimeout(Exception):
+    """Raised when a job is still running after its timeout."""
+
+def is_transient(returncode, stderr):
+    """Returns True if a failed run is worth retrying."""
+    return returncode == -signal.SIGKILL or bool(TRANSIENT_RE.search(stderr))
+
+def add_runner_arguments(parser, workers=True):
+    """Adds the shared job-runner options to an argparse parser."""
+    if workers:
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help=f"Maximum number of programs running at once (default: {os.cpu_count() or 1})")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds after which a program is killed and its job fails (default: no timeout)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help=f"Retries, with exponential backoff, of a program that fails transiently (default: {DEFAULT_RETRIES})")
+
+def runner_options(args):
+    """Returns the `JobRunner` keyword arguments from parsed args."""
+    return {
+        "concurrency": getattr(args, "workers", 1),
+        "timeout": args.timeout,
+        "retries": args.retries,
+    }
+
+def process_tree_rss():
+    """Returns a function mapping a pid to the total RSS (bytes) of its process tree,
+    from one scan of /proc, or None if /proc is not available."""
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return None
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    children = {}
+    rss = {}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces and parentheses; fields follow the last ')'.
+        fields = stat[stat.rfind(b")") + 2:].split()
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss[pid] = int(fields[21]) * page_size
+
+    def tree_rss(root):
+        total, stack = 0, [root]
+        while stack:
+            pid = stack.pop()
+            total += rss.get(pid, 0)
+            stack.extend(children.get(pid, ()))
+        return total
+    return tree_rss
+
+def kill_process_group(proc):
+    """Kills `proc` and the processes it started."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+class JobRunner:
+    """Runs subprocess jobs on the current event loop, at most `concurrency` at a time."""
+
+    def __init__(self, concurrency=1, timeout=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.tracked = {}
+        self.sampler = None
+
+    async def run_framed(self, cmd, open_sink, cwd=None, env=None, input=None, usage=None, job=None, compiles=True):
+        """Runs `cmd`, streaming its stdout through a `FrameReader`.
+
+        `input` (a str) is written to the program's stdin. If `usage` is a
+        dict, the job's "seconds" (including retries and the wait for a
+        free slot) and "peak_rss" (bytes, the largest sampled RSS of the
+        program and its descendants, or None if unknown) are stored in it.
+        Phase timings are recorded under `job` (default: the program name,
+        see `timings.py`): "build" until the first frame and "run" after it,
+        or only "run" if the program does not `compiles`. Returns
+        (returncode, reader, stderr text) of the last attempt; the caller
+        commits or aborts the reader's frames. Raises `JobTimeout`.
+        """
+        job = job or os.path.basename(cmd[0])
+        start = time.monotonic()
+        attempt = 0
+        try:
+            while True:
+                async with self.semaphore:
+                    returncode, reader, stderr = await self.run_once(cmd, open_sink, cwd, env, input, usage, job, compiles, attempt)
+                if returncode == 0 or attempt >= self.retries or not is_transient(returncode, stderr):
+                    return returncode, reader, stderr
+                reader.abort()
+                attempt += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+        finally:
+            if usage is not None:
+                usage["seconds"] = time.monotonic() - start
+                usage.setdefault("peak_rss", None)
+
+    async def run_once(self, cmd, open_sink, cwd, env, input, usage, job, compiles, attempt):
+        reader = FrameReader(open_sink, TIMINGS.timer(job))
+        start = TIMINGS.now()
+        # In its own process group, so that the programs `moon` starts can be killed with it.
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, cwd=cwd, env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+            start_new_session=True)
+        if usage is not None:
+            self.track(proc.pid, usage)
+        try:
+            return await asyncio.wait_for(self.communicate(proc, reader, input), self.timeout)
+        except asyncio.TimeoutError:
+            raise JobTimeout(f"{os.path.basename(cmd[0])} was still running after {self.timeout:g}s")
+        finally:
+            self.tracked.pop(proc.pid, None)
+            if proc.returncode is None:
+                # Cancelled or timed out: stop the program and drop its partial outputs.
+                kill_process_group(proc)
+                await proc.wait()
+                reader.abort()
+            end = TIMINGS.now()
+            args = {"attempt": attempt + 1, "returncode": proc.returncode}
+            split = reader.first_frame_at if compiles else start
+            if compiles:
+                TIMINGS.record(job, "build", start, split or end, **args)
+            if split is not None:
+                TIMINGS.record(job, "run", split, end, **args)
+
+    async def communicate(self, proc, reader, input):
+        async def write_input():
+            try:
+                proc.stdin.write(input.encode("utf-8"))
+                await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            proc.stdin.close()
+
+        tasks = [asyncio.ensure_future(proc.stderr.read())]
+        if input is not None:
+            tasks.append(asyncio.ensure_future(write_input()))
+        try:
+            while True:
+                chunk = await proc.stdout.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                # Sinks may compress; zlib releases the GIL, so feed off the loop.
+                feed = asyncio.ensure_future(asyncio.to_thread(reader.feed, chunk))
+                try:
+                    await asyncio.shield(feed)
+                except asyncio.CancelledError:
+                    # Let the sink finish writing before it is aborted.
+                    await feed
+                    raise
+            stderr = await tasks[0]
+            returncode = await proc.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+        return returncode, reader, stderr.decode("utf-8", errors="replace")
+
+    def track(self, pid, usage):
+        """Samples the RSS of `pid`'s process tree into `usage["peak_rss"]` while it runs."""
+        self.tracked[pid] = usage
+        if self.sampler is None or self.sampler.done():
+            self.sampler = asyncio.ensure_future(self.sample_rss())
+
+    async def sample_rss(self):
+        while self.tracked:
+            tree_rss = await asyncio.to_thread(process_tree_rss)
+            if tree_rss is None:
+                return
+            for pid, usage in list(self.tracked.items()):
+                rss = tree_rss(pid)
+                if rss and rss > (usage.get("peak_rss") or 0):
+                    usage["peak_rss"] = rss
+            await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+def run_main(coro):
+    """Runs `coro` with `asyncio.run`; on Ctrl-C its jobs are cancelled and cleaned up,
+    and the script exits with status 130."""
+    try:
+        return asyncio.run(coro)
+    except KeyboardInterrupt:
+        print("Interrupted.", file=sys.stderr)
+        sys.exit(130)
+
+def run_job(cmd, open_sink, runner_options=None, **kwargs):
+    """Runs one `JobRunner.run_framed` job from synchronous code (see `run_main`).
+
+    `runner_options` are `JobRunner` keyword arguments; `kwargs` go to `run_framed`.
+    """
+    async def run():
+        return await JobRunner(**(runner_options or {})).run_framed(cmd, open_sink, **kwargs)
+    return run_main(run())
@@ -0,0 +1,110 @@
+"""Single-pass scanner of the `../mbt-fonts-*` sources.
+
+Each `.mbt` file is memory-mapped and scanned as raw bytes: newlines are
+counted and over-long lines are located without decoding the file as UTF-8.
+One pass yields both the line-count check (`MAX_NUM_LINES`) and the
+line-length check (`MAX_LINE_LENGTH`), plus the file size for a histogram.
+Files are scanned on a process pool.
+
+Line lengths are in bytes and, as before, include the trailing newline.
+"""
+import concurrent.futures
+import glob
+import mmap
+import os
+import re
+
+# Maximum allowed number of lines in a single .mbt file.
+MAX_NUM_LINES = 65500
+
+# Maximum allowed length of a single line of an .mbt file.
+MAX_LINE_LENGTH = 65500
+
+SKIP_DIRS = ("target", ".mooncakes")
+
+COUNT_CHUNK_SIZE = 16 * 1024 * 1024
+
+def find_mbt_files(pattern=os.path.join("..", "mbt-fonts-*")):
+    """Returns the sorted *.mbt files under the directories matching `pattern`,
+    skipping `target` and `.mooncakes` directories."""
+    paths = []
+    for base_dir in sorted(glob.glob(pattern)):
+        if not os.path.isdir(base_dir):
+            continue
+        for root, dirs, files in os.walk(base_dir):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            paths.extend(os.path.join(root, file) for file in files if file.endswith(".mbt"))
+    return sorted(paths)
+
+def count_newlines(mm, start, end):
+    """Returns the number of newlines in mm[start:end], reading it in bounded chunks."""
+    count = 0
+    while start < end:
+        stop = min(end, start + COUNT_CHUNK_SIZE)
+        count += mm[start:stop].count(b"\n")
+        start = stop
+    return count
+
+def scan_file(path, max_line_length=MAX_LINE_LENGTH):
+    """Returns {path, size, lines, long_lines: [[line number, length], ...]} for one file,
+    or {path, error} if it cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return {"path": path, "size": 0, "lines": 0, "long_lines": []}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Anchored at line starts so that each line is matched at most once.
+                # A line is too long if its bytes plus its newline exceed the limit.
+                long_re = re.compile(rb"(?m)^[^\n]{%d,}" % max(1, max_line_length))
+                long_lines = []
+                line = 1
+                pos = 0
+                for m in long_re.finditer(mm):
+                    line += count_newlines(mm, pos, m.start())
+                    pos = m.start()
+                    length = m.end() - m.start() + (1 if m.end() < size else 0)
+                    if length > max_line_length:
+                        long_lines.append([line, length])
+                lines = count_newlines(mm, 0, size)
+                if mm[size - 1] != ord("\n"):
+                    lines += 1
+    except (OSError, ValueError) as e:
+        return {"path": path, "error": str(e)}
+    return {"path": path, "size": size, "lines": lines, "long_lines": long_lines}
+
+def scan_files(paths, workers=None, max_line_length=MAX_LINE_LENGTH):
+    """Scans `paths` on a process pool; returns their `scan_file` results in order."""
+    if not paths:
+        return []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    if workers == 1:
+        return [scan_file(path, max_line_length) for path in paths]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        lengths = [max_line_length] * len(paths)
+        return list(executor.map(scan_file, paths, lengths, chunksize=4))
+
+def size_histogram(results):
+    """Returns [{"max_bytes": 2**k, "files": n}, ...] of the scanned files' sizes."""
+    buckets = {}
+    for result in results:
+        if "error" in result:
+            continue
+        bound = 1 << max(0, result["size"] - 1).bit_length()
+        buckets[bound] = buckets.get(bound, 0) + 1
+    return [{"max_bytes": bound, "files": buckets[bound]} for bound in sorted(buckets)]
+
+def summarize(results, max_num_lines=MAX_NUM_LINES, max_line_length=MAX_LINE_LENGTH):
+    """Returns the JSON report of a scan: both checks, the size histogram and any errors."""
+    files = [r for r in results if "error" not in r]
+    return {
+        "max_num_lines": max_num_lines,
+        "max_line_length": max_line_length,
+        "files": len(files),
+        "total_bytes": sum(r["size"] for r in files),
+        "long_files": [{"path": r["path"], "lines": r["lines"]} for r in files if r["lines"] > max_num_lines],
+        "long_lines": [{"path": r["path"], "line": line, "length": length}
+                       for r in files for line, length in r["long_lines"]],
+        "size_histogram": size_histogram(files),
+        "errors": [{"path": r["path"], "error": r["error"]} for r in results if "error" in r],
+    }
@@ -0,0 +1,311 @@
+"""SVG path tokenizing and the pre-parsed numeric glyph encoding (`PackedGlyph`).
+
+A packed glyph replaces the `d` path string and its `gerber_lp` flags with
+one opcode per command (`ops`) plus a flat array of absolute x,y parameters,
+mirroring `PackedGlyph` in `packed-glyph.mbt`:
+
+* `M` starts a dark subpath and `m` a clear subpath (1 x,y pair),
+* `L` (1 pair), `Q` (2 pairs), `C` (3 pairs) and `Z` (no pairs).
+
+In JSON (`{font_name}.packed.json.gz`, a `PackedFont`), `params` is the
+base64 encoding of the parameters as little-endian doubles. Once decoded
+into an `array('d')`, a glyph can be translated or scaled with arithmetic
+only, without re-tokenizing its SVG path.
+"""
+import base64
+import decimal
+import gzip
+import json
+import math
+import os
+import re
+import sys
+from array import array
+
+SPLIT_RE = re.compile(r"([MLCQZmlcqz])([0-9.\-,\s]*)")
+PARAM_RE = re.compile(r"-?[0-9.]+")
+
+PACKED_SUFFIX = ".packed.json.gz"
+OP_PAIRS = {'M': 1, 'm': 1, 'L': 1, 'Q': 2, 'C': 3, 'Z': 0}
+
+# Grid that `optimize_path` rounds to without `--precision`: far below a font unit.
+DEFAULT_PRECISION = 1e-6
+
+class FontError(Exception):
+    """Raised when a font cannot be found or its path data cannot be parsed."""
+
+def mbt_num(val):
+    """Formats a float the way MoonBit's `Double::to_string` does."""
+    if val == int(val) and abs(val) < 1e21:
+        return str(int(val))
+    return repr(val)
+
+def round_to_fixed(val, digits):
+    """Port of `@geom.round_to_fixed`."""
+    exp = 10.0 ** digits
+    v = val * exp
+    return math.copysign(math.floor(abs(v) + 0.5), v) / exp
+
+def split_path(d):
+    """Splits an SVG path into a list of (command, [params]), like `split_path`.
+
+    Absolute commands are returned as written, including implicitly repeated
+    segments (`L1 2 3 4`); relative commands are resolved into one absolute
+    `M`, `L`, `C`, `Q` or `Z` per segment.
+    """
+    cmds = []
+    pos = 0
+    x = y = start_x = start_y = 0.0
+    while pos < len(d):
+        m = SPLIT_RE.match(d, pos)
+        if not m or m.end() == pos:
+            raise FontError(f"split_path: unable to parse SVG params: {d[pos:]}")
+        try:
+            params = [float(p) for p in PARAM_RE.findall(m.group(2))]
+        except ValueError as e:
+            raise FontError(f"parse_params: unable to parse double: {e}")
+        pos = m.end()
+        c = m.group(1)
+        relative = c in "mlcq"
+        n = OP_PAIRS[c.upper()] * 2
+        if c in "Zz":
+            x, y = start_x, start_y
+            cmds.append(('Z', params))
+        elif not relative:
+            if len(params) >= 2:
+                x, y = params[-2], params[-1]
+                if c == 'M':
+                    start_x, start_y = params[0], params[1]
+            cmds.append((c, params))
+        elif not params or len(params) % n != 0:
+            raise FontError(f"split_path: unexpected number of params for '{c}': {params}")
+        else:
+            for i in range(0, len(params), n):
+                base_x, base_y = (x, y) if relative else (0.0, 0.0)
+                segment = [(base_x if j % 2 == 0 else base_y) + params[i + j] for j in range(n)]
+                abs_c = 'L' if c in "Mm" and i > 0 else c.upper()
+                x, y = segment[-2], segment[-1]
+                if abs_c == 'M':
+                    start_x, start_y = x, y
+                cmds.append((abs_c, segment))
+    return cmds
+
+def split_segments(cmds):
+    """Yields the absolute `cmds` of `split_path` with one segment per command
+    (the pairs after the first of a moveto being linetos)."""
+    for c, params in cmds:
+        n = OP_PAIRS[c] * 2
+        if c == 'Z' or len(params) <= n or len(params) % n != 0:
+            yield c, params
+            continue
+        for i in range(0, len(params), n):
+            yield ('L' if c == 'M' and i > 0 else c), params[i:i + n]
+
+def path_bbox(cmds):
+    """Returns the (xmin, ymin, xmax, ymax) of the points of absolute `cmds`, like `glyph_bbox`."""
+    xs = [p for _, params in cmds for p in params[0::2]]
+    ys = [p for _, params in cmds for p in params[1::2]]
+    if not xs:
+        return (0.0, 0.0, 0.0, 0.0)
+    return (min(xs), min(ys), max(xs), max(ys))
+
+def grid_decimals(precision):
+    """Returns the number of decimals needed to print multiples of `precision`."""
+    return max(0, -decimal.Decimal(repr(precision)).normalize().as_tuple().exponent)
+
+def format_coord(val, decimals):
+    s = f"{val:.{decimals}f}"
+    if decimals:
+        s = s.rstrip('0').rstrip('.')
+    return "0" if s == "-0" else s
+
+def optimize_path(d, precision=None, relative=False):
+    """Rewrites an SVG path with its coordinates rounded to multiples of `precision`
+    font units (default: 1e-6) and, with `relative`, as relative commands.
+
+    Repeated command letters are dropped (`L1 2 3 4`) and a minus sign doubles
+    as a separator. Returns (new d, absolute commands of the new path).
+    """
+    q = precision or DEFAULT_PRECISION
+    decimals = grid_decimals(q)
+    out = []
+    rounded = []
+    prev = None
+    # The current point and subpath start, as multiples of `q`.
+    x = y = start_x = start_y = 0
+    for c, params in split_segments(split_path(d)):
+        grid = [int(math.copysign(math.floor(abs(p / q) + 0.5), p)) for p in params]
+        rounded.append((c, [n * q for n in grid]))
+        if c == 'Z':
+            x, y = start_x, start_y
+            out.append('z' if relative else 'Z')
+            prev = None
+            continue
+        if relative and out:
+            values = [n - (x if i % 2 == 0 else y) for i, n in enumerate(grid)]
+            letter = c.lower()
+        else:
+            values = grid
+            letter = c
+        if grid:
+            x, y = grid[-2], grid[-1]
+        if c == 'M':
+            start_x, start_y = x, y
+        # An implicit command after a moveto is a lineto, so keep every moveto's letter.
+        implicit = letter == prev and c != 'M'
+        if not implicit:
+            out.append(letter)
+        for i, v in enumerate(values):
+            s = format_coord(v * q, decimals)
+            if (i > 0 or implicit) and s[0] != '-':
+                out.append(' ')
+            out.append(s)
+        prev = letter
+    return "".join(out), rounded
+
+def optimize_glyph(glyph, precision=None, relative=False, tolerance=None):
+    """Returns `glyph` with its path rewritten by `optimize_path`, or None if that
+    moves an edge of the path's bounding box by more than `tolerance` font units
+    (default: `precision`).
+
+    The bounding box is shifted by how much the path's own bounding box moved.
+    """
+    if not glyph["d"]:
+        return glyph
+    d, rounded = optimize_path(glyph["d"], precision, relative)
+    before = path_bbox(split_path(glyph["d"]))
+    after = path_bbox(rounded)
+    limit = tolerance if tolerance is not None else (precision or DEFAULT_PRECISION)
+    if max(abs(a - b) for a, b in zip(after, before)) > limit:
+        return None
+    new = dict(glyph, d=d)
+    for key, a, b in zip(["xmin", "ymin", "xmax", "ymax"], after, before):
+        v = round(glyph[key] + a - b, 6)
+        new[key] = int(v) if v == int(v) else v
+    return new
+
+def optimize_font(font, precision=None, relative=False, tolerance=None):
+    """Rewrites the paths of a font dict in place (see `optimize_glyph`).
+
+    Glyphs that fail the tolerance check keep their original path. Returns
+    the number of glyphs kept as they were.
+    """
+    kept = 0
+    for c, glyph in font["glyphs"].items():
+        new = optimize_glyph(glyph, precision, relative, tolerance)
+        if new is None:
+            kept += 1
+        else:
+            font["glyphs"][c] = new
+    return kept
+
+def pack_glyph(glyph):
+    """Returns (ops, array('d') params) for a glyph dict, like `PackedGlyph::from_glyph`."""
+    ops = []
+    params = array('d')
+    gerber_lp = glyph["gerber_lp"]
+    gerber_index = 0
+    for c, p in split_path(glyph["d"]):
+        if c == 'Z':
+            ops.append('Z')
+            continue
+        op = c
+        if c == 'M':
+            if gerber_index >= len(gerber_lp):
+                raise FontError(f"gerber_lp index out of range: index={gerber_index}, length={len(gerber_lp)} for path '{glyph['char']}'")
+            op = 'm' if gerber_lp[gerber_index] == 'c' else 'M'
+            gerber_index += 1
+        n = OP_PAIRS[op] * 2
+        if not p or len(p) % n != 0:
+            raise FontError(f"unexpected number of params for '{c}' in path '{glyph['char']}'")
+        for i in range(0, len(p), n):
+            ops.append('L' if i > 0 and op in 'Mm' else op)
+        params.extend(p)
+    return "".join(ops), params
+
+def encode_params(params):
+    """Returns the base64 encoding of `params` as little-endian doubles."""
+    a = array('d', params)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return base64.b64encode(a.tobytes()).decode("ascii")
+
+def decode_params(s):
+    """Decodes `encode_params` output into an `array('d')`."""
+    a = array('d')
+    a.frombytes(base64.b64decode(s))
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a
+
+def encode_glyph(glyph):
+    """Returns the `PackedGlyph` JSON dict for a `Glyph` JSON dict."""
+    ops, params = pack_glyph(glyph)
+    return {
+        "char": glyph["char"],
+        "horiz_adv_x": glyph["horiz_adv_x"],
+        "ops": ops,
+        "params": encode_params(params),
+        "xmin": glyph["xmin"],
+        "ymin": glyph["ymin"],
+        "xmax": glyph["xmax"],
+        "ymax": glyph["ymax"],
+    }
+
+def decode_glyph(packed):
+    """Returns a glyph dict with `ops`, an `array('d')` of `params` and `gerber_lp`."""
+    glyph = dict(packed)
+    glyph["params"] = decode_params(packed["params"])
+    glyph["gerber_lp"] = "".join('c' if op == 'm' else 'd' for op in packed["ops"] if op in 'Mm')
+    want = sum(OP_PAIRS[op] * 2 for op in packed["ops"])
+    if want != len(glyph["params"]):
+        raise FontError(f"packed glyph '{packed['char']}': ops require {want} params but found {len(glyph['params'])}")
+    return glyph
+
+def translate_packed(glyph, x, y, invert_y=False, offset=None):
+    """Like `translate_path`, but for a decoded packed glyph: arithmetic only.
+
+    `offset` is an optional (dx, dy) added after the move, giving the same
+    numbers as a second `translate_path` of the moved path.
+    """
+    y_scale = -1.0 if invert_y else 1.0
+    params = glyph["params"]
+    out = []
+    p = 0
+    for op in glyph["ops"]:
+        out.append('M' if op == 'm' else op)
+        for i in range(OP_PAIRS[op]):
+            if i > 0:
+                out.append(' ')
+            px = x + params[p]
+            py = y + y_scale * params[p + 1]
+            if offset is not None:
+                px, py = offset[0] + px, offset[1] + py
+            out.append(mbt_num(px))
+            out.append(' ')
+            out.append(mbt_num(py))
+            p += 2
+    return "".join(out)
+
+def write_packed_font(font, outdir, font_name, compression_level=6):
+    """Writes `{font_name}.packed.json.gz` (a `PackedFont`) for a font dict."""
+    packed = {key: font[key] for key in ["id", "horiz_adv_x", "units_per_em", "ascent", "descent"]}
+    packed["glyphs"] = {c: encode_glyph(g) for c, g in font["glyphs"].items()}
+    path = os.path.join(outdir, font_name + PACKED_SUFFIX)
+    with open(path + ".tmp", "wb") as raw:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=compression_level, mtime=0) as f:
+            f.write(json.dumps(packed, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    os.replace(path + ".tmp", path)
+
+def remove_packed_font(outdir, font_name):
+    """Removes a font's `{font_name}.packed.json.gz` sidecar, if any."""
+    path = os.path.join(outdir, font_name + PACKED_SUFFIX)
+    if os.path.exists(path):
+        os.remove(path)
+
+def load_packed_font(path):
+    """Loads a `{font_name}.packed.json.gz` file into a font dict of decoded glyphs."""
+    with gzip.open(path, "rb") as f:
+        font = json.load(f)
+    font["glyphs"] = {c: decode_glyph(g) for c, g in font["glyphs"].items()}
+    return font
@@ -2,65 +2,21 @@
 import argparse
 import os
 import sys
-import tempfile
-import subprocess
-import shutil
-import re
-from pathlib import Path
-
-def get_font_map():
-    """Reads all-fonts.txt and returns a map of family -> {variant: package_name}"""
-    if not os.path.exists("all-fonts.txt"):
-        print("Error: all-fonts.txt not found. Run scripts/enumerate-all-fonts.py first.")
-        sys.exit(1)
 
-    font_map = {}
-    with open("all-fonts.txt", "r") as f:
-        for line in f:
-            pkg = line.strip()
-            if not pkg: continue
-            # Example: gmlewis/fonts-a/abeezee_italic
-            parts = pkg.split('/')
-            full_name = parts[-1]
-
-            # Improved heuristic for family and variant
-            if '_' in full_name:
-                family, variant = full_name.rsplit('_', 1)
-                if variant in ['regular', 'italic', 'bold', 'bolditalic']:
-                    pass
-                elif 'italic' in variant and 'bold' in variant:
-                    variant = 'bolditalic'
-                elif 'bold' in variant:
-                    variant = 'bold'
-                elif 'italic' in variant:
-                    variant = 'italic'
-            else:
-                family = full_name
-                variant = 'regular'
-                if 'bolditalic' in full_name.lower(): variant = 'bolditalic'
-                elif 'bold' in full_name.lower(): variant = 'bold'
-                elif 'italic' in full_name.lower(): variant = 'italic'
-                elif 'regular' in full_name.lower(): variant = 'regular'
-
-            if family not in font_map:
-                font_map[family] = {}
-
-            if variant == 'regular' or variant not in font_map[family]:
-                font_map[family][variant] = pkg
-            elif variant in ['bold', 'italic', 'bolditalic']:
-                if '_' + variant in full_name:
-                    font_map[family][variant] = pkg
-
-    return font_map
-
-def find_best_font(family_query, font_map):
-    """Finds the best font family match."""
-    if family_query in font_map:
-        return family_query
-    matches = [f for f in font_map.keys() if f.startswith(family_query)]
-    if matches:
-        return matches[0]
-    return None
+from buildcache import add_cache_arguments, cache_options, project_dir
+from fontcatalog import CatalogError, format_info, load_catalog
+from framing import mbt_frame, output_sink
+from jobrunner import JobTimeout, add_runner_arguments, run_job, runner_options
+from renderer import RendererError, ensure_renderer, stream_renderer
+from timings import TIMINGS, add_timing_arguments, timing_options
+
+def get_catalog():
+    """Returns the font catalog of all-fonts.txt (see `fontcatalog.py`)."""
+    try:
+        return load_catalog()
+    except CatalogError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
 def generate_moon_mod(font_packages, root_dir):
     """Generates moon.mod.json content."""
@@ -142,11 +98,68 @@ def generate_main_mbt(lines, family_info, alignment, y_up):
 
     mbt.append(f"  let scene = @draw.column(lines, alignment=@geom.{mb_align}, spacing=0.2)")
 
-    mbt.append("  println(scene.to_json().stringify())")
+    mbt.extend(mbt_frame("json", "scene.to_json().stringify()"))
     mbt.append("}")
 
     return "\n".join(mbt)
 
+def render_with_renderer(lines, family_info, root_dir, args):
+    """Renders the lines with the precompiled renderer binary, streaming the JSON to the output."""
+    try:
+        binary = args.renderer or ensure_renderer(root_dir)
+    except RendererError as e:
+        print(e)
+        sys.exit(1)
+
+    output_format = "ndjson" if args.ndjson else "json"
+    ok, stdout, stderr = stream_renderer(binary, family_info, lines, args.align, args.y_up, output_format, root_dir,
+                                         lambda name: output_sink(args.output, timer=TIMINGS.timer("render")), runner_options(args))
+    if not ok:
+        print("Error running renderer:")
+        print("--- STDOUT ---", file=sys.stderr)
+        print(stdout, file=sys.stderr)
+        print("--- STDERR ---", file=sys.stderr)
+        print(stderr, file=sys.stderr)
+        sys.exit(1)
+
+def render_with_compile(lines, family_info, font_packages, root_dir, args):
+    """Renders the lines by generating and compiling a MoonBit project, streaming the JSON to the output."""
+    cache_dir, max_bytes = cache_options(args)
+    generate_start = TIMINGS.now()
+    files = {
+        "moon.mod.json": generate_moon_mod(font_packages, root_dir),
+        "moon.pkg.json": generate_moon_pkg(font_packages),
+        "main.mbt": generate_main_mbt(lines, family_info, args.align, args.y_up),
+    }
+    with project_dir(files, root_dir, cache_dir, max_bytes, prefix="moon-render-", keep=args.keep) as tmp_dir:
+        TIMINGS.record("render", "generate", generate_start, TIMINGS.now())
+        if args.keep:
+            print(f"Project directory: {tmp_dir}", file=sys.stderr)
+
+        try:
+            returncode, reader, stderr = run_job(["moon", "run", "main.mbt", "--target", "native"],
+                                                 lambda name: output_sink(args.output, timer=TIMINGS.timer("render")), runner_options(args),
+                                                 cwd=tmp_dir, job="render")
+        except JobTimeout as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        if returncode != 0 or "json" not in reader.frames:
+            reader.abort()
+            if returncode != 0:
+                print("Error running moon run:")
+            else:
+                print("Error: Could not find JSON content in moon output.")
+            print("--- STDOUT ---", file=sys.stderr)
+            print(reader.output(), file=sys.stderr)
+            print("--- STDERR ---", file=sys.stderr)
+            print(stderr, file=sys.stderr)
+            sys.exit(1)
+        reader.commit()
+
+        if args.keep:
+            print(f"Project kept at: {tmp_dir}", file=sys.stderr)
+
 def main():
     parser = argparse.ArgumentParser(description="Quickly render text to JSON using gmlewis/fonts")
     parser.add_argument("input", nargs="?", help="Input file (Markdown/Text) or string, defaults to stdin")
@@ -156,25 +169,39 @@ def main():
     parser.add_argument("--y-up", action="store_true", dest="y_up", help="Use y-up coordinates (default)")
     parser.add_argument("--y-down", action="store_false", dest="y_up", help="Use y-down coordinates")
     parser.set_defaults(y_up=True)
-    parser.add_argument("--keep", action="store_true", help="Keep the temporary MoonBit project directory")
+    parser.add_argument("--engine", choices=['renderer', 'compile'], default='renderer', help="Use the precompiled renderer (default) or compile a temporary MoonBit project")
+    parser.add_argument("--renderer", help="Path to a prebuilt renderer binary (default: build renderer/ on demand)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary MoonBit project directory (--engine=compile)")
+    parser.add_argument("--ndjson", action="store_true", help="Write one JSON record per line (graphic, bbox and baseline offset) as each line is laid out, then a column record (--engine=renderer)")
+    add_cache_arguments(parser)
+    add_runner_arguments(parser, workers=False)
+    add_timing_arguments(parser)
     parser.add_argument("--list-fonts", action="store_true", help="List all available font families and exit")
+    parser.add_argument("--font-info", action="store_true", help="With --list-fonts, also show the glyph count, units per em and size of each compressed family")
 
     args = parser.parse_args()
+    if args.ndjson and args.engine != "renderer":
+        parser.error("--ndjson requires --engine renderer")
+    timing_options(args)
 
-    font_map = get_font_map()
+    catalog = get_catalog()
 
     if args.list_fonts:
-        for family in sorted(font_map.keys()):
-            variants = ", ".join(font_map[family].keys())
-            print(f"{family} ({variants})")
+        # The first variant of each family stands for it in --font-info.
+        names = {family: next(iter(variants.values())).split('/')[-1] for family, variants in catalog.families.items()}
+        infos = catalog.info_many(names.values()) if args.font_info else {}
+        for family in catalog.family_names:
+            variants = ", ".join(catalog.families[family].keys())
+            entry = infos.get(names[family])
+            print(f"{family} ({variants}): {format_info(entry)}" if entry else f"{family} ({variants})")
         return
 
-    family = find_best_font(args.font, font_map)
+    family = catalog.find_family(args.font)
     if not family:
         print(f"Error: Could not find font family matching '{args.font}'")
         sys.exit(1)
 
-    family_info = font_map[family]
+    family_info = catalog.families[family]
     font_packages = list(family_info.values())
 
     if args.input:
@@ -194,59 +221,10 @@ def main():
         return
 
     root_dir = os.getcwd()
-    tmp_dir = tempfile.mkdtemp(prefix="moon-render-")
-    if args.keep:
-        print(f"Project directory: {tmp_dir}", file=sys.stderr)
-    try:
-        with open(os.path.join(tmp_dir, "moon.mod.json"), "w") as f:
-            f.write(generate_moon_mod(font_packages, root_dir))
-        with open(os.path.join(tmp_dir, "moon.pkg.json"), "w") as f:
-            f.write(generate_moon_pkg(font_packages))
-        with open(os.path.join(tmp_dir, "main.mbt"), "w") as f:
-            f.write(generate_main_mbt(lines, family_info, args.align, args.y_up))
-
-        result = subprocess.run(["moon", "run", "main.mbt", "--target", "native"], cwd=tmp_dir, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            print("Error running moon run:")
-            print("--- STDOUT ---", file=sys.stderr)
-            print(result.stdout, file=sys.stderr)
-            print("--- STDERR ---", file=sys.stderr)
-            print(result.stderr, file=sys.stderr)
-            if not args.keep:
-                print(f"Temp directory kept at: {tmp_dir}")
-            sys.exit(1)
-
-        json_content = result.stdout
-        lines = json_content.strip().splitlines()
-        json_output = None
-        for line in reversed(lines):
-            line = line.strip()
-            if line.startswith('{') and line.endswith('}'):
-                json_output = line
-                break
-        
-        if not json_output:
-            print("Error: Could not find JSON content in moon output.")
-            print("--- STDOUT ---", file=sys.stderr)
-            print(result.stdout, file=sys.stderr)
-            print("--- STDERR ---", file=sys.stderr)
-            print(result.stderr, file=sys.stderr)
-            if not args.keep:
-                print(f"Temp directory kept at: {tmp_dir}")
-            sys.exit(1)
-
-        if args.output:
-            with open(args.output, "w") as f:
-                f.write(json_output)
-        else:
-            print(json_output)
-
-        if args.keep:
-            print(f"Project kept at: {tmp_dir}", file=sys.stderr)
-    finally:
-        if not args.keep:
-            shutil.rmtree(tmp_dir)
+    if args.engine == "compile":
+        render_with_compile(lines, family_info, font_packages, root_dir, args)
+    else:
+        render_with_renderer(lines, family_info, root_dir, args)
 
 if __name__ == "__main__":
     main()
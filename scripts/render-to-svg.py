@@ -2,65 +2,22 @@
 import argparse
 import os
 import sys
-import tempfile
-import subprocess
-import shutil
-import re
-from pathlib import Path
-
-def get_font_map():
-    """Reads all-fonts.txt and returns a map of family -> {variant: package_name}"""
-    if not os.path.exists("all-fonts.txt"):
-        print("Error: all-fonts.txt not found. Run scripts/enumerate-all-fonts.py first.")
-        sys.exit(1)
 
-    font_map = {}
-    with open("all-fonts.txt", "r") as f:
-        for line in f:
-            pkg = line.strip()
-            if not pkg: continue
-            # Example: gmlewis/fonts-a/abeezee_italic
-            parts = pkg.split('/')
-            full_name = parts[-1]
-
-            # Improved heuristic for family and variant
-            if '_' in full_name:
-                family, variant = full_name.rsplit('_', 1)
-                if variant in ['regular', 'italic', 'bold', 'bolditalic']:
-                    pass
-                elif 'italic' in variant and 'bold' in variant:
-                    variant = 'bolditalic'
-                elif 'bold' in variant:
-                    variant = 'bold'
-                elif 'italic' in variant:
-                    variant = 'italic'
-            else:
-                family = full_name
-                variant = 'regular'
-                if 'bolditalic' in full_name.lower(): variant = 'bolditalic'
-                elif 'bold' in full_name.lower(): variant = 'bold'
-                elif 'italic' in full_name.lower(): variant = 'italic'
-                elif 'regular' in full_name.lower(): variant = 'regular'
-
-            if family not in font_map:
-                font_map[family] = {}
-
-            if variant == 'regular' or variant not in font_map[family]:
-                font_map[family][variant] = pkg
-            elif variant in ['bold', 'italic', 'bolditalic']:
-                if '_' + variant in full_name:
-                    font_map[family][variant] = pkg
-
-    return font_map
-
-def find_best_font(family_query, font_map):
-    """Finds the best font family match."""
-    if family_query in font_map:
-        return family_query
-    matches = [f for f in font_map.keys() if f.startswith(family_query)]
-    if matches:
-        return matches[0]
-    return None
+from buildcache import add_cache_arguments, cache_options, project_dir
+from fontcatalog import CatalogError, format_info, load_catalog
+from framing import mbt_frame, output_sink
+from jobrunner import JobTimeout, add_runner_arguments, run_job, runner_options
+from renderer import RendererError, ensure_renderer, stream_renderer
+from timings import TIMINGS, add_timing_arguments, timing_options
+import textpath
+
+def get_catalog():
+    """Returns the font catalog of all-fonts.txt (see `fontcatalog.py`)."""
+    try:
+        return load_catalog()
+    except CatalogError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
 def generate_moon_mod(font_packages, root_dir):
     """Generates moon.mod.json content."""
@@ -141,43 +98,124 @@ def generate_main_mbt(lines, family_info, alignment):
 
     mbt.append(f"  let scene = @draw.column(lines, alignment=@geom.{mb_align}, spacing=0.2)")
 
-    mbt.append("  println(")
-    mbt.append("    @svg.from_graphic(")
-    mbt.append("      scene")
-    mbt.append("      .with_margin(top=0.1, right=0.1, bottom=0.1, left=0.1)")
-    mbt.append("      .with_background(@draw.Color::white()),")
-    mbt.append("      y_up=false,")
-    mbt.append("    ).to_string()")
+    mbt.append("  let svg = @svg.from_graphic(")
+    mbt.append("    scene")
+    mbt.append("    .with_margin(top=0.1, right=0.1, bottom=0.1, left=0.1)")
+    mbt.append("    .with_background(@draw.Color::white()),")
+    mbt.append("    y_up=false,")
     mbt.append("  )")
+    mbt.extend(mbt_frame("svg", "svg"))
     mbt.append("}")
 
     return "\n".join(mbt)
 
+def render_with_renderer(lines, family_info, root_dir, args):
+    """Renders the lines with the precompiled renderer binary, streaming the SVG to the output."""
+    try:
+        binary = args.renderer or ensure_renderer(root_dir)
+    except RendererError as e:
+        print(e)
+        sys.exit(1)
+
+    ok, stdout, stderr = stream_renderer(binary, family_info, lines, args.align, False, "svg", root_dir,
+                                         lambda name: output_sink(args.output, timer=TIMINGS.timer("render")), runner_options(args))
+    if not ok:
+        print("Error running renderer:")
+        print(stderr)
+        if stdout:
+            print(f"Stdout was: {stdout}")
+        sys.exit(1)
+
+def render_with_python(lines, family_info, root_dir, args):
+    """Renders the lines with the pure-Python engine in `textpath.py`."""
+    names = {variant: pkg.split('/')[-1] for variant, pkg in family_info.items()}
+    fonts_dir = os.path.join(root_dir, "all-fonts")
+    try:
+        regular = textpath.load_font(names.get('regular', list(names.values())[0]), fonts_dir)
+        bold = textpath.load_font(names['bold'], fonts_dir) if 'bold' in names else regular
+        italic = textpath.load_font(names['italic'], fonts_dir) if 'italic' in names else regular
+    except textpath.FontError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    with TIMINGS.span("render", "run"):
+        svg_content = textpath.render_svg(lines, regular, bold, italic, align=args.align, y_up=False)
+    with TIMINGS.span("render", "write"):
+        sink = output_sink(args.output)
+        sink.write(svg_content.encode("utf-8"))
+        sink.commit()
+
+def render_with_compile(lines, family_info, font_packages, root_dir, args):
+    """Renders the lines by generating and compiling a MoonBit project, streaming the SVG to the output."""
+    cache_dir, max_bytes = cache_options(args)
+    generate_start = TIMINGS.now()
+    files = {
+        "moon.mod.json": generate_moon_mod(font_packages, root_dir),
+        "moon.pkg.json": generate_moon_pkg(font_packages),
+        "main.mbt": generate_main_mbt(lines, family_info, args.align),
+    }
+    with project_dir(files, root_dir, cache_dir, max_bytes, prefix="moon-render-", keep=args.keep) as tmp_dir:
+        TIMINGS.record("render", "generate", generate_start, TIMINGS.now())
+        try:
+            returncode, reader, stderr = run_job(["moon", "run", "main.mbt", "--target", "native"],
+                                                 lambda name: output_sink(args.output, timer=TIMINGS.timer("render")), runner_options(args),
+                                                 cwd=tmp_dir, job="render")
+        except JobTimeout as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        if returncode != 0:
+            reader.abort()
+            print("Error running moon run:")
+            print(stderr)
+            sys.exit(1)
+
+        if "svg" not in reader.frames:
+            reader.abort()
+            print("Error: Could not find SVG content in moon output.")
+            if not args.keep:
+                print(f"Stdout was: {reader.output()}")
+            sys.exit(1)
+        reader.commit()
+
+        if args.keep:
+            print(f"Project kept at: {tmp_dir}", file=sys.stderr)
+
 def main():
     parser = argparse.ArgumentParser(description="Quickly render text to SVG using gmlewis/fonts")
     parser.add_argument("input", nargs="?", help="Input file (Markdown/Text) or string, defaults to stdin")
     parser.add_argument("-f", "--font", default="aaarghnormal", help="Font family name (fuzzy matching supported)")
     parser.add_argument("-o", "--output", help="Output SVG file (defaults to stdout)")
     parser.add_argument("-a", "--align", choices=['left', 'center', 'right'], default='left', help="Horizontal alignment (default: left)")
-    parser.add_argument("--keep", action="store_true", help="Keep the temporary MoonBit project directory")
+    parser.add_argument("--engine", choices=['renderer', 'python', 'compile'], default='renderer', help="Use the precompiled renderer (default), the pure-Python engine, or compile a temporary MoonBit project")
+    parser.add_argument("--renderer", help="Path to a prebuilt renderer binary (default: build renderer/ on demand)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary MoonBit project directory (--engine=compile)")
+    add_cache_arguments(parser)
+    add_runner_arguments(parser, workers=False)
+    add_timing_arguments(parser)
     parser.add_argument("--list-fonts", action="store_true", help="List all available font families and exit")
+    parser.add_argument("--font-info", action="store_true", help="With --list-fonts, also show the glyph count, units per em and size of each compressed family")
 
     args = parser.parse_args()
+    timing_options(args)
 
-    font_map = get_font_map()
+    catalog = get_catalog()
 
     if args.list_fonts:
-        for family in sorted(font_map.keys()):
-            variants = ", ".join(font_map[family].keys())
-            print(f"{family} ({variants})")
+        # The first variant of each family stands for it in --font-info.
+        names = {family: next(iter(variants.values())).split('/')[-1] for family, variants in catalog.families.items()}
+        infos = catalog.info_many(names.values()) if args.font_info else {}
+        for family in catalog.family_names:
+            variants = ", ".join(catalog.families[family].keys())
+            entry = infos.get(names[family])
+            print(f"{family} ({variants}): {format_info(entry)}" if entry else f"{family} ({variants})")
         return
 
-    family = find_best_font(args.font, font_map)
+    family = catalog.find_family(args.font)
     if not family:
         print(f"Error: Could not find font family matching '{args.font}'")
         sys.exit(1)
 
-    family_info = font_map[family]
+    family_info = catalog.families[family]
     font_packages = list(family_info.values())
 
     if args.input:
@@ -197,45 +235,12 @@ def main():
         return
 
     root_dir = os.getcwd()
-    tmp_dir = tempfile.mkdtemp(prefix="moon-render-")
-    try:
-        with open(os.path.join(tmp_dir, "moon.mod.json"), "w") as f:
-            f.write(generate_moon_mod(font_packages, root_dir))
-        with open(os.path.join(tmp_dir, "moon.pkg.json"), "w") as f:
-            f.write(generate_moon_pkg(font_packages))
-        with open(os.path.join(tmp_dir, "main.mbt"), "w") as f:
-            f.write(generate_main_mbt(lines, family_info, args.align))
-
-        result = subprocess.run(["moon", "run", "main.mbt", "--target", "native"], cwd=tmp_dir, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            print("Error running moon run:")
-            print(result.stderr)
-            if not args.keep:
-                print(f"Temp directory kept at: {tmp_dir}")
-            sys.exit(1)
-
-        svg_content = result.stdout
-        svg_match = re.search(r"<svg.*</svg>", svg_content, re.DOTALL)
-        if svg_match:
-            svg_content = svg_match.group(0)
-        else:
-            print("Error: Could not find SVG content in moon output.")
-            if not args.keep:
-                print(f"Stdout was: {result.stdout}")
-            sys.exit(1)
-
-        if args.output:
-            with open(args.output, "w") as f:
-                f.write(svg_content)
-        else:
-            print(svg_content)
-
-        if args.keep:
-            print(f"Project kept at: {tmp_dir}", file=sys.stderr)
-    finally:
-        if not args.keep:
-            shutil.rmtree(tmp_dir)
+    if args.engine == "compile":
+        render_with_compile(lines, family_info, font_packages, root_dir, args)
+    elif args.engine == "python":
+        render_with_python(lines, family_info, root_dir, args)
+    else:
+        render_with_renderer(lines, family_info, root_dir, args)
 
 if __name__ == "__main__":
     main()
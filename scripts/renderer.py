@@ -0,0 +1,119 @@
+"""Helpers to build and run the precompiled `renderer/` binary.
+
+The render scripts used to generate and compile a brand new MoonBit project
+for every request. The renderer is built once (and rebuilt only when the
+MoonBit sources change), then called directly with the text on stdin.
+"""
+import glob
+import os
+import subprocess
+
+from jobrunner import JobTimeout, run_job
+
+RENDERER_DIR = "renderer"
+RENDERER_ENV = "MOONBIT_FONTS_RENDERER"
+
+# Directories (relative to the repo root) whose *.mbt files the renderer
+# is built from. The binary is considered stale if any of them is newer.
+SOURCE_DIRS = [".", "draw", "geom", "svg", "loader", RENDERER_DIR]
+
+class RendererError(Exception):
+    """Raised when the renderer cannot be built or fails to render."""
+
+def find_renderer_binary(root_dir, name=RENDERER_DIR):
+    """Returns the most recently built binary of the `name` module (default: the renderer), or None."""
+    candidates = []
+    for base in [os.path.join(root_dir, name), root_dir]:
+        pattern = os.path.join(base, "_build", "native", "*", "build", "**", f"{name}.exe")
+        candidates.extend(glob.glob(pattern, recursive=True))
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+def newest_source_mtime(root_dir, source_dirs=SOURCE_DIRS):
+    """Returns the newest mtime of the MoonBit sources used by the renderer."""
+    newest = 0.0
+    for d in source_dirs:
+        for path in glob.glob(os.path.join(root_dir, d, "*.mbt")) + glob.glob(os.path.join(root_dir, d, "moon.*")):
+            newest = max(newest, os.path.getmtime(path))
+    return newest
+
+def ensure_renderer(root_dir, rebuild=False):
+    """Returns the path to an up-to-date renderer binary, building it if needed.
+
+    Set the MOONBIT_FONTS_RENDERER environment variable to use a prebuilt
+    binary and skip the staleness check entirely.
+    """
+    env_binary = os.environ.get(RENDERER_ENV)
+    if env_binary:
+        if not os.path.exists(env_binary):
+            raise RendererError(f"{RENDERER_ENV}={env_binary} does not exist")
+        return env_binary
+    return ensure_binary(root_dir, RENDERER_DIR, SOURCE_DIRS, rebuild)
+
+def ensure_binary(root_dir, name, source_dirs, rebuild=False):
+    """Returns the path to an up-to-date binary of the `name` module (e.g. `renderer`
+    or `bench`), building it with `moon build` if any of `source_dirs` is newer."""
+    binary = find_renderer_binary(root_dir, name)
+    if binary and not rebuild and os.path.getmtime(binary) >= newest_source_mtime(root_dir, source_dirs):
+        return binary
+
+    module_dir = os.path.join(root_dir, name)
+    result = subprocess.run(["moon", "build", "--target", "native", "--release"], cwd=module_dir, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RendererError(f"Error building {name}:\n{result.stdout}\n{result.stderr}")
+
+    binary = find_renderer_binary(root_dir, name)
+    if not binary:
+        raise RendererError(f"Could not find {name}.exe after building {module_dir}")
+    return binary
+
+def renderer_fonts(family_info):
+    """Maps a family's {variant: package} info to renderer font arguments."""
+    names = {variant: pkg.split('/')[-1] for variant, pkg in family_info.items()}
+    regular = names.get('regular', list(names.values())[0])
+    args = ["--font", regular]
+    if 'bold' in names:
+        args += ["--bold", names['bold']]
+    if 'italic' in names:
+        args += ["--italic", names['italic']]
+    return args
+
+def renderer_command(binary, family_info, alignment, y_up, output_format, root_dir):
+    """Returns the (command, environment) that runs the renderer.
+
+    The fonts are loaded from `all-fonts/` by the renderer, so
+    MOONBIT_FONTS_DIR defaults to `root_dir`.
+    """
+    cmd = [binary] + renderer_fonts(family_info) + [
+        "--align", alignment,
+        "--y-up" if y_up else "--y-down",
+        "--format", output_format,
+    ]
+    env = dict(os.environ)
+    env.setdefault("MOONBIT_FONTS_DIR", root_dir)
+    return cmd, env
+
+def run_renderer(binary, family_info, lines, alignment, y_up, output_format, root_dir):
+    """Runs the renderer and returns the completed process."""
+    cmd, env = renderer_command(binary, family_info, alignment, y_up, output_format, root_dir)
+    return subprocess.run(cmd, input="\n".join(lines) + "\n", capture_output=True, text=True, env=env)
+
+def stream_renderer(binary, family_info, lines, alignment, y_up, output_format, root_dir, open_sink, runner_options=None):
+    """Runs the renderer with `--framed`, streaming its output into `open_sink(name)`.
+
+    See `framing.py`. The sink is committed on success and aborted otherwise.
+    `runner_options` are `jobrunner.JobRunner` keyword arguments (timeout,
+    retries). Returns (success, output printed outside of the frame, stderr).
+    """
+    cmd, env = renderer_command(binary, family_info, alignment, y_up, output_format, root_dir)
+    try:
+        returncode, reader, stderr = run_job(cmd + ["--framed"], open_sink, runner_options, env=env, input="\n".join(lines) + "\n",
+                                         job="render", compiles=False)
+    except JobTimeout as e:
+        return False, "", str(e)
+    if returncode != 0 or output_format not in reader.frames:
+        reader.abort()
+        return False, reader.output(), stderr
+    reader.commit()
+    return True, reader.output(), stderr
@@ -1,34 +1,19 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import io
 import os
 import sys
-import tempfile
-import subprocess
-import shutil
-import re
-import time
-from pathlib import Path
-
-def get_all_fonts():
-    """Reads all-fonts.txt and returns a list of package names."""
-    if not os.path.exists("all-fonts.txt"):
-        print("Error: all-fonts.txt not found. Run scripts/enumerate-all-fonts.py first.")
-        sys.exit(1)
-    
-    with open("all-fonts.txt", "r") as f:
-        return [line.strip() for line in f if line.strip()]
-
-def find_label_font_pkg(query, all_packages):
-    """Finds the best package for the requested label font."""
-    # Exact match of the last part
-    for pkg in all_packages:
-        if pkg.endswith('/' + query) or pkg == query:
-            return pkg
-    # Fuzzy prefix match on the last part
-    for pkg in all_packages:
-        if pkg.split('/')[-1].startswith(query):
-            return pkg
-    return None
+
+from buildcache import add_cache_arguments, async_project_dir, cache_options, root_version
+from fontcatalog import CatalogError, load_catalog
+from fragmentcache import DEFAULT_FRAGMENT_CACHE_SIZE_GB, DEFAULT_FRAGMENT_DIR, FragmentCache, assemble_page, fragment_key
+from framing import MemorySink, mbt_frame
+from jobrunner import JobRunner, add_runner_arguments, run_main, runner_options
+from timings import TIMINGS, add_timing_arguments, timing_options
+
+COLS = 6
+COL_WIDTH = 12.0
 
 def generate_moon_mod(font_packages, label_font_pkg, root_dir):
     """Generates moon.mod.json content."""
@@ -68,7 +53,10 @@ def generate_moon_pkg(font_packages, label_font_pkg):
     }, indent=2)
 
 def generate_main_mbt(font_packages, label_font_pkg, sample_lines):
-    """Generates main.mbt content."""
+    """Generates main.mbt content printing each font's cell (label plus sample) as a frame.
+
+    Each cell is rendered at the origin; `cell_position` places it on a page.
+    """
     
     label_font_alias = label_font_pkg.split('/')[-1]
 
@@ -77,101 +65,157 @@ def generate_main_mbt(font_packages, label_font_pkg, sample_lines):
 
     mbt = ["fn main {"]
     mbt.append(f'  let sample_text = "{sample_text}"')
-    mbt.append("  let mut scene = @draw.group([]).as_graphic()")
-    mbt.append("  let cols = 6")
-    
-    # Heuristic for cell sizing
-    line_count = len(sample_lines)
-    col_width = 12.0
-    row_height = 1.2 + (line_count * 1.2)
     
     for i, pkg in enumerate(font_packages):
         alias = pkg.split('/')[-1]
-        x = (i % 6) * col_width
-        y = (i // 6) * row_height
         
         mbt.append(f"  // Font {i}: {alias}")
         mbt.append(f"  let label = try {{ @draw.text(@{label_font_alias}.font, \"{alias}\").scale(@geom.vec2(0.3, 0.3)).translate(@geom.vec2(0.0, -0.8)) }} catch {{ _ => @draw.group([]).as_graphic() }}")
         mbt.append(f"  let sample = try {{ @draw.text(@{alias}.font, sample_text) }} catch {{ _ => @draw.group([]).as_graphic() }}")
-        mbt.append(f"  scene = scene + (label + sample).translate(@geom.vec2({x}, {y}))")
+        mbt.extend(mbt_frame(alias, "@svg.from_graphic(label + sample, y_up=false)"))
         
-    mbt.append("  println(")
-    mbt.append("    @svg.from_graphic(")
-    mbt.append("      scene")
-    mbt.append("      .with_margin(top=0.5, right=0.5, bottom=0.5, left=0.5)")
-    mbt.append("      .with_background(@draw.Color::white()),")
-    mbt.append("      y_up=false,")
-    mbt.append("    ).to_string(),")
-    mbt.append("  )")
     mbt.append("}")
     
     return "\n".join(mbt)
 
-def process_batch(font_packages, label_font_pkg, sample_lines, output_file, root_dir, args):
-    start_time = time.time()
-    tmp_dir = tempfile.mkdtemp(prefix="moon-sample-all-")
-    try:
-        if args.debug:
-            print(f"--- Batch setup starting ({len(font_packages)} fonts) ---", file=sys.stderr)
-            
-        with open(os.path.join(tmp_dir, "moon.mod.json"), "w") as f:
-            f.write(generate_moon_mod(font_packages, label_font_pkg, root_dir))
-            
-        with open(os.path.join(tmp_dir, "moon.pkg.json"), "w") as f:
-            f.write(generate_moon_pkg(font_packages, label_font_pkg))
-            
-        with open(os.path.join(tmp_dir, "main.mbt"), "w") as f:
-            f.write(generate_main_mbt(font_packages, label_font_pkg, sample_lines))
-            
+def cell_position(i, line_count):
+    """Returns the (x, y) of the `i`th cell of a page."""
+    # Heuristic for cell sizing
+    row_height = 1.2 + (line_count * 1.2)
+    return (i % COLS) * COL_WIDTH, (i // COLS) * row_height
+
+async def run_moon(runner, tmp_dir, job):
+    """Runs the generated program; returns (returncode, reader, stderr).
+
+    Each cell's frame is read into memory (cells are small).
+    """
+    # Using --target native as requested. We don't need moon add/update because we write moon.mod.json directly.
+    return await runner.run_framed(["moon", "run", "main.mbt", "--target", "native"], lambda name: MemorySink(), cwd=tmp_dir, job=job)
+
+async def process_batch(runner, font_packages, label_font_pkg, sample_lines, root_dir, args, cache, keys, log=sys.stderr, job="batch-1"):
+    """Renders the cells of one batch of fonts into `cache`; returns True on success.
+
+    `keys` maps each font package to its fragment key. Progress and errors
+    are written to `log`; phase timings are recorded under `job`.
+    """
+    start_time = TIMINGS.now()
+    cache_dir, max_bytes = cache_options(args)
+    if args.debug:
+        print(f"--- Batch setup starting ({len(font_packages)} fonts) ---", file=log)
+
+    files = {
+        "moon.mod.json": generate_moon_mod(font_packages, label_font_pkg, root_dir),
+        "moon.pkg.json": generate_moon_pkg(font_packages, label_font_pkg),
+        "main.mbt": generate_main_mbt(font_packages, label_font_pkg, sample_lines),
+    }
+    async with async_project_dir(files, root_dir, cache_dir, max_bytes, prefix="moon-sample-all-", keep=args.keep) as tmp_dir:
+        TIMINGS.record(job, "generate", start_time, TIMINGS.now())
         if args.debug:
-            print(f"Setup took: {time.time() - start_time:.2f}s", file=sys.stderr)
+            print(f"Setup took: {TIMINGS.now() - start_time:.2f}s", file=log)
             
-        print(f"Generating SVG for batch of {len(font_packages)} fonts...", file=sys.stderr)
+        print(f"Rendering cells for batch of {len(font_packages)} fonts...", file=log)
         
-        moon_start = time.time()
-        # Using --target native as requested. We don't need moon add/update because we write moon.mod.json directly.
-        result = subprocess.run(["moon", "run", "main.mbt", "--target", "native"], cwd=tmp_dir, capture_output=True, text=True)
-        moon_end = time.time()
+        moon_start = TIMINGS.now()
+        returncode, reader, stderr = await run_moon(runner, tmp_dir, job)
+        stdout = reader.output()
+        moon_end = TIMINGS.now()
         
         if args.debug:
-            print(f"moon run took: {moon_end - moon_start:.2f}s", file=sys.stderr)
+            print(f"moon run took: {moon_end - moon_start:.2f}s", file=log)
         
-        if result.returncode != 0 or "failed:" in result.stdout:
-            print(f"Error running moon run (exit code {result.returncode}):", file=sys.stderr)
-            if result.stdout:
-                print("--- STDOUT ---", file=sys.stderr)
-                print(result.stdout, file=sys.stderr)
-            if result.stderr:
-                print("--- STDERR ---", file=sys.stderr)
-                print(result.stderr, file=sys.stderr)
-            if not args.keep:
-                print(f"Temp directory kept at: {tmp_dir}", file=sys.stderr)
+        if returncode != 0 or "failed:" in stdout:
+            print(f"Error running moon run (exit code {returncode}):", file=log)
+            if stdout:
+                print("--- STDOUT ---", file=log)
+                print(stdout, file=log)
+            if stderr:
+                print("--- STDERR ---", file=log)
+                print(stderr, file=log)
+            if args.keep or cache_dir:
+                print(f"Project directory: {tmp_dir}", file=log)
             return False
             
-        svg_content = result.stdout
-        svg_match = re.search(r"<svg.*</svg>", svg_content, re.DOTALL)
-        if svg_match:
-            svg_content = svg_match.group(0)
-        else:
-            print("Error: Could not find SVG content in moon output.", file=sys.stderr)
-            print("--- STDOUT ---", file=sys.stderr)
-            print(result.stdout, file=sys.stderr)
-            print("--- STDERR ---", file=sys.stderr)
-            print(result.stderr, file=sys.stderr)
-            if not args.keep:
-                print(f"Temp directory kept at: {tmp_dir}", file=sys.stderr)
+        fragments = {name: sink.text() for name, sink in reader.frames.items()}
+        missing = [pkg for pkg in font_packages if pkg.split('/')[-1] not in fragments]
+        if missing:
+            print(f"Error: Could not find SVG content in moon output for {', '.join(missing)}.", file=log)
+            print("--- STDOUT ---", file=log)
+            print(stdout, file=log)
+            print("--- STDERR ---", file=log)
+            print(stderr, file=log)
+            if args.keep or cache_dir:
+                print(f"Project directory: {tmp_dir}", file=log)
             return False
             
+        for pkg in font_packages:
+            cache.put(keys[pkg], fragments[pkg.split('/')[-1]])
+        return True
+
+async def render_batch(runner, i, batch, label_font_pkg, sample_lines, root_dir, args, cache, keys):
+    """Runs `process_batch` with its own log; returns (i, success, log text)."""
+    log = io.StringIO()
+    try:
+        ok = await process_batch(runner, batch, label_font_pkg, sample_lines, root_dir, args, cache, keys, log=log, job=f"batch-{i + 1}")
+    except Exception as e:
+        print(f"Exception during batch {i + 1}: {e}", file=log)
+        ok = False
+    return i, ok, log.getvalue()
+
+async def render_batches(batches, label_font_pkg, sample_lines, root_dir, args, cache, keys):
+    """Renders all batches, at most `args.workers` at a time; returns True if all succeed.
+
+    As soon as one batch fails, the remaining batches are cancelled.
+    """
+    num_batches = len(batches)
+    runner = JobRunner(**dict(runner_options(args), concurrency=max(1, min(args.workers, num_batches))))
+    if num_batches == 1:
+        try:
+            return await process_batch(runner, batches[0], label_font_pkg, sample_lines, root_dir, args, cache, keys)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return False
+
+    tasks = [asyncio.ensure_future(render_batch(runner, i, batch, label_font_pkg, sample_lines, root_dir, args, cache, keys))
+             for i, batch in enumerate(batches)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            i, ok, log = await next_done
+            print(f"=== Batch {i + 1}/{num_batches} ===", file=sys.stderr)
+            print(log, end="", file=sys.stderr)
+            if not ok:
+                print(f"Batch {i + 1} failed; stopping the remaining batches.", file=sys.stderr)
+                return False
+        return True
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def write_page(i, num_pages, page, sample_lines, cache, keys, output):
+    """Assembles page `i` from the cached cells of its fonts and writes it."""
+    cells = []
+    for j, pkg in enumerate(page):
+        x, y = cell_position(j, len(sample_lines))
+        cells.append((x, y, cache.get(keys[pkg])))
+    with TIMINGS.span(f"page-{i + 1}", "generate"):
+        svg_content = assemble_page(cells)
+    output_file = batch_output_file(i, num_pages, output)
+    with TIMINGS.span(f"page-{i + 1}", "write"):
         if output_file:
             with open(output_file, "w") as f:
                 f.write(svg_content)
             print(f"Successfully wrote SVG to {output_file}", file=sys.stderr)
         else:
             print(svg_content)
-        return True
-    finally:
-        if not args.keep:
-            shutil.rmtree(tmp_dir)
+
+def batch_output_file(i, num_batches, output):
+    """Returns the deterministic output file of page `i` (None means stdout)."""
+    if num_batches > 1 and output:
+        base, ext = os.path.splitext(output)
+        return f"{base}-{i+1:03d}{ext}"
+    elif num_batches > 1 and not output:
+        return f"sample-{i+1:03d}.svg"
+    return output
 
 def main():
     parser = argparse.ArgumentParser(description="Render sample text in batches of available fonts to SVG files")
@@ -181,16 +225,28 @@ def main():
     parser.add_argument("--label-font", default="aileron_bold", help="Font to use for labels (default aileron_bold)")
     parser.add_argument("--limit", type=int, help="Limit the total number of fonts to render (for testing)")
     parser.add_argument("--keep", action="store_true", help="Keep the temporary MoonBit project directory")
-    parser.add_argument("--debug", action="store_true", help="Show timing information")
+    parser.add_argument("--fragment-dir", default=DEFAULT_FRAGMENT_DIR, help=f"Cache directory of rendered font cells (default: {DEFAULT_FRAGMENT_DIR})")
+    parser.add_argument("--fragment-cache-size", type=float, default=DEFAULT_FRAGMENT_CACHE_SIZE_GB, help=f"Maximum fragment cache size in GB before LRU eviction (default: {DEFAULT_FRAGMENT_CACHE_SIZE_GB:g})")
+    parser.add_argument("--no-fragment-cache", action="store_true", help="Render every font cell instead of reusing cached cells")
+    parser.add_argument("--debug", action="store_true", help="Show timing information (time per phase, see --timings)")
+    add_cache_arguments(parser)
+    add_runner_arguments(parser)
+    add_timing_arguments(parser)
     
     args = parser.parse_args()
+    timing_options(args)
     
-    all_packages = get_all_fonts()
+    try:
+        catalog = load_catalog()
+    except CatalogError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    all_packages = catalog.packages
     if not all_packages:
         print("No fonts found in all-fonts.txt")
         sys.exit(1)
 
-    label_font_pkg = find_label_font_pkg(args.label_font, all_packages)
+    label_font_pkg = catalog.find_font(args.label_font)
     if not label_font_pkg:
         print(f"Error: Could not find label font matching '{args.label_font}'")
         sys.exit(1)
@@ -217,26 +273,29 @@ def main():
     root_dir = os.getcwd()
     
     batch_size = args.batch_size
-    num_batches = (len(font_packages) + batch_size - 1) // batch_size
+    num_pages = (len(font_packages) + batch_size - 1) // batch_size
     
-    total_start = time.time()
-    for i in range(num_batches):
-        start = i * batch_size
-        end = min((i + 1) * batch_size, len(font_packages))
-        batch = font_packages[start:end]
-        
-        output_file = args.output
-        if num_batches > 1 and args.output:
-            base, ext = os.path.splitext(args.output)
-            output_file = f"{base}-{i+1:03d}{ext}"
-        elif num_batches > 1 and not args.output:
-            output_file = f"sample-{i+1:03d}.svg"
-            
-        if not process_batch(batch, label_font_pkg, sample_lines, output_file, root_dir, args):
-            sys.exit(1)
-            
-    if args.debug:
-        print(f"Total time: {time.time() - total_start:.2f}s", file=sys.stderr)
+    cache = FragmentCache(None if args.no_fragment_cache else os.path.abspath(os.path.expanduser(args.fragment_dir)),
+                          max_bytes=int(args.fragment_cache_size * 1024 ** 3))
+    version = root_version(root_dir)
+    sample_text = "\n".join(sample_lines)
+    keys = {pkg: fragment_key(pkg, sample_text, label_font_pkg, version) for pkg in font_packages}
+    misses = [pkg for pkg in font_packages if cache.get(keys[pkg]) is None]
+    if len(misses) < len(font_packages):
+        print(f"Reusing {len(font_packages) - len(misses)} cached font cells.", file=sys.stderr)
+
+    num_batches = (len(misses) + batch_size - 1) // batch_size
+    batches = [misses[i * batch_size:(i + 1) * batch_size] for i in range(num_batches)]
+    workers = max(1, min(args.workers, num_batches))
+    if num_batches > 1:
+        print(f"Rendering {num_batches} batches using {workers} workers...", file=sys.stderr)
+    if batches and not run_main(render_batches(batches, label_font_pkg, sample_lines, root_dir, args, cache, keys)):
+        sys.exit(1)
+
+    for i in range(num_pages):
+        page = font_packages[i * batch_size:(i + 1) * batch_size]
+        write_page(i, num_pages, page, sample_lines, cache, keys, args.output)
+    cache.evict()
 
 if __name__ == "__main__":
     main()
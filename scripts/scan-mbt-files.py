@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+
+from mbtscan import MAX_LINE_LENGTH, MAX_NUM_LINES, find_mbt_files, scan_files, summarize
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan the *.mbt files of ../mbt-fonts-* for too many lines and too long lines, and report both as JSON")
+    parser.add_argument("-o", "--output", help="Output JSON file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help=f"Number of files scanned in parallel (default: {os.cpu_count() or 1})")
+    parser.add_argument("--max-lines", type=int, default=MAX_NUM_LINES, help=f"Maximum number of lines per file (default: {MAX_NUM_LINES})")
+    parser.add_argument("--max-line-length", type=int, default=MAX_LINE_LENGTH, help=f"Maximum line length in bytes (default: {MAX_LINE_LENGTH})")
+    args = parser.parse_args()
+
+    paths = find_mbt_files()
+    results = scan_files(paths, args.workers, args.max_line_length)
+    report = summarize(results, args.max_lines, args.max_line_length)
+    text = json.dumps(report, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Scanned {report['files']} files: {len(report['long_files'])} with too many lines, {len(report['long_lines'])} lines too long")
+    else:
+        sys.stdout.write(text)
+
+if __name__ == "__main__":
+    main()
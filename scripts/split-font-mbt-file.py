@@ -1,140 +1,253 @@
 #!/usr/bin/env python3
-import sys
+import argparse
+import concurrent.futures
+import json
+import math
 import os
+import re
 import shutil
 import subprocess
+import sys
 
-def split_font_mbt(file_path):
-    if not os.path.exists(file_path):
-        print(f"File not found: {file_path}")
-        return
+from mbtscan import MAX_NUM_LINES
 
-    # Create a backup
-    bak_path = file_path + ".bak"
-    shutil.copy2(file_path, bak_path)
-    print(f"Created backup at {bak_path}")
+# Lines kept free in each part for `moon fmt` and the part's own header.
+DEFAULT_LINE_MARGIN = 500
+
+PART_RE = re.compile(r"^part(\d+)\.mbt$")
+
+class SplitError(Exception):
+    """Raised when a font source cannot be split."""
+
+def iter_lines(data, pos=0):
+    """Yields (start, end) offsets of the lines of `data` from `pos`; `end` includes the newline."""
+    size = len(data)
+    while pos < size:
+        end = data.find(b"\n", pos)
+        end = size if end == -1 else end + 1
+        yield pos, end
+        pos = end
 
-    with open(file_path, "r") as f:
-        lines = f.readlines()
+def next_content_line(data, pos):
+    """Returns the offset of the first non-blank line at or after `pos` (len(data) if none)."""
+    for start, end in iter_lines(data, pos):
+        if data[start:end].strip():
+            return start
+    return len(data)
 
-    total_lines = len(lines)
-    header = []
-    glyphs_start_idx = -1
-    for i, line in enumerate(lines):
-        if line.strip().startswith("let glyphs"):
-            glyphs_start_idx = i
+def parse_font_mbt(data):
+    """Splits a font source into (header, glyph blocks, font section).
+
+    Each glyph block is (key, start, end, line count): the `"char": {` entry of
+    the `glyphs` map starting at offset `start`.
+    """
+    glyphs_start = glyphs_body = None
+    for start, end in iter_lines(data):
+        if data[start:end].strip().startswith(b"let glyphs"):
+            glyphs_start, glyphs_body = start, end
             break
-        header.append(line)
-    
-    if glyphs_start_idx == -1:
-        print(f"Could not find 'let glyphs' in {file_path}")
-        return
+    if glyphs_start is None:
+        raise SplitError("Could not find 'let glyphs'")
 
     # Clean up header - remove trailing empty lines or ///| lines
-    while header and (not header[-1].strip() or header[-1].strip() == "///|"):
+    header = data[:glyphs_start].splitlines(keepends=True)
+    while header and (not header[-1].strip() or header[-1].strip() == b"///|"):
         header.pop()
 
-    # Find the end of glyphs map
-    # It ends with '}' on its own line followed by '///|' or 'pub let font'
-    glyphs_end_idx = -1
-    for i in range(glyphs_start_idx + 1, len(lines)):
-        if lines[i].strip() == "}":
-            # Check if next non-empty line starts with ///| or pub let font
-            next_idx = i + 1
-            while next_idx < len(lines) and not lines[next_idx].strip():
-                next_idx += 1
-            
-            if next_idx == len(lines) or lines[next_idx].startswith("///|") or lines[next_idx].startswith("pub let font"):
-                glyphs_end_idx = i
+    # The glyphs map ends with '}' on its own line followed by '///|' or 'pub let font'
+    blocks = []
+    block = None
+    glyphs_end = None
+    for start, end in iter_lines(data, glyphs_body):
+        stripped = data[start:end].strip()
+        if stripped == b"}":
+            next_start = next_content_line(data, end)
+            rest = data[next_start:next_start + 12]
+            if next_start == len(data) or rest.startswith(b"///|") or rest.startswith(b"pub let font"):
+                glyphs_end = end
                 break
-    
-    if glyphs_end_idx == -1:
-        print(f"Could not find end of glyphs map in {file_path}")
-        return
-
-    glyphs_content_lines = lines[glyphs_start_idx+1:glyphs_end_idx]
-    
-    glyph_blocks = []
-    current_block = []
-    
-    for line in glyphs_content_lines:
-        stripped = line.strip()
         # A glyph block starts with "char": {
-        if stripped.startswith('"') and stripped.endswith('{'):
-            if current_block:
-                glyph_blocks.append(current_block)
-            current_block = [line]
-        else:
-            if current_block:
-                current_block.append(line)
-    if current_block:
-        glyph_blocks.append(current_block)
-
-    if not glyph_blocks:
-        print("No glyph blocks found!")
-        return
-
-    target_split_line = total_lines // 2
-    current_line_num = glyphs_start_idx + 1
-    split_idx = len(glyph_blocks) // 2
-    
-    for i, block in enumerate(glyph_blocks):
-        if current_line_num >= target_split_line:
-            split_idx = i
-            break
-        current_line_num += len(block)
-    
-    part1_blocks = glyph_blocks[:split_idx]
-    part2_blocks = glyph_blocks[split_idx:]
+        if stripped.startswith(b'"') and stripped.endswith(b"{"):
+            if block is not None:
+                blocks.append(tuple(block))
+            block = [glyph_key(stripped), start, end, 1]
+        elif block is not None:
+            block[2] = end
+            block[3] += 1
+    if glyphs_end is None:
+        raise SplitError("Could not find end of glyphs map")
+    if block is not None:
+        blocks.append(tuple(block))
+    if not blocks:
+        raise SplitError("No glyph blocks found!")
+    return b"".join(header), blocks, data[glyphs_end:]
+
+def glyph_key(stripped):
+    """Returns the key of a `"char": {` line, or None."""
+    line = stripped[:-1].strip()
+    if line.endswith(b":"):
+        key_val = line[:-1].strip()
+        if key_val.startswith(b'"') and key_val.endswith(b'"'):
+            return key_val[1:-1].decode("utf-8")
+    return None
+
+def plan_parts(blocks, min_parts, max_lines, max_bytes, overhead_lines):
+    """Returns the glyph blocks grouped into the fewest parts (at least `min_parts`) of
+    balanced byte size that each fit `max_lines` and `max_bytes` (0 for no limit)."""
+    sizes = [end - start for _, start, end, _ in blocks]
+    line_counts = [lines for _, _, _, lines in blocks]
+    total_bytes = sum(sizes)
+    n = max(1, min_parts)
+    if max_lines:
+        n = max(n, math.ceil(sum(line_counts) / max(1, max_lines - overhead_lines)))
+    if max_bytes:
+        n = max(n, math.ceil(total_bytes / max_bytes))
+    while True:
+        n = min(n, len(blocks))
+        parts = [[] for _ in range(n)]
+        before = 0
+        for block, size in zip(blocks, sizes):
+            # Each block goes to the part containing its midpoint.
+            parts[min(n - 1, int((before + size / 2) * n / total_bytes))].append(block)
+            before += size
+        parts = [part for part in parts if part]
+        fits = all(
+            (not max_lines or overhead_lines + sum(b[3] for b in part) <= max_lines)
+            and (not max_bytes or sum(b[2] - b[1] for b in part) <= max_bytes)
+            for part in parts)
+        if fits:
+            return parts
+        if n == len(blocks):
+            raise SplitError("A single glyph exceeds the part budget")
+        n += 1
+
+def free_part_numbers(dir_path, count):
+    """Returns `count` part numbers that are not used by an existing `partN.mbt` in `dir_path`."""
+    used = [int(m.group(1)) for m in map(PART_RE.match, os.listdir(dir_path)) if m]
+    first = max(used, default=0) + 1
+    return list(range(first, first + count))
+
+def split_font_mbt(file_path, min_parts=2, max_lines=MAX_NUM_LINES - DEFAULT_LINE_MARGIN, max_bytes=0):
+    """Splits the glyphs of `file_path` into `partN.mbt` files of its directory.
+
+    The original file keeps a `glyphs` map that refers to the parts; a copy of
+    it is saved as `{file_path}.bak`. Returns the names of the new part files.
+    """
+    if not os.path.exists(file_path):
+        raise SplitError(f"File not found: {file_path}")
+    with open(file_path, "rb") as f:
+        data = f.read()
+    header, blocks, font_section = parse_font_mbt(data)
+    overhead_lines = header.count(b"\n") + 5
+    parts = plan_parts(blocks, min_parts, max_lines, max_bytes, overhead_lines)
+
+    # Create a backup
+    bak_path = file_path + ".bak"
+    shutil.copy2(file_path, bak_path)
 
     dir_path = os.path.dirname(file_path) or "."
-    
-    # 1 & 2. Write part1.mbt and part2.mbt
-    for name, blocks in [("part1", part1_blocks), ("part2", part2_blocks)]:
-        p_path = os.path.join(dir_path, f"{name}.mbt")
-        with open(p_path, "w") as f:
-            f.writelines(header)
-            f.write("\n\n///|\n")
-            f.write(f"let {name} : Map[String, @fonts.Glyph] = {{\n")
-            for block in blocks:
-                f.writelines(block)
-            f.write("}\n")
-
-    # 3. Update the original file
-    font_section = lines[glyphs_end_idx+1:]
-
-    with open(file_path, "w") as f:
-        f.writelines(header)
-        f.write("\n\n///|\n")
-        f.write("let glyphs : Map[String, @fonts.Glyph] = {\n")
-        
-        def process_blocks(blocks, part_name):
-            for block in blocks:
-                line = block[0].strip()
-                if line.endswith("{"):
-                    line = line[:-1].strip()
-                    if line.endswith(":"):
-                        key_val = line[:-1].strip()
-                        if key_val.startswith('"') and key_val.endswith('"'):
-                            key = key_val[1:-1]
-                            f.write(f'  "{key}": {part_name}["{key}"],\n')
-
-        process_blocks(part1_blocks, "part1")
-        process_blocks(part2_blocks, "part2")
-        f.write("}\n")
-        f.writelines(font_section)
-
-    # Final step: Format the files
-    print(f"Formatting files in {dir_path}...")
-    original_cwd = os.getcwd()
-    try:
-        os.chdir(dir_path)
-        subprocess.run(["moon", "fmt"], check=False)
-    finally:
-        os.chdir(original_cwd)
+    names = [f"part{i}" for i in free_part_numbers(dir_path, len(parts))]
+    for name, part in zip(names, parts):
+        with open(os.path.join(dir_path, f"{name}.mbt"), "wb") as f:
+            f.write(header)
+            f.write(b"\n\n///|\n")
+            f.write(f"let {name} : Map[String, @fonts.Glyph] = {{\n".encode("utf-8"))
+            for _, start, end, _ in part:
+                f.write(data[start:end])
+            f.write(b"}\n")
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print(f"Usage: {sys.argv[0]} <file_path>")
+    # Update the original file
+    with open(file_path, "wb") as f:
+        f.write(header)
+        f.write(b"\n\n///|\n")
+        f.write(b"let glyphs : Map[String, @fonts.Glyph] = {\n")
+        for name, part in zip(names, parts):
+            for key, _, _, _ in part:
+                if key is not None:
+                    f.write(f'  "{key}": {name}["{key}"],\n'.encode("utf-8"))
+        f.write(b"}\n")
+        f.write(font_section)
+    return [f"{name}.mbt" for name in names]
+
+def split_dir_files(file_paths, min_parts, max_lines, max_bytes):
+    """Splits files of one directory in turn (their part numbers must not collide).
+
+    Returns a list of (path, part names or None, message).
+    """
+    results = []
+    for file_path in file_paths:
+        try:
+            names = split_font_mbt(file_path, min_parts, max_lines, max_bytes)
+            results.append((file_path, names, f"{file_path}: split into {', '.join(names)} (backup at {file_path}.bak)"))
+        except (SplitError, OSError) as e:
+            results.append((file_path, None, f"{file_path}: {e}"))
+    return results
+
+def module_root(dir_path):
+    """Returns the nearest directory at or above `dir_path` with a moon.mod.json."""
+    path = os.path.abspath(dir_path)
+    while True:
+        if os.path.exists(os.path.join(path, "moon.mod.json")):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            return os.path.abspath(dir_path)
+        path = parent
+
+def read_scan_report(path):
+    """Returns the paths of the files with too many lines in a `scan-mbt-files.py` report."""
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return [entry["path"] for entry in report.get("long_files", [])]
+
+def main():
+    parser = argparse.ArgumentParser(description="Split the glyphs of large font .mbt files into partN.mbt files that fit a line or byte budget")
+    parser.add_argument("files", nargs="*", help="Font .mbt files to split")
+    parser.add_argument("--from-scan", metavar="JSON", help="Also split the files with too many lines in a scan-mbt-files.py report")
+    parser.add_argument("--parts", type=int, default=2, help="Minimum number of parts per file (default: 2)")
+    parser.add_argument("--max-lines", type=int, default=MAX_NUM_LINES - DEFAULT_LINE_MARGIN, help=f"Maximum number of lines per part (default: {MAX_NUM_LINES - DEFAULT_LINE_MARGIN}, 0 for no limit)")
+    parser.add_argument("--max-bytes", type=int, default=0, help="Maximum size of a part in bytes (default: 0, no limit)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help=f"Number of directories processed in parallel (default: {os.cpu_count() or 1})")
+    parser.add_argument("--no-fmt", action="store_true", help="Do not run `moon fmt` afterwards")
+    args = parser.parse_args()
+
+    file_paths = list(args.files)
+    if args.from_scan:
+        try:
+            file_paths.extend(read_scan_report(args.from_scan))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not read {args.from_scan}: {e}")
+            sys.exit(1)
+    if not file_paths:
+        parser.print_usage()
+        sys.exit(1)
+
+    by_dir = {}
+    for file_path in dict.fromkeys(file_paths):
+        by_dir.setdefault(os.path.dirname(file_path) or ".", []).append(file_path)
+
+    split_dirs = []
+    failed = False
+    workers = max(1, min(args.workers, len(by_dir)))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(split_dir_files, paths, args.parts, args.max_lines, args.max_bytes): dir_path
+                   for dir_path, paths in by_dir.items()}
+        for future in concurrent.futures.as_completed(futures):
+            for _, names, message in future.result():
+                print(message)
+                if names is None:
+                    failed = True
+                elif futures[future] not in split_dirs:
+                    split_dirs.append(futures[future])
+
+    # Final step: Format the files, once per module
+    if not args.no_fmt:
+        for root in sorted({module_root(dir_path) for dir_path in split_dirs}):
+            print(f"Formatting files in {root}...")
+            subprocess.run(["moon", "fmt"], cwd=root, check=False)
+
+    if failed:
         sys.exit(1)
-    split_font_mbt(sys.argv[1])
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Writes reduced copies of compressed fonts holding only the glyphs a corpus uses.
+
+The corpus is the set of characters of the `--text` files, `--chars` strings
+and/or printable ASCII (`--ascii`). Each font is read the way
+`textpath.load_font` finds it (only the needed glyphs get decoded when it has a
+glyph index) and written to `OUTDIR/{font_name}.json.gz` with its metrics and
+the corpus glyphs it has, so `@loader.load_font` reads it like any other font
+(point `MOONBIT_FONTS_DIR` at the parent of an `OUTDIR` named `all-fonts`).
+A report of the glyphs kept and the bytes saved is printed, and written as
+JSON with `--report`.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+
+from fontpack import FontPackError
+from glyphindex import METRICS, has_glyph_index, load_font_lazy
+from glyphstore import GlyphStoreError, has_store_table, load_store_font, write_json_gz
+from textpath import font_dirs, open_pack
+
+DEFAULT_OUTDIR = "subset-fonts"
+# Subsets are written once and shipped, so they get the smallest output.
+DEFAULT_COMPRESSION_LEVEL = 9
+ASCII_CHARS = "".join(chr(code) for code in range(0x20, 0x7f))
+
+# Characters `gen_path` handles without a glyph.
+LAYOUT_CHARS = "\n\r"
+
+class SubsetError(Exception):
+    """Raised when a font cannot be read."""
+
+def get_font_names():
+    """Reads all-fonts.txt and returns the short font names."""
+    if not os.path.exists("all-fonts.txt"):
+        print("Error: all-fonts.txt not found.")
+        sys.exit(1)
+
+    with open("all-fonts.txt", "r") as f:
+        return [line.strip().split('/')[-1] for line in f if line.strip()]
+
+def corpus_chars(args):
+    """Returns the set of characters of the corpus given on the command line."""
+    chars = set(ASCII_CHARS) if args.ascii else set()
+    for s in args.chars or []:
+        chars.update(s)
+    for path in args.text or []:
+        try:
+            if path == "-":
+                chars.update(sys.stdin.read())
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    chars.update(f.read())
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Error: could not read corpus file {path}: {e}")
+            sys.exit(1)
+    return chars - set(LAYOUT_CHARS)
+
+def gzip_size(font, compression_level):
+    data = json.dumps(font, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return len(gzip.compress(data, compresslevel=compression_level, mtime=0))
+
+def load_source_font(font_name, fonts_dir, compression_level):
+    """Returns (font, bytes of its compressed form) for `font_name`.
+
+    The size is the one of its `.json.gz` (or its entry in `fonts.pack`); a font
+    that only has a glyph store table is measured by recompressing it whole.
+    """
+    for d in font_dirs(fonts_dir):
+        path = os.path.join(d, f"{font_name}.json.gz")
+        if os.path.exists(path):
+            if has_glyph_index(d, font_name):
+                return load_font_lazy(d, font_name), os.path.getsize(path)
+            with gzip.open(path, "rb") as f:
+                return json.load(f), os.path.getsize(path)
+        pack = open_pack(d)
+        if pack is not None and font_name in pack:
+            blob = pack.read(font_name)
+            return json.loads(gzip.decompress(blob)), len(blob)
+        if has_store_table(d, font_name):
+            font = load_store_font(d, font_name)
+            return font, gzip_size(font, compression_level)
+    raise SubsetError(f"Font '{font_name}' not found. Checked directories: {', '.join(font_dirs(fonts_dir))}")
+
+def subset_font(font, chars):
+    """Returns a copy of `font` with only the glyphs of `chars`, and the chars it has no glyph for."""
+    glyphs = font["glyphs"]
+    subset = {key: font[key] for key in METRICS}
+    subset["glyphs"] = {c: glyphs[c] for c in glyphs if c in chars}
+    missing = "".join(sorted(c for c in chars if c not in subset["glyphs"]))
+    return subset, missing
+
+def format_kb(n):
+    return f"{n / 1024:.1f} KB"
+
+def write_report(report, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write reduced fonts holding only the glyphs used by a corpus")
+    parser.add_argument("fonts", nargs="*", help="Short font names to subset (default: all fonts in all-fonts.txt)")
+    parser.add_argument("--text", action="append", metavar="FILE", help="Corpus file whose characters are kept ('-' for stdin; repeatable)")
+    parser.add_argument("--chars", action="append", metavar="STRING", help="Characters to keep (repeatable)")
+    parser.add_argument("--ascii", action="store_true", help="Keep the printable ASCII characters")
+    parser.add_argument("-o", "--outdir", default=DEFAULT_OUTDIR, help=f"Output directory (default: {DEFAULT_OUTDIR})")
+    parser.add_argument("--fonts-dir", help="Directory to read the fonts from before all-fonts/ and ${MOONBIT_FONTS_DIR}/all-fonts/")
+    parser.add_argument("--report", help="Also write the report to this JSON file")
+    parser.add_argument("--limit", type=int, help="Only subset the first N fonts")
+    parser.add_argument("--compression-level", type=int, choices=range(0, 10), default=DEFAULT_COMPRESSION_LEVEL, metavar="{0..9}", help=f"gzip compression level (default: {DEFAULT_COMPRESSION_LEVEL})")
+    args = parser.parse_args()
+
+    if not (args.text or args.chars or args.ascii):
+        parser.error("no corpus given: use --text, --chars and/or --ascii")
+    chars = corpus_chars(args)
+    fonts = args.fonts or get_font_names()
+    if args.limit:
+        fonts = fonts[:args.limit]
+
+    outdir = os.path.realpath(args.outdir)
+    if any(os.path.realpath(d) == outdir for d in font_dirs(args.fonts_dir)):
+        print(f"Error: the output directory {args.outdir} is a font source directory; choose another --outdir")
+        sys.exit(1)
+    os.makedirs(outdir, exist_ok=True)
+
+    print(f"Subsetting {len(fonts)} fonts to {len(chars)} characters...")
+    results, failed = {}, {}
+    for font_name in fonts:
+        try:
+            font, source_bytes = load_source_font(font_name, args.fonts_dir, args.compression_level)
+            subset, missing = subset_font(font, chars)
+        except (OSError, ValueError, KeyError, FontPackError, GlyphStoreError, SubsetError) as e:
+            failed[font_name] = str(e)
+            print(f"FAILED: {font_name}: {e}")
+            continue
+        path = os.path.join(outdir, f"{font_name}.json.gz")
+        write_json_gz(subset, path, args.compression_level)
+        subset_bytes = os.path.getsize(path)
+        results[font_name] = {
+            "glyphs": len(font["glyphs"]),
+            "kept": len(subset["glyphs"]),
+            "missing": missing,
+            "source_bytes": source_bytes,
+            "subset_bytes": subset_bytes,
+        }
+        saved = (source_bytes - subset_bytes) / source_bytes if source_bytes else 0.0
+        print(f"{font_name}: {len(subset['glyphs'])}/{len(font['glyphs'])} glyphs, "
+              f"{format_kb(source_bytes)} -> {format_kb(subset_bytes)} ({saved:.0%} saved)")
+
+    source_total = sum(r["source_bytes"] for r in results.values())
+    subset_total = sum(r["subset_bytes"] for r in results.values())
+    print(f"Wrote {len(results)} fonts to {args.outdir}: {format_kb(source_total)} -> {format_kb(subset_total)}"
+          f" ({format_kb(source_total - subset_total)} saved), {len(failed)} failed")
+    if args.report:
+        write_report({
+            "chars": "".join(sorted(chars)),
+            "fonts": results,
+            "failed": failed,
+            "source_bytes": source_total,
+            "subset_bytes": subset_total,
+        }, args.report)
+        print(f"Wrote report to {args.report}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
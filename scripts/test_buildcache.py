@@ -0,0 +1,55 @@
+"""Tests of the build cache workspaces and their eviction (`buildcache.py`)."""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import buildcache
+
+class EvictTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def workspace(self, key, size, last_used=None):
+        path = os.path.join(self.cache_dir, key)
+        os.makedirs(path)
+        with open(os.path.join(path, "data"), "wb") as f:
+            f.write(b"x" * size)
+        if last_used is not None:
+            os.utime(path, (last_used, last_used))
+        return path
+
+    def test_unmarked_workspace_is_evicted_with_its_lock(self):
+        self.workspace("old", 100, last_used=1000)
+        self.workspace("new", 100)
+        open(os.path.join(self.cache_dir, "old.lock"), "w").close()
+        self.assertEqual(buildcache.evict(self.cache_dir, 150), ["old"])
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["new"])
+
+    def test_locked_and_protected_workspaces_are_kept(self):
+        self.workspace("busy", 100, last_used=1000)
+        self.workspace("mine", 100, last_used=2000)
+        with buildcache.open_lock(os.path.join(self.cache_dir, "busy.lock")):
+            self.assertEqual(buildcache.evict(self.cache_dir, 0, protect="mine"), [])
+
+    def test_waiter_relocks_a_lock_file_removed_by_evict(self):
+        lock_path = os.path.join(self.cache_dir, "key.lock")
+        first = buildcache.open_lock(lock_path)
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(buildcache.open_lock(lock_path)))
+        waiter.start()
+        time.sleep(0.1)
+        # What `evict` does: unlink the lock file while holding it.
+        os.remove(lock_path)
+        first.close()
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive())
+        with got[0] as lock:
+            self.assertEqual(os.fstat(lock.fileno()).st_ino, os.stat(lock_path).st_ino)
+            self.assertIsNone(buildcache.open_lock(lock_path, blocking=False))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Tests of the fuzzy family and font lookups of `fontcatalog.FontCatalog`."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from fontcatalog import load_catalog, prefix_lookup, split_family
+
+PACKAGES = [
+    "gmlewis/fonts-a/abeezee",
+    "gmlewis/fonts-a/abeezee_italic",
+    "gmlewis/fonts-a/aileron",
+    "gmlewis/fonts-a/aileron_bold",
+    "gmlewis/fonts-a/aileronblack",
+    "gmlewis/fonts-m/mono",
+    "gmlewis/fonts-z/zilla_slab",
+    "gmlewis/fonts-z/zillaslab_bold",
+]
+
+class FontCatalogLookupTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        path = os.path.join(self.dir, "all-fonts.txt")
+        with open(path, "w") as f:
+            f.write("\n".join(PACKAGES) + "\n")
+        self.catalog = load_catalog(path, os.path.join(self.dir, "all-fonts"), cache_dir=None)
+
+    def test_families(self):
+        self.assertEqual(self.catalog.family_names, ["abeezee", "aileron", "aileronblack", "mono", "zilla", "zillaslab"])
+        self.assertEqual(self.catalog.families["aileron"], {"regular": "gmlewis/fonts-a/aileron", "bold": "gmlewis/fonts-a/aileron_bold"})
+
+    def test_find_family(self):
+        for query, want in [
+            ("aileron", "aileron"),  # exact match, also a prefix of "aileronblack"
+            ("aileronb", "aileronblack"),
+            ("ail", "aileron"),
+            ("", "abeezee"),  # the empty prefix matches the first family
+            ("abeezee", "abeezee"),
+            ("zillas", "zillaslab"),
+            ("zillaz", None),  # sorts after the last family
+            ("zz", None),
+            ("b", None),  # sorts between two families without prefixing either
+            ("0", None),  # sorts before the first family
+            ("aileron_bold", None),  # a font name, not a family
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(self.catalog.find_family(query), want)
+
+    def test_find_font(self):
+        for query, want in [
+            ("aileron", "gmlewis/fonts-a/aileron"),  # exact match, also a prefix of others
+            ("aileron_", "gmlewis/fonts-a/aileron_bold"),
+            ("abeezee_i", "gmlewis/fonts-a/abeezee_italic"),
+            ("gmlewis/fonts-m/mono", "gmlewis/fonts-m/mono"),
+            ("gmlewis/fonts-m/mon", None),  # packages are not prefix-matched
+            ("gmlewis/fonts-x/mono", None),
+            ("zillaslab_bold", "gmlewis/fonts-z/zillaslab_bold"),
+            ("zillaslab_bolder", None),  # sorts after the last font name
+            ("~", None),
+            ("", "gmlewis/fonts-a/abeezee"),
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(self.catalog.find_font(query), want)
+
+    def test_prefix_lookup(self):
+        for keys, query, want in [
+            ([], "a", None),
+            (["a"], "a", "a"),
+            (["a", "ab"], "ab", "ab"),
+            (["ab", "b"], "a", "ab"),
+            (["ab", "b"], "c", None),
+        ]:
+            with self.subTest(keys=keys, query=query):
+                self.assertEqual(prefix_lookup(keys, query), want)
+
+    def test_split_family(self):
+        for name, want in [
+            ("abeezee_italic", ("abeezee", "italic")),
+            ("aileron_semibold", ("aileron", "bold")),
+            ("aileron_bolditalic", ("aileron", "bolditalic")),
+            ("zilla_slab", ("zilla", "slab")),
+            ("aileronblack", ("aileronblack", "regular")),
+            ("monobold", ("monobold", "bold")),
+        ]:
+            with self.subTest(name=name):
+                self.assertEqual(split_family(name), want)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Tests of the `fonts.pack` archive (`fontpack.py`)."""
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from fontpack import FontPack, FontPackError, write_pack
+
+# Unsorted, with names that share prefixes, to exercise the binary search.
+FONT_NAMES = ["mono", "aileron_bold", "zilla", "aileron", "baloo", "aileron_black", "n"]
+
+class FontPackTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        fonts = []
+        for i, name in enumerate(FONT_NAMES):
+            path = os.path.join(self.dir, f"{name}.json.gz")
+            with gzip.open(path, "wb") as f:
+                f.write(json.dumps({"id": name, "glyphs": {"A": {"d": "M0 0Z" * i}}}).encode("utf-8"))
+            fonts.append((name, path))
+        self.pack_path = os.path.join(self.dir, "fonts.pack")
+        self.assertEqual(write_pack(self.pack_path, fonts), len(FONT_NAMES))
+        self.pack = FontPack(self.pack_path)
+        self.addCleanup(self.pack.close)
+
+    def test_names_are_sorted(self):
+        self.assertEqual(self.pack.names(), sorted(FONT_NAMES))
+
+    def test_every_entry_is_found(self):
+        # Includes the first ("aileron") and last ("zilla") index entries.
+        for name in FONT_NAMES:
+            with self.subTest(name):
+                self.assertIn(name, self.pack)
+                self.assertEqual(self.pack.load(name)["id"], name)
+                with open(os.path.join(self.dir, f"{name}.json.gz"), "rb") as f:
+                    self.assertEqual(self.pack.read(name), f.read())
+
+    def test_missing_keys(self):
+        for name in ["", "a", "aileron_", "aileronz", "m", "zz", "zilla2"]:
+            with self.subTest(name):
+                self.assertIsNone(self.pack.find(name))
+                self.assertNotIn(name, self.pack)
+                with self.assertRaises(FontPackError):
+                    self.pack.read(name)
+
+    def test_empty_pack(self):
+        path = os.path.join(self.dir, "empty.pack")
+        self.assertEqual(write_pack(path, []), 0)
+        with FontPack(path) as pack:
+            self.assertEqual(pack.names(), [])
+            self.assertIsNone(pack.find("baloo"))
+
+    def test_invalid_pack(self):
+        path = os.path.join(self.dir, "bad.pack")
+        for data in [b"", b"MBFPACK", b"NOTAPACK" + bytes(8)]:
+            with self.subTest(data):
+                with open(path, "wb") as f:
+                    f.write(data)
+                with self.assertRaises(FontPackError):
+                    FontPack(path)
+
+if __name__ == "__main__":
+    unittest.main()
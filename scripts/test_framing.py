@@ -0,0 +1,92 @@
+"""Tests of the sentinel-framed output parser (`framing.FrameReader`)."""
+import unittest
+
+from framing import BEGIN_MARKER, END_MARKER, FrameReader, MemorySink
+
+def frame(name, payload):
+    return f"{BEGIN_MARKER}{name}\n{payload}\n{END_MARKER}{name}\n".encode("utf-8")
+
+class RecordingSink(MemorySink):
+    """A `MemorySink` that remembers whether it was closed, committed or aborted."""
+
+    def __init__(self):
+        super().__init__()
+        self.closed = self.committed = self.aborted = False
+
+    def close(self):
+        self.closed = True
+
+    def abort(self):
+        self.aborted = True
+
+    def commit(self):
+        self.committed = True
+
+class FrameReaderTest(unittest.TestCase):
+    def read(self, data, chunk_size):
+        """Feeds `data` to a new `FrameReader` in `chunk_size` pieces; returns (reader, sinks)."""
+        sinks = {}
+        def open_sink(name):
+            sinks[name] = RecordingSink()
+            return sinks[name]
+        reader = FrameReader(open_sink)
+        for i in range(0, len(data), chunk_size):
+            reader.feed(data[i:i + chunk_size])
+        return reader, sinks
+
+    def assert_all_chunkings(self, data, check):
+        """Runs `check(reader, sinks)` for every chunk size, so that every marker
+        (and the newline before it) is split across reads at every offset."""
+        for chunk_size in range(1, len(data) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                check(*self.read(data, chunk_size))
+
+    def test_split_end_sentinels(self):
+        # The payloads contain near misses of the end sequence.
+        a = f"x\n{END_MARKER}b\n{END_MARKER}ab"
+        b = f"{END_MARKER}a\nline\n###"
+        data = frame("a", a) + frame("b", b)
+        def check(reader, sinks):
+            self.assertEqual(list(reader.frames), ["a", "b"])
+            self.assertEqual(sinks["a"].text(), a)
+            self.assertEqual(sinks["b"].text(), b)
+            self.assertTrue(sinks["a"].closed and sinks["b"].closed)
+        self.assert_all_chunkings(data, check)
+
+    def test_empty_payloads(self):
+        data = frame("empty", "") + frame("newline", "\n") + frame("after", "x")
+        def check(reader, sinks):
+            self.assertEqual(list(reader.frames), ["empty", "newline", "after"])
+            self.assertEqual(sinks["empty"].text(), "")
+            self.assertEqual(sinks["newline"].text(), "\n")
+            self.assertEqual(sinks["after"].text(), "x")
+        self.assert_all_chunkings(data, check)
+
+    def test_noise_lines(self):
+        data = (b"Compiling...\n" + frame("a", "1") + b"warning: unused\r\n"
+                + BEGIN_MARKER[:-1].encode("utf-8") + b"\n" + frame("b", "2") + b"Done\n")
+        def check(reader, sinks):
+            self.assertEqual({name: sink.text() for name, sink in sinks.items()}, {"a": "1", "b": "2"})
+            self.assertEqual(reader.output(), f"Compiling...\nwarning: unused\n{BEGIN_MARKER[:-1]}\nDone\n")
+        self.assert_all_chunkings(data, check)
+
+    def test_truncated_final_frame(self):
+        data = frame("a", "done") + f"{BEGIN_MARKER}b\npartial\n{END_MARKER}".encode("utf-8")
+        def check(reader, sinks):
+            self.assertEqual(list(reader.frames), ["a"])
+            self.assertEqual(reader.commit(), ["a"])
+            self.assertTrue(sinks["a"].committed)
+            self.assertFalse(sinks["b"].committed)
+            self.assertTrue(sinks["b"].aborted)
+            # Bytes that might begin the end sequence are held back.
+            self.assertEqual(sinks["b"].text(), "partial")
+        self.assert_all_chunkings(data, check)
+
+    def test_abort(self):
+        reader, sinks = self.read(frame("a", "1") + f"{BEGIN_MARKER}b\n".encode("utf-8"), 7)
+        reader.abort()
+        self.assertTrue(sinks["a"].aborted and sinks["b"].aborted)
+        self.assertEqual(reader.commit(), [])
+
+if __name__ == "__main__":
+    unittest.main()
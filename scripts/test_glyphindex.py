@@ -0,0 +1,61 @@
+"""Tests of the glyph index sidecars (`glyphindex.py`)."""
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+
+import glyphindex
+from test_textpath import load_goldens
+
+class GlyphIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.font, _ = load_goldens()
+        self.outdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.outdir, ignore_errors=True)
+
+    def payloads(self):
+        return sorted(os.path.basename(p) for p in glyphindex.payload_paths(self.outdir, "nullpointer"))
+
+    def test_round_trip_decodes_only_requested_blocks(self):
+        glyphindex.write_glyph_index(self.font, self.outdir, "nullpointer", block_glyphs=2)
+        self.assertTrue(glyphindex.has_glyph_index(self.outdir, "nullpointer"))
+        lazy = glyphindex.load_font_lazy(self.outdir, "nullpointer")
+        self.assertEqual({key: lazy[key] for key in glyphindex.METRICS},
+                         {key: self.font[key] for key in glyphindex.METRICS})
+        glyphs = lazy["glyphs"]
+        self.assertEqual(sorted(glyphs), ["A", "B", "C"])
+        self.assertEqual(glyphs["C"], self.font["glyphs"]["C"])
+        self.assertEqual(sorted(glyphs.decoded), [1])
+        self.assertEqual(glyphs.get("A"), self.font["glyphs"]["A"])
+        self.assertEqual(sorted(glyphs.decoded), [0, 1])
+        self.assertIsNone(glyphs.get("X"))
+        self.assertNotIn("X", glyphs)
+
+    def test_rewrite_switches_payload_and_keeps_the_previous_one(self):
+        glyphindex.write_glyph_index(self.font, self.outdir, "nullpointer")
+        first = self.payloads()
+        changed = copy.deepcopy(self.font)
+        for i, xmax in enumerate([1.0, 2.0]):
+            changed["glyphs"]["A"]["xmax"] = xmax
+            glyphindex.write_glyph_index(changed, self.outdir, "nullpointer")
+            self.assertEqual(glyphindex.load_font_lazy(self.outdir, "nullpointer")["glyphs"]["A"]["xmax"], xmax)
+            if i == 0:
+                second = self.payloads()
+        # Only the current payload and the one before it are kept.
+        self.assertEqual(len(second), 2)
+        self.assertTrue(set(first) < set(second))
+        self.assertEqual(len(self.payloads()), 2)
+        self.assertNotIn(first[0], self.payloads())
+
+    def test_missing_payload_and_removal(self):
+        glyphindex.write_glyph_index(self.font, self.outdir, "nullpointer")
+        for path in glyphindex.payload_paths(self.outdir, "nullpointer"):
+            os.remove(path)
+        self.assertFalse(glyphindex.has_glyph_index(self.outdir, "nullpointer"))
+        glyphindex.write_glyph_index(self.font, self.outdir, "nullpointer")
+        glyphindex.remove_glyph_index(self.outdir, "nullpointer")
+        self.assertEqual(os.listdir(self.outdir), [])
+
+if __name__ == "__main__":
+    unittest.main()
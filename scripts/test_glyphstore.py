@@ -0,0 +1,83 @@
+"""Tests of the shared glyph store (`glyphstore.py`)."""
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+
+import glyphstore
+from glyphstore import ShardCache, load_store_font, store_is_current, write_glyph_store, write_json_gz
+from test_textpath import load_goldens
+
+FONT_NAMES = ["nullpointer", "nullpointer_bold"]
+
+class GlyphStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.outdir, ignore_errors=True)
+        font, _ = load_goldens()
+        # The variant only changes "B", so it shares "A" and "C".
+        bold = copy.deepcopy(font)
+        bold["id"] = "nullpointer_bold"
+        bold["glyphs"]["B"]["xmax"] = 999.0
+        self.fonts = {"nullpointer": font, "nullpointer_bold": bold}
+        for name, f in self.fonts.items():
+            self.write_font(name, f)
+
+    def write_font(self, name, font):
+        write_json_gz(font, os.path.join(self.outdir, f"{name}.json.gz"), 6)
+
+    def store_entries(self):
+        return sorted(os.listdir(os.path.join(self.outdir, glyphstore.STORE_DIR)))
+
+    def assert_loads(self):
+        for name, font in self.fonts.items():
+            with self.subTest(name):
+                self.assertEqual(load_store_font(self.outdir, name, ShardCache()), font)
+
+    def test_write_then_load(self):
+        self.assertEqual(write_glyph_store(self.outdir, FONT_NAMES), (2, 6, 4))
+        self.assertFalse(any(name.endswith(".json.gz") and glyphstore.TABLE_SUFFIX not in name
+                             for name in os.listdir(self.outdir)))
+        self.assertTrue(store_is_current(self.outdir, FONT_NAMES))
+        self.assertFalse(store_is_current(self.outdir, FONT_NAMES[:1]))
+        version = glyphstore.read_store_index(self.outdir)["version"]
+        self.assertEqual(self.store_entries(), [version, glyphstore.STORE_INDEX])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.outdir, glyphstore.STORE_DIR, version))),
+                         ["nullpointer.json.gz", "nullpointer_bold.json.gz"])
+        self.assert_loads()
+
+    def test_version_bump_keeps_the_previous_version(self):
+        write_glyph_store(self.outdir, FONT_NAMES)
+        first = glyphstore.read_store_index(self.outdir)["version"]
+        old_table = glyphstore.read_json_gz(os.path.join(self.outdir, "nullpointer_bold" + glyphstore.TABLE_SUFFIX))
+
+        self.fonts["nullpointer_bold"]["glyphs"]["C"]["xmax"] = 1.0
+        self.write_font("nullpointer_bold", self.fonts["nullpointer_bold"])
+        self.assertFalse(store_is_current(self.outdir, FONT_NAMES))
+        self.assertEqual(write_glyph_store(self.outdir, FONT_NAMES), (2, 6, 5))
+        second = glyphstore.read_store_index(self.outdir)["version"]
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.store_entries(), sorted([first, second, glyphstore.STORE_INDEX]))
+        self.assert_loads()
+        # A reader holding the old table still finds its glyphs.
+        for shard in old_table["shards"]:
+            self.assertTrue(os.path.exists(os.path.join(self.outdir, glyphstore.STORE_DIR, first, f"{shard}.json.gz")))
+
+        self.fonts["nullpointer_bold"] = copy.deepcopy(self.fonts["nullpointer"])
+        self.fonts["nullpointer_bold"]["id"] = "nullpointer_bold"
+        self.write_font("nullpointer_bold", self.fonts["nullpointer_bold"])
+        write_glyph_store(self.outdir, FONT_NAMES)
+        third = glyphstore.read_store_index(self.outdir)["version"]
+        self.assertEqual(self.store_entries(), sorted([second, third, glyphstore.STORE_INDEX]))
+        self.assert_loads()
+
+    def test_missing_glyph_is_reported(self):
+        write_glyph_store(self.outdir, FONT_NAMES)
+        version = glyphstore.read_store_index(self.outdir)["version"]
+        os.remove(os.path.join(self.outdir, glyphstore.STORE_DIR, version, "nullpointer_bold.json.gz"))
+        with self.assertRaises(glyphstore.GlyphStoreError):
+            load_store_font(self.outdir, "nullpointer_bold", ShardCache())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Tests of the subprocess job runner (`jobrunner.JobRunner`), driving small Python children."""
+import asyncio
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import unittest
+
+from framing import BEGIN_MARKER, END_MARKER, MemorySink
+from jobrunner import JobRunner, JobTimeout, is_transient
+
+# Prints frame "out" with payload "attempt N"; the attempt count is kept in the
+# file given as argv[1]. Fails with argv[3] on stderr and exit status argv[2]
+# until attempt argv[4] (argv[4] == 0: always).
+CHILD = f"""
+import sys
+path, status, stderr, succeed_at = sys.argv[1], int(sys.argv[2]), sys.argv[3], int(sys.argv[4])
+try:
+    with open(path) as f:
+        attempt = int(f.read()) + 1
+except OSError:
+    attempt = 1
+with open(path, "w") as f:
+    f.write(str(attempt))
+print("Compiling...")
+print("{BEGIN_MARKER}out")
+print("attempt", attempt)
+print("{END_MARKER}out")
+if succeed_at == 0 or attempt < succeed_at:
+    sys.stderr.write(stderr)
+    sys.exit(status)
+"""
+
+class RecordingSink(MemorySink):
+    def __init__(self):
+        super().__init__()
+        self.committed = self.aborted = False
+
+    def abort(self):
+        self.aborted = True
+
+    def commit(self):
+        self.committed = True
+
+class JobRunnerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.count_path = os.path.join(self.dir, "attempts")
+        self.sinks = []
+
+    def open_sink(self, name):
+        self.sinks.append(RecordingSink())
+        return self.sinks[-1]
+
+    def attempts(self):
+        with open(self.count_path) as f:
+            return int(f.read())
+
+    def run_child(self, status, stderr, succeed_at, **runner_options):
+        cmd = [sys.executable, "-c", CHILD, self.count_path, str(status), stderr, str(succeed_at)]
+        async def run():
+            return await JobRunner(backoff=0.01, **runner_options).run_framed(cmd, self.open_sink, compiles=False)
+        return asyncio.run(run())
+
+    def test_is_transient(self):
+        self.assertTrue(is_transient(-signal.SIGKILL, ""))
+        self.assertTrue(is_transient(1, "open: Too many open files\n"))
+        self.assertFalse(is_transient(1, "error: type mismatch\n"))
+        self.assertFalse(is_transient(-signal.SIGTERM, ""))
+
+    def test_success(self):
+        returncode, reader, stderr = self.run_child(1, "", 1)
+        self.assertEqual((returncode, stderr), (0, ""))
+        self.assertEqual(reader.commit(), ["out"])
+        self.assertEqual(self.sinks[0].text(), "attempt 1")
+        self.assertEqual(reader.output(), "Compiling...\n")
+
+    def test_transient_failure_is_retried(self):
+        returncode, reader, stderr = self.run_child(1, "fork: Resource temporarily unavailable\n", 3, retries=2)
+        self.assertEqual(returncode, 0)
+        self.assertEqual(self.attempts(), 3)
+        self.assertEqual([sink.text() for sink in self.sinks], ["attempt 1", "attempt 2", "attempt 3"])
+        # The outputs of the failed attempts are dropped.
+        self.assertEqual([sink.aborted for sink in self.sinks], [True, True, False])
+        self.assertEqual(reader.commit(), ["out"])
+        self.assertTrue(self.sinks[-1].committed)
+
+    def test_retries_are_bounded(self):
+        returncode, _, stderr = self.run_child(1, "Text file busy\n", 0, retries=1)
+        self.assertEqual(returncode, 1)
+        self.assertEqual(stderr, "Text file busy\n")
+        self.assertEqual(self.attempts(), 2)
+
+    def test_nonzero_exit_is_reported(self):
+        returncode, reader, stderr = self.run_child(3, "error: boom\n", 0, retries=2)
+        self.assertEqual((returncode, stderr), (3, "error: boom\n"))
+        # Not transient: no retry; the caller decides what to do with the frames.
+        self.assertEqual(self.attempts(), 1)
+        self.assertEqual(list(reader.frames), ["out"])
+        reader.abort()
+        self.assertTrue(self.sinks[0].aborted)
+
+    def test_timeout_kills_the_program(self):
+        # The child starts a frame, then sleeps in a grandchild of its own.
+        code = (f"import subprocess, sys; print({BEGIN_MARKER!r} + 'out'); print('partial', flush=True); "
+                "subprocess.run([sys.executable, '-c', 'import time; time.sleep(60)'])")
+        async def run():
+            return await JobRunner(timeout=0.5).run_framed([sys.executable, "-c", code], self.open_sink)
+        start = time.monotonic()
+        with self.assertRaises(JobTimeout):
+            asyncio.run(run())
+        self.assertLess(time.monotonic() - start, 30)
+        self.assertEqual(len(self.sinks), 1)
+        self.assertTrue(self.sinks[0].aborted)
+        self.assertFalse(self.sinks[0].committed)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Tests of the SVG path tokenizing and rewriting of `pathcodec.py`."""
+import unittest
+
+from pathcodec import optimize_glyph, optimize_path, path_bbox, split_path, split_segments
+from test_textpath import load_goldens
+
+# Curves with fractional coordinates, implicit repeats and several subpaths.
+CURVES = ("M10.123456 20.987654L30.5 40.25 50.75 -60.125Q70.33 80.66 90.99 100.01"
+          "C110.4 120.6 130.2 140.8 150.5 160.5 170.25 180.75 190.125 200.875 210.0625 220.9375Z"
+          "M-5.55 -6.66L-7.77 -8.88Z")
+
+def points(cmds):
+    """Returns the x,y pairs of absolute `cmds`, one segment per command."""
+    return [(c, params) for c, params in split_segments(cmds)]
+
+class SplitPathTest(unittest.TestCase):
+    def test_absolute_commands_are_kept_as_written(self):
+        d = "M0 0 5 5L1 2 3 4C1 1 2 2 3 3 4 4 5 5 6 6Z"
+        self.assertEqual(split_path(d), [
+            ('M', [0.0, 0.0, 5.0, 5.0]),
+            ('L', [1.0, 2.0, 3.0, 4.0]),
+            ('C', [1.0, 1.0, 2.0, 2.0, 3.0, 3.0, 4.0, 4.0, 5.0, 5.0, 6.0, 6.0]),
+            ('Z', []),
+        ])
+
+    def test_relative_commands_are_resolved(self):
+        d = "M10 10q5 10 10 0 5-10 10 0c1 2 3 4 5 6L0 0 1 1zl2 2"
+        self.assertEqual(split_path(d), [
+            ('M', [10.0, 10.0]),
+            ('Q', [15.0, 20.0, 20.0, 10.0]),
+            ('Q', [25.0, 0.0, 30.0, 10.0]),
+            ('C', [31.0, 12.0, 33.0, 14.0, 35.0, 16.0]),
+            ('L', [0.0, 0.0, 1.0, 1.0]),
+            ('Z', []),
+            ('L', [12.0, 12.0]),
+        ])
+
+    def test_split_segments(self):
+        self.assertEqual(list(split_segments(split_path("M0 0 5 5L1 2 3 4Z"))), [
+            ('M', [0.0, 0.0]), ('L', [5.0, 5.0]), ('L', [1.0, 2.0]), ('L', [3.0, 4.0]), ('Z', []),
+        ])
+
+class OptimizePathTest(unittest.TestCase):
+    def paths(self):
+        font, _ = load_goldens()
+        return [g["d"] for g in font["glyphs"].values()] + [CURVES]
+
+    def assert_within(self, d, new_d, limit):
+        want, got = points(split_path(d)), points(split_path(new_d))
+        self.assertEqual([c for c, _ in got], [c for c, _ in want])
+        for (_, a), (_, b) in zip(got, want):
+            for u, v in zip(a, b):
+                self.assertLessEqual(abs(u - v), limit + 1e-9)
+        for u, v in zip(path_bbox(split_path(new_d)), path_bbox(split_path(d))):
+            self.assertLessEqual(abs(u - v), limit + 1e-9)
+
+    def test_default_precision_is_lossless(self):
+        for d in self.paths():
+            for relative in (False, True):
+                with self.subTest(d=d[:20], relative=relative):
+                    new_d, rounded = optimize_path(d, relative=relative)
+                    self.assert_within(d, new_d, 1e-6)
+                    got, want = points(split_path(new_d)), points(rounded)
+                    self.assertEqual([c for c, _ in got], [c for c, _ in want])
+                    for (_, a), (_, b) in zip(got, want):
+                        for u, v in zip(a, b):
+                            self.assertAlmostEqual(u, v, places=9)
+
+    def test_precision_and_relative_stay_within_tolerance(self):
+        for precision in (0.01, 0.5, 1, 10):
+            for relative in (False, True):
+                for d in self.paths():
+                    with self.subTest(precision=precision, relative=relative, d=d[:20]):
+                        new_d, rounded = optimize_path(d, precision=precision, relative=relative)
+                        self.assert_within(d, new_d, precision / 2)
+                        if relative:
+                            self.assertEqual(new_d[0], 'M')
+                            self.assertFalse(any(ch in new_d for ch in "LCQZ"))
+
+    def test_relative_is_shorter(self):
+        for d in self.paths():
+            self.assertLess(len(optimize_path(d, precision=1, relative=True)[0]), len(d))
+
+    def test_optimize_glyph_checks_the_tolerance(self):
+        glyph = {"char": "x", "horiz_adv_x": 0.0, "gerber_lp": "dd", "d": CURVES,
+                 "xmin": -7.77, "ymin": -60.125, "xmax": 210.0625, "ymax": 220.9375}
+        new = optimize_glyph(glyph, precision=1)
+        self.assertIsNotNone(new)
+        for key, v in zip(["xmin", "ymin", "xmax", "ymax"], path_bbox(split_path(new["d"]))):
+            self.assertAlmostEqual(new[key], v, places=6)
+        # Rounding to a grid of 10 units moves the box by more than 1 unit.
+        self.assertIsNone(optimize_glyph(glyph, precision=10, tolerance=1))
+
+if __name__ == "__main__":
+    unittest.main()
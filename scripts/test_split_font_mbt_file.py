@@ -0,0 +1,116 @@
+"""Tests of the part planning of `split-font-mbt-file.py`."""
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+spec = importlib.util.spec_from_file_location(
+    "split_font_mbt_file", os.path.join(os.path.dirname(os.path.abspath(__file__)), "split-font-mbt-file.py"))
+split_font_mbt_file = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(split_font_mbt_file)
+
+SplitError = split_font_mbt_file.SplitError
+free_part_numbers = split_font_mbt_file.free_part_numbers
+plan_parts = split_font_mbt_file.plan_parts
+split_font_mbt = split_font_mbt_file.split_font_mbt
+
+def make_blocks(sizes, lines=None):
+    """Returns glyph blocks (key, start, end, line count) of the given byte sizes."""
+    blocks = []
+    pos = 0
+    for i, size in enumerate(sizes):
+        blocks.append((f"g{i}", pos, pos + size, lines[i] if lines else 1))
+        pos += size
+    return blocks
+
+def part_bytes(part):
+    return sum(end - start for _, start, end, _ in part)
+
+class PlanPartsTest(unittest.TestCase):
+    def test_balanced_parts(self):
+        for sizes, min_parts, want_parts, max_spread in [
+            ([10] * 12, 2, 2, 0),
+            ([10] * 12, 3, 3, 0),
+            ([10] * 12, 5, 5, 10),  # 12 blocks in 5 parts: 2 or 3 blocks each
+            ([100, 1, 1, 1, 1, 1, 1, 1, 1, 100], 2, 2, 0),
+            ([5, 50, 5, 5, 50, 5, 5, 50, 5], 3, 3, 0),
+            ([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 4, 4, 10),
+            ([10] * 3, 8, 3, 0),  # never more parts than blocks
+        ]:
+            with self.subTest(sizes=sizes, min_parts=min_parts):
+                blocks = make_blocks(sizes)
+                parts = plan_parts(blocks, min_parts, 0, 0, 0)
+                self.assertEqual(len(parts), want_parts)
+                # The blocks keep their order.
+                self.assertEqual([b for part in parts for b in part], blocks)
+                # A part is off the ideal size by less than a block.
+                sizes_out = [part_bytes(part) for part in parts]
+                self.assertLessEqual(max(sizes_out) - min(sizes_out), max_spread)
+                self.assertLess(max(sizes_out) - sum(sizes) / want_parts, max(sizes))
+
+    def test_line_budget(self):
+        # 100 lines in 10 blocks; 20 lines per part once the 5 lines of overhead are taken.
+        blocks = make_blocks([10] * 10, [10] * 10)
+        parts = plan_parts(blocks, 2, 25, 0, 5)
+        self.assertEqual(len(parts), 5)
+        parts = plan_parts(blocks, 2, 45, 0, 5)
+        self.assertEqual(len(parts), 3)
+        for part in parts:
+            self.assertLessEqual(5 + sum(b[3] for b in part), 45)
+
+    def test_byte_budget(self):
+        blocks = make_blocks([30, 10, 10, 30, 10, 10])
+        parts = plan_parts(blocks, 1, 0, 40, 0)
+        self.assertTrue(all(part_bytes(part) <= 40 for part in parts))
+        # Splitting at byte midpoints may take one part more than the lower bound.
+        self.assertIn(len(parts), (3, 4))
+
+    def test_single_glyph_over_budget(self):
+        with self.assertRaises(SplitError):
+            plan_parts(make_blocks([10, 50, 10]), 2, 0, 40, 0)
+        with self.assertRaises(SplitError):
+            plan_parts(make_blocks([10, 10], [3, 30]), 2, 20, 0, 0)
+
+class FreePartNumbersTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def touch(self, *names):
+        for name in names:
+            open(os.path.join(self.dir, name), "w").close()
+
+    def test_free_part_numbers(self):
+        for existing, count, want in [
+            ([], 2, [1, 2]),
+            (["part1.mbt", "part2.mbt"], 2, [3, 4]),
+            # Numbers below the highest one are not reused, even if free.
+            (["part3.mbt"], 3, [4, 5, 6]),
+            (["part1.mbt", "part10.mbt"], 1, [11]),
+            # Only `partN.mbt` files count.
+            (["part7.mbt.bak", "partx.mbt", "part9.txt", "font.mbt"], 1, [1]),
+        ]:
+            with self.subTest(existing=existing):
+                for name in os.listdir(self.dir):
+                    os.remove(os.path.join(self.dir, name))
+                self.touch(*existing)
+                self.assertEqual(free_part_numbers(self.dir, count), want)
+
+    def test_second_split_does_not_overwrite_parts(self):
+        glyphs = "".join(f'  "{c}": {{\n    d: "M0 0Z",\n  }},\n' for c in "ABCD")
+        source = ("package gmlewis/fonts/test\n\n///|\nlet glyphs : Map[String, @fonts.Glyph] = {\n"
+                  + glyphs + "}\n\n///|\npub let font : @fonts.Font = { glyphs, }\n")
+        paths = [os.path.join(self.dir, name) for name in ["a.mbt", "b.mbt"]]
+        for path in paths:
+            with open(path, "w") as f:
+                f.write(source)
+        self.assertEqual(split_font_mbt(paths[0]), ["part1.mbt", "part2.mbt"])
+        self.assertEqual(split_font_mbt(paths[1]), ["part3.mbt", "part4.mbt"])
+        with open(paths[1]) as f:
+            self.assertIn('"A": part3["A"]', f.read())
+        with open(os.path.join(self.dir, "part1.mbt")) as f:
+            self.assertIn("let part1 :", f.read())
+
+if __name__ == "__main__":
+    unittest.main()
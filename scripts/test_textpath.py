@@ -0,0 +1,96 @@
+"""Parity tests of the pure-Python engine (`textpath.py`) against the MoonBit goldens.
+
+The `nullpointer` font and the `test_cases` of `gen-path_test.mbt` are read
+from the MoonBit test itself, so both engines are held to the same expected
+paths. Run with `python3 -m unittest discover -s scripts`.
+"""
+import os
+import re
+import unittest
+
+import textpath
+from pathcodec import decode_glyph, encode_glyph, mbt_num, path_bbox, split_path
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gen-path_test.mbt")
+
+GLYPH_RE = re.compile(
+    r'"(?P<key>[^"]+)": \{\s*char: "(?P<char>[^"]+)",\s*horiz_adv_x: (?P<horiz_adv_x>[-0-9.]+),\s*'
+    r'gerber_lp: "(?P<gerber_lp>[^"]*)",\s*d: "(?P<d>[^"]*)",\s*xmin: (?P<xmin>[-0-9.]+),\s*'
+    r'ymin: (?P<ymin>[-0-9.]+),\s*xmax: (?P<xmax>[-0-9.]+),\s*ymax: (?P<ymax>[-0-9.]+),\s*\}')
+FONT_RE = re.compile(
+    r'let nullpointer : Font = \{\s*id: "(?P<id>[^"]+)",\s*horiz_adv_x: (?P<horiz_adv_x>[-0-9.]+),\s*'
+    r'units_per_em: (?P<units_per_em>[-0-9.]+),\s*ascent: (?P<ascent>[-0-9.]+),\s*descent: (?P<descent>[-0-9.]+),')
+CASE_RE = re.compile(
+    r'name: "(?P<name>[^"]+)",\s*alignment: (?P<alignment>[A-Za-z]+(?:\([-0-9., ]+\))?),\s*'
+    r'y_up: (?P<y_up>true|false),\s*want_d: "(?P<want_d>[^"]*)",')
+RATIO_RE = re.compile(r"RatioXY\(([-0-9.]+), ([-0-9.]+)\)")
+
+# The text of the golden test cases.
+GOLDEN_TEXT = "ABC\nBC\rC"
+
+def parse_alignment(alignment):
+    m = RATIO_RE.fullmatch(alignment)
+    return ("RatioXY", float(m.group(1)), float(m.group(2))) if m else alignment
+
+def load_goldens(path=GOLDEN_PATH):
+    """Returns (font, [test case dicts]) parsed from `gen-path_test.mbt`."""
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    glyphs = {}
+    for m in GLYPH_RE.finditer(source):
+        glyph = {key: float(m.group(key)) for key in ("horiz_adv_x", "xmin", "ymin", "xmax", "ymax")}
+        glyph.update(char=m.group("char"), gerber_lp=m.group("gerber_lp"), d=m.group("d"))
+        glyphs[m.group("key")] = glyph
+    m = FONT_RE.search(source)
+    font = {key: float(m.group(key)) for key in ("horiz_adv_x", "units_per_em", "ascent", "descent")}
+    font.update(id=m.group("id"), glyphs=glyphs)
+    if len(GLYPH_RE.findall(source)) != source.count("gerber_lp:") or source.count("want_d:") == 0:
+        raise ValueError(f"could not parse the goldens of {path}")
+    cases = [{"name": m.group("name"), "alignment": parse_alignment(m.group("alignment")),
+              "y_up": m.group("y_up") == "true", "want_d": m.group("want_d")}
+             for m in CASE_RE.finditer(source)]
+    if len(cases) != source.count("want_d:"):
+        raise ValueError(f"could not parse the test cases of {path}")
+    return font, cases
+
+def bbox_string(xmin, ymin, xmax, ymax):
+    return " ".join(mbt_num(v) for v in (xmin, ymin, xmax, ymax))
+
+class GenPathParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.font, cls.cases = load_goldens()
+
+    def test_goldens_parsed(self):
+        self.assertEqual(sorted(self.font["glyphs"]), ["A", "B", "C"])
+        self.assertEqual({tc["y_up"] for tc in self.cases}, {False, True})
+
+    def test_gen_path_matches_goldens(self):
+        for tc in self.cases:
+            with self.subTest(tc["name"]):
+                got = textpath.gen_path(self.font, GOLDEN_TEXT, tc["alignment"], tc["y_up"])
+                self.assertEqual(got["d"], tc["want_d"])
+                self.assertEqual(got["gerber_lp"], "dcdcddcdd")
+                self.assertEqual(got["char"], GOLDEN_TEXT)
+                want_bbox = bbox_string(*path_bbox(split_path(tc["want_d"])))
+                self.assertEqual(bbox_string(got["xmin"], got["ymin"], got["xmax"], got["ymax"]), want_bbox)
+
+    def test_packed_gen_path_matches_goldens(self):
+        packed = dict(self.font, glyphs={c: decode_glyph(encode_glyph(g)) for c, g in self.font["glyphs"].items()})
+        for tc in self.cases:
+            with self.subTest(tc["name"]):
+                got = textpath.gen_path(packed, GOLDEN_TEXT, tc["alignment"], tc["y_up"])
+                want = textpath.gen_path(self.font, GOLDEN_TEXT, tc["alignment"], tc["y_up"])
+                self.assertEqual(got, want)
+
+    def test_measure_matches_gen_path(self):
+        for tc in self.cases:
+            with self.subTest(tc["name"]):
+                got = textpath.gen_path(self.font, GOLDEN_TEXT, tc["alignment"], tc["y_up"])
+                metrics = textpath.measure(self.font, GOLDEN_TEXT, tc["alignment"], tc["y_up"])
+                self.assertEqual((metrics["lines"], metrics["advance"]), (3, 1620.0))
+                self.assertEqual([metrics[k] for k in ("xmin", "ymin", "xmax", "ymax")],
+                                 [got[k] for k in ("xmin", "ymin", "xmax", "ymax")])
+
+if __name__ == "__main__":
+    unittest.main()
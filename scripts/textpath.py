@@ -0,0 +1,556 @@
+"""Pure-Python text-to-path engine for the compressed fonts in `all-fonts/`.
+
+This module reads the `Font`/`Glyph` JSON written by
+`scripts/compress-all-fonts.py` and reproduces the MoonBit pipeline used by
+the renderer without invoking the MoonBit toolchain:
+
+* `Font::gen_path` and `translate_path` (including the `y_up` flip, bbox
+  accumulation and `horiz_adv_x` fallback),
+* `Font::measure` (the same bbox from the glyph metrics alone),
+* `@draw.text` (conversion of the super-glyph to scaled compound paths),
+* `@draw.column`, `Graphic::with_margin`, `Graphic::with_background` and
+* `@svg.from_graphic`.
+
+Numbers are formatted the way MoonBit formats a `Double`, so the SVG output
+matches the renderer's output (see `scripts/check-python-engine.py`).
+"""
+import functools
+import gzip
+import json
+import math
+import os
+
+from fontpack import PACK_NAME, FontPack, FontPackError
+from glyphindex import has_glyph_index, load_font_lazy
+from glyphstore import has_store_table, load_store_font
+from pathcodec import PACKED_SUFFIX, FontError, load_packed_font, mbt_num, round_to_fixed, split_path, translate_packed
+
+ALIGN_MAP = {
+    'left': 'CenterLeft',
+    'center': 'Center',
+    'right': 'CenterRight',
+}
+
+def font_dirs(fonts_dir=None):
+    """Returns the directories searched for fonts, in the order `@loader.load_font` uses.
+
+    The search order is `fonts_dir` (if provided), `all-fonts/` relative to the
+    current directory, then `${MOONBIT_FONTS_DIR}/all-fonts/`.
+    """
+    dirs = []
+    if fonts_dir:
+        dirs.append(fonts_dir)
+    dirs.append("all-fonts")
+    env_dir = os.environ.get("MOONBIT_FONTS_DIR")
+    if env_dir:
+        dirs.append(os.path.join(env_dir, "all-fonts"))
+    return dirs
+
+@functools.lru_cache(maxsize=None)
+def open_pack(directory):
+    """Returns the (shared, memory-mapped) `FontPack` in `directory`, or None."""
+    path = os.path.join(directory, PACK_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        return FontPack(path)
+    except FontPackError:
+        return None
+
+def is_newer(path, than):
+    """Returns True if `path` exists and was modified after `than`."""
+    try:
+        return os.path.getmtime(path) > os.path.getmtime(than)
+    except OSError:
+        return False
+
+def find_font_path(font_name, fonts_dir=None):
+    """Returns the path of `{font_name}.json.gz`, searched like `@loader.load_font`."""
+    candidates = [os.path.join(d, f"{font_name}.json.gz") for d in font_dirs(fonts_dir)]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    raise FontError(f"Font '{font_name}' not found. Checked paths: {', '.join(candidates)}")
+
+@functools.lru_cache(maxsize=64)
+def load_font(font_name, fonts_dir=None):
+    """Loads (and caches) a font as the dict produced by `Font::to_json`.
+
+    Within each search directory, a glyph index sidecar (see `glyphindex.py`,
+    only the glyphs that are rendered get decoded) is preferred, then a
+    `{font_name}.packed.json.gz` font of pre-parsed paths (see `pathcodec.py`),
+    then a `fonts.pack` archive (unless the font's `.json.gz` is newer), then
+    the individual `{font_name}.json.gz` file, then a glyph store table (see
+    `glyphstore.py`).
+    """
+    for d in font_dirs(fonts_dir):
+        if has_glyph_index(d, font_name):
+            return load_font_lazy(d, font_name)
+        packed_path = os.path.join(d, font_name + PACKED_SUFFIX)
+        if os.path.exists(packed_path):
+            return load_packed_font(packed_path)
+        path = os.path.join(d, f"{font_name}.json.gz")
+        pack = open_pack(d)
+        if pack is not None and font_name in pack and not is_newer(path, pack.path):
+            return pack.load(font_name)
+        if os.path.exists(path):
+            with gzip.open(path, "rb") as f:
+                return json.load(f)
+        if has_store_table(d, font_name):
+            return load_store_font(d, font_name)
+    raise FontError(f"Font '{font_name}' not found. Checked directories: {', '.join(font_dirs(fonts_dir))}")
+
+def translate_path(d, x, y, invert_y=False):
+    """Port of `translate_path`: moves an SVG path by (x, y), optionally flipping y."""
+    y_scale = -1.0 if invert_y else 1.0
+    out = []
+    for c, params in split_path(d):
+        out.append(c)
+        for index, val in enumerate(params):
+            if index % 2 == 0:
+                if index > 0:
+                    out.append(' ')
+                out.append(mbt_num(x + val))
+            else:
+                out.append(' ')
+                out.append(mbt_num(y + y_scale * val))
+    return "".join(out)
+
+def _mix(a, b, t):
+    return (1.0 - t) * a + t * b
+
+def alignment_offset(alignment, xmin, xmax, topy, boty):
+    """Returns the (dx, dy) that `gen_path` applies for `alignment`."""
+    if isinstance(alignment, tuple):
+        _, rx, ry = alignment
+        return -_mix(xmin, xmax, rx), -_mix(boty, topy, 1.0 - ry)
+    xc = -(xmin + xmax) / 2
+    yc = -(boty + topy) / 2
+    return {
+        'Unchanged': (0.0, 0.0),
+        'TopLeft': (-xmin, -topy),
+        'TopCenter': (xc, -topy),
+        'TopRight': (-xmax, -topy),
+        'CenterLeft': (-xmin, yc),
+        'Center': (xc, yc),
+        'CenterRight': (-xmax, yc),
+        'BaselineLeft': (-xmin, 0.0),
+        'BaselineCenter': (xc, 0.0),
+        'BaselineRight': (-xmax, 0.0),
+        'BottomLeft': (-xmin, -boty),
+        'BottomCenter': (xc, -boty),
+        'BottomRight': (-xmax, -boty),
+    }[alignment]
+
+def place_glyph(glyph, x, y, y_up, offset=None):
+    """Returns the path of `glyph` moved to (x, y), then by the alignment `offset`.
+
+    A packed glyph (see `pathcodec.py`) is moved in one pass over its numbers;
+    the `d` of any other glyph is re-tokenized for each move, as `gen_path` does.
+    """
+    if "ops" in glyph:
+        return translate_packed(glyph, x, y, invert_y=not y_up, offset=offset)
+    d = translate_path(glyph["d"], x, y, invert_y=not y_up)
+    return d if offset is None else translate_path(d, *offset)
+
+def gen_path(font, text, alignment='Unchanged', y_up=False):
+    """Port of `Font::gen_path`: renders `text` into a single "super-glyph" dict.
+
+    `alignment` is the name of a `@geom.Alignment` constructor, or
+    `("RatioXY", rx, ry)`.
+    """
+    xmin = ymin = xmax = ymax = 0.0
+    x = y = 0.0
+    y_scale = 1.0 if y_up else -1.0
+    line_advance = font["units_per_em"] - font["descent"]
+    glyphs = font["glyphs"]
+    chars, gerber_lp, placed = [], [], []
+    first = True
+    for c in text:
+        glyph = glyphs.get(c)
+        if glyph is None:
+            chars.append(c)
+            if c == '\n':  # advance line and return to far left
+                x = 0.0
+                y = y - y_scale * line_advance
+            elif c == '\r':  # advance line only
+                y = y - y_scale * line_advance
+            else:  # anything else - advance to the right by default width
+                x = x + font["horiz_adv_x"]
+            continue
+
+        chars.append(glyph["char"])
+        gerber_lp.append(glyph["gerber_lp"])
+        if y_scale < 0:
+            glyph_ymin, glyph_ymax = -glyph["ymax"], -glyph["ymin"]
+        else:
+            glyph_ymin, glyph_ymax = glyph["ymin"], glyph["ymax"]
+        if first:
+            xmin, xmax = glyph["xmin"], glyph["xmax"]
+            ymin, ymax = glyph_ymin, glyph_ymax
+            first = False
+        else:
+            xmin = min(xmin, x + glyph["xmin"])
+            xmax = max(xmax, x + glyph["xmax"])
+            ymin = min(ymin, y + glyph_ymin)
+            ymax = max(ymax, y + glyph_ymax)
+        placed.append((glyph, x, y))
+        if glyph["horiz_adv_x"] > 0.0:
+            x = x + glyph["horiz_adv_x"]
+        else:
+            x = x + font["horiz_adv_x"]
+
+    topy, boty = (ymax, ymin) if y_up else (ymin, ymax)
+    offset = None
+    if alignment != 'Unchanged':
+        offset = alignment_offset(alignment, xmin, xmax, topy, boty)
+        dx, dy = offset
+        xmin += dx
+        ymin += dy
+        xmax += dx
+        ymax += dy
+    d = "".join(place_glyph(glyph, x, y, y_up, offset) for glyph, x, y in placed)
+    return {
+        "char": "".join(chars),
+        "horiz_adv_x": 0.0,
+        "gerber_lp": "".join(gerber_lp),
+        "d": d,
+        "xmin": xmin,
+        "ymin": ymin,
+        "xmax": xmax,
+        "ymax": ymax,
+    }
+
+def measure(font, text, alignment='Unchanged', y_up=False):
+    """Port of `Font::measure`: returns the advance width, line count and bbox of `text`.
+
+    The bbox is the one of `gen_path(font, text, alignment, y_up)`, computed
+    from the glyph metrics alone, without building or translating any path.
+    """
+    xmin = ymin = xmax = ymax = 0.0
+    x = y = advance = 0.0
+    lines = 1 if text else 0
+    y_scale = 1.0 if y_up else -1.0
+    line_advance = font["units_per_em"] - font["descent"]
+    default_adv_x = font["horiz_adv_x"]
+    glyphs = font["glyphs"]
+    first = True
+    for c in text:
+        glyph = glyphs.get(c)
+        if glyph is None:
+            if c == '\n':
+                x = 0.0
+                y = y - y_scale * line_advance
+                lines += 1
+            elif c == '\r':
+                y = y - y_scale * line_advance
+                lines += 1
+            else:
+                x = x + default_adv_x
+        else:
+            if y_scale < 0:
+                glyph_ymin, glyph_ymax = -glyph["ymax"], -glyph["ymin"]
+            else:
+                glyph_ymin, glyph_ymax = glyph["ymin"], glyph["ymax"]
+            if first:
+                xmin, xmax = glyph["xmin"], glyph["xmax"]
+                ymin, ymax = glyph_ymin, glyph_ymax
+                first = False
+            else:
+                xmin = min(xmin, x + glyph["xmin"])
+                xmax = max(xmax, x + glyph["xmax"])
+                ymin = min(ymin, y + glyph_ymin)
+                ymax = max(ymax, y + glyph_ymax)
+            x = x + (glyph["horiz_adv_x"] if glyph["horiz_adv_x"] > 0.0 else default_adv_x)
+        advance = max(advance, x)
+
+    if alignment != 'Unchanged':
+        topy, boty = (ymax, ymin) if y_up else (ymin, ymax)
+        dx, dy = alignment_offset(alignment, xmin, xmax, topy, boty)
+        xmin += dx
+        ymin += dy
+        xmax += dx
+        ymax += dy
+    return {"advance": advance, "lines": lines, "xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax}
+
+class Path:
+    """A `@draw.Path`; each anchor is [x, y, in_x, in_y, out_x, out_y] (handles relative)."""
+    def __init__(self, anchors, closed=False, clear=False, fill=None):
+        self.anchors = anchors
+        self.closed = closed
+        self.clear = clear
+        self.fill = fill
+
+class CompoundPath:
+    """A `@draw.CompoundPath`."""
+    def __init__(self, paths, fill=None):
+        self.paths = paths
+        self.fill = fill
+
+class Group:
+    """A `@draw.Group`."""
+    def __init__(self, items):
+        self.items = items
+
+def glyph_to_compound_path(glyph, xscale, yscale):
+    """Port of `svgpath2compound_path`: converts a glyph into scaled `Path`s."""
+    black, white = "#000000", "#FFFFFF"
+    paths = []
+    anchors = []
+    gerber_lp = glyph["gerber_lp"]
+    gerber_index = 0
+    current_clear = False
+
+    def flush(closed):
+        paths.append(Path(anchors, closed=closed, clear=current_clear, fill=white if current_clear else black))
+
+    for c, params in split_path(glyph["d"]):
+        pts = [(params[i], params[i + 1]) for i in range(0, len(params) - 1, 2)]
+        if c == 'M':
+            if anchors:
+                flush(False)
+                anchors = []
+            if gerber_index >= len(gerber_lp):
+                raise FontError(f"gerber_lp index out of range: index={gerber_index}, length={len(gerber_lp)} for path '{glyph['char']}'")
+            current_clear = gerber_lp[gerber_index] == 'c'
+            gerber_index += 1
+            for px, py in pts:
+                anchors.append([px * xscale, py * yscale, 0.0, 0.0, 0.0, 0.0])
+        elif c == 'L':
+            for px, py in pts:
+                anchors.append([px * xscale, py * yscale, 0.0, 0.0, 0.0, 0.0])
+        elif c == 'C':
+            for i in range(0, len(pts) - 2, 3):
+                if not anchors:
+                    continue
+                (c1x, c1y), (c2x, c2y), (ex, ey) = pts[i], pts[i + 1], pts[i + 2]
+                prev = anchors[-1]
+                prev[4] = c1x * xscale - prev[0]
+                prev[5] = c1y * yscale - prev[1]
+                end_x, end_y = ex * xscale, ey * yscale
+                anchors.append([end_x, end_y, c2x * xscale - end_x, c2y * yscale - end_y, 0.0, 0.0])
+        elif c == 'Q':
+            for i in range(0, len(pts) - 1, 2):
+                if not anchors:
+                    continue
+                (cpx, cpy), (ex, ey) = pts[i], pts[i + 1]
+                prev = anchors[-1]
+                sx, sy = prev[0], prev[1]
+                qx, qy = cpx * xscale, cpy * yscale
+                c1x = (qx - sx) * (2.0 / 3.0) + sx
+                c1y = (qy - sy) * (2.0 / 3.0) + sy
+                prev[4] = c1x - sx
+                prev[5] = c1y - sy
+                end_x, end_y = ex * xscale, ey * yscale
+                c2x = (qx - end_x) * (2.0 / 3.0) + end_x
+                c2y = (qy - end_y) * (2.0 / 3.0) + end_y
+                anchors.append([end_x, end_y, c2x - end_x, c2y - end_y, 0.0, 0.0])
+        elif c == 'Z':
+            if anchors:
+                flush(True)
+                anchors = []
+    if anchors:
+        flush(False)
+    return CompoundPath(paths, fill=black)
+
+def text(font, s, size=1.0, align='left', y_up=False):
+    """Port of `@draw.text`."""
+    alignment = {'left': 'BaselineLeft', 'center': 'BaselineCenter', 'right': 'BaselineRight'}[align]
+    glyph = gen_path(font, s, alignment=alignment, y_up=y_up)
+    scale = size / font["units_per_em"]
+    return glyph_to_compound_path(glyph, scale, scale)
+
+def _segment_extents(p1x, p1y, h1x, h1y, h2x, h2y, p2x, p2y):
+    """Port of `segment_extents` from `draw/path.mbt`."""
+    lx, ly = min(p1x, p2x), min(p1y, p2y)
+    ux, uy = max(p1x, p2x), max(p1y, p2y)
+    d1x = h1x - p1x
+    d1y = h1y - p1y
+    v1x = p1x - h1x * 2 + h2x
+    v1y = p1y - h1y * 2 + h2y
+    v2x = h1x * 3 - h2x * 3 + p2x - p1x
+    v2y = h1y * 3 - h2y * 3 + p2y - p1y
+    d1_is_zero = d1x == 0 and d1y == 0
+
+    def solve(v1, v2, d1, dist):
+        if d1_is_zero:
+            return (-v1 - dist) / v2 if v2 != 0 else math.nan, (-v1 + dist) / v2 if v2 != 0 else math.nan
+        r1 = d1 / (-v1 - dist) if (-v1 - dist) != 0 else math.nan
+        r2 = d1 / (-v1 + dist) if (-v1 + dist) != 0 else math.nan
+        return r1, r2
+
+    dist1 = v1x * v1x - v2x * d1x
+    if dist1 > 0:
+        for a in solve(v1x, v2x, d1x, math.sqrt(dist1)):
+            if 0 < a < 1:
+                s = 1.0 - a
+                v = s * s * s * p1x + s * s * a * h1x * 3 + s * a * a * h2x * 3 + a * a * a * p2x
+                lx, ux = min(lx, v), max(ux, v)
+    dist2 = v1y * v1y - v2y * d1y
+    if dist2 > 0:
+        for s in solve(v1y, v2y, d1y, math.sqrt(dist2)):
+            if 0 < s < 1:
+                a = 1.0 - s
+                v = a * a * a * p1y + a * a * s * h1y * 3 + a * s * s * h2y * 3 + s * s * s * p2y
+                ly, uy = min(ly, v), max(uy, v)
+    return lx, ly, ux, uy
+
+def _path_bbox(path):
+    anchors = path.anchors
+    n = len(anchors)
+    if n == 0:
+        return None
+    if n == 1:
+        return anchors[0][0], anchors[0][1], anchors[0][0], anchors[0][1]
+    bbox = [math.inf, math.inf, -math.inf, -math.inf]
+    pairs = [(anchors[i - 1], anchors[i]) for i in range(1, n)]
+    if path.closed:
+        pairs.append((anchors[-1], anchors[0]))
+    for last, cur in pairs:
+        lx, ly, ux, uy = _segment_extents(
+            last[0], last[1], last[0] + last[4], last[1] + last[5],
+            cur[0] + cur[2], cur[1] + cur[3], cur[0], cur[1])
+        bbox = [min(bbox[0], lx), min(bbox[1], ly), max(bbox[2], ux), max(bbox[3], uy)]
+    return tuple(bbox)
+
+def bounding_box(g):
+    """Returns (xmin, ymin, xmax, ymax) for a `Path`, `CompoundPath` or `Group`, or None."""
+    if isinstance(g, Path):
+        return _path_bbox(g)
+    children = g.paths if isinstance(g, CompoundPath) else g.items
+    bbox = [math.inf, math.inf, -math.inf, -math.inf]
+    for child in children:
+        b = bounding_box(child)
+        if b is None:
+            continue
+        bbox = [min(bbox[0], b[0]), min(bbox[1], b[1]), max(bbox[2], b[2]), max(bbox[3], b[3])]
+    if any(math.isinf(v) for v in bbox):
+        return None
+    return tuple(bbox)
+
+def translate(g, dx, dy):
+    """Returns a copy of `g` translated by (dx, dy)."""
+    if isinstance(g, Path):
+        anchors = [[a[0] + dx, a[1] + dy, a[2], a[3], a[4], a[5]] for a in g.anchors]
+        return Path(anchors, closed=g.closed, clear=g.clear, fill=g.fill)
+    if isinstance(g, CompoundPath):
+        return CompoundPath([translate(p, dx, dy) for p in g.paths], fill=g.fill)
+    return Group([translate(item, dx, dy) for item in g.items])
+
+def column(items, alignment='Center', spacing=0.0):
+    """Port of `@draw.column`."""
+    if not items:
+        return Group([])
+    bboxes = [bounding_box(item) or (0.0, 0.0, 0.0, 0.0) for item in items]
+    min_x = min(b[0] for b in bboxes)
+    max_x = max(b[2] for b in bboxes)
+    current_y = 0.0
+    positioned = []
+    for item, box in zip(items, bboxes):
+        if alignment in ('TopLeft', 'CenterLeft', 'BottomLeft', 'BaselineLeft'):
+            tx = min_x - box[0]
+        elif alignment in ('TopRight', 'CenterRight', 'BottomRight', 'BaselineRight'):
+            tx = max_x - box[2]
+        else:
+            tx = (min_x + max_x) / 2.0 - (box[0] + box[2]) / 2.0
+        ty = current_y - box[3]
+        positioned.append(translate(item, tx, ty))
+        current_y -= (box[3] - box[1]) + spacing
+    return Group(positioned)
+
+def _rect_path(xmin, ymin, xmax, ymax, fill=None):
+    pts = [(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)]
+    return Path([[x, y, 0.0, 0.0, 0.0, 0.0] for x, y in pts], closed=True, fill=fill)
+
+def with_margin(g, top=0.0, right=0.0, bottom=0.0, left=0.0):
+    """Port of `Graphic::with_margin`."""
+    bbox = bounding_box(g)
+    if bbox is None:
+        return g
+    return Group([g, _rect_path(bbox[0] - left, bbox[1] - bottom, bbox[2] + right, bbox[3] + top)])
+
+def with_background(g, fill="#FFFFFF"):
+    """Port of `Graphic::with_background`."""
+    bbox = bounding_box(g)
+    if bbox is None:
+        return g
+    return Group([_rect_path(*bbox, fill=fill), g])
+
+def flip_y(g, height):
+    """Applies the y-flip that `@svg.from_graphic(y_up=true)` uses."""
+    if isinstance(g, Path):
+        anchors = [[a[0], -a[1] + height, a[2], -a[3], a[4], -a[5]] for a in g.anchors]
+        return Path(anchors, closed=g.closed, clear=g.clear, fill=g.fill)
+    if isinstance(g, CompoundPath):
+        return CompoundPath([flip_y(p, height) for p in g.paths], fill=g.fill)
+    return Group([flip_y(item, height) for item in g.items])
+
+def _all_paths(g):
+    if isinstance(g, Group):
+        for item in g.items:
+            yield from _all_paths(item)
+    else:
+        yield g
+
+def _svg_path(path):
+    anchors = path.anchors
+    if len(anchors) < 2:
+        return ""
+    r = lambda v: mbt_num(round_to_fixed(v, 4))
+    cmds = []
+    for index, a in enumerate(anchors):
+        if index == 0:
+            cmds.append(f"M{r(a[0])} {r(a[1])}")
+            continue
+        last = anchors[index - 1]
+        if last[4] == 0 and last[5] == 0 and a[2] == 0 and a[3] == 0:
+            cmds.append(f"L{mbt_num(a[0])} {mbt_num(a[1])}")
+        else:
+            cmds.append(f"C{r(last[4] + last[0])} {r(last[5] + last[1])} {r(a[2] + a[0])} {r(a[3] + a[1])} {r(a[0])} {r(a[1])}")
+    if path.closed:
+        last, a = anchors[-1], anchors[0]
+        if not (last[4] == 0 and last[5] == 0) or not (a[2] == 0 and a[3] == 0):
+            cmds.append(f"C{r(last[4] + last[0])} {r(last[5] + last[1])} {r(a[2] + a[0])} {r(a[3] + a[1])} {r(a[0])} {r(a[1])}")
+        cmds.append("Z")
+    return "".join(cmds)
+
+def from_graphic(g, y_up=True):
+    """Port of `@svg.from_graphic`."""
+    bbox = bounding_box(g)
+    if bbox is None:
+        return "<svg></svg>"
+    if y_up:
+        g = flip_y(g, bbox[3] - bbox[1])
+        bbox = bounding_box(g)
+    min_x, min_y = mbt_num(round_to_fixed(bbox[0], 4)), mbt_num(round_to_fixed(bbox[1], 4))
+    width = mbt_num(round_to_fixed(bbox[2] - bbox[0], 4))
+    height = mbt_num(round_to_fixed(bbox[3] - bbox[1], 4))
+    lines = []
+    for p in _all_paths(g):
+        paths = p.paths if isinstance(p, CompoundPath) else [p]
+        d = "".join(_svg_path(path) for path in paths)
+        fill = f'fill="{p.fill}"' if p.fill else 'fill="none"'
+        lines.append(f'  <path d="{d}" stroke="none" {fill}/>')
+    body = "\n".join(lines)
+    return f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{min_x} {min_y} {width} {height}">\n{body}\n</svg>'
+
+def render_line(line, regular, bold, italic, y_up=False):
+    """Renders one line, choosing the bold/italic font for Markdown-style markers."""
+    font = regular
+    if (line.startswith("**") and line.endswith("**")) or (line.startswith("__") and line.endswith("__")):
+        font, line = bold, line[2:-2]
+    elif (line.startswith("*") and line.endswith("*")) or (line.startswith("_") and line.endswith("_")):
+        font, line = italic, line[1:-1]
+    try:
+        return text(font, line, y_up=y_up)
+    except FontError:
+        return Group([])
+
+def render_svg(lines, regular, bold=None, italic=None, align='left', y_up=False):
+    """Renders lines of text to an SVG string, like `renderer --format svg`."""
+    bold = bold or regular
+    italic = italic or regular
+    graphics = [render_line(line, regular, bold, italic, y_up) for line in lines]
+    scene = column(graphics, alignment=ALIGN_MAP[align], spacing=0.2)
+    scene = with_background(with_margin(scene, top=0.1, right=0.1, bottom=0.1, left=0.1))
+    return from_graphic(scene, y_up=y_up)
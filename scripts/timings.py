@@ -0,0 +1,158 @@
+"""Phase timings of the scripts' jobs, exported as a JSON summary or a Chrome trace.
+
+Each job (a batch of `compress-all-fonts.py`, a page of `sample-all-fonts.py`,
+a render) records the wall-clock spans of its phases:
+
+    generate   writing the generated MoonBit project into its workspace
+    build      `moon run` until the program prints its first frame: dependency
+               resolution and compilation (both happen inside `moon`)
+    run        the program, from its first frame until it exits
+    sidecars   path rewriting (`--precision`/`--relative`) and the glyph index /
+               packed path files written after a font is compressed
+
+plus the time spent, while the program's output streams in, on
+
+    extract    splitting stdout into frames (`framing.FrameReader`)
+    compress   gzip compression of the frames (`framing.FileSink`)
+    write      writing and committing the outputs
+
+`--timings FILE` writes a JSON summary (totals per phase and per job) and
+`--trace FILE` a Chrome trace-event file that can be opened in
+chrome://tracing or https://ui.perfetto.dev; `--debug` prints the summary.
+"""
+import atexit
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+PHASES = ["generate", "build", "run", "sidecars", "extract", "compress", "write"]
+
+class Timings:
+    """Records phase spans and accumulated phase times, per job."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def now(self):
+        return time.perf_counter()
+
+    def record(self, job, phase, start, end, **args):
+        """Records the span [start, end] (`perf_counter` times) of `phase` for `job`."""
+        with self.lock:
+            self.spans.append((job, phase, start, end, args))
+            self.add_locked(job, phase, end - start)
+
+    @contextlib.contextmanager
+    def span(self, job, phase, **args):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.record(job, phase, start, self.now(), **args)
+
+    def add(self, job, phase, seconds):
+        """Adds `seconds` to `phase` of `job` without a span (time spread over a run)."""
+        with self.lock:
+            self.add_locked(job, phase, seconds)
+
+    def add_locked(self, job, phase, seconds):
+        phases = self.totals.setdefault(job, {})
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+    def timer(self, job):
+        """Returns a `timer(phase, seconds)` callable that accumulates into `job`."""
+        return lambda phase, seconds: self.add(job, phase, seconds)
+
+    def summary(self):
+        """Returns {"total_seconds", "phases": {phase: {seconds, jobs, max}}, "jobs": {job: {phase: seconds}}}."""
+        with self.lock:
+            totals = {job: dict(phases) for job, phases in self.totals.items()}
+        phases = {}
+        for job_phases in totals.values():
+            for phase, seconds in job_phases.items():
+                entry = phases.setdefault(phase, {"seconds": 0.0, "jobs": 0, "max": 0.0})
+                entry["seconds"] += seconds
+                entry["jobs"] += 1
+                entry["max"] = max(entry["max"], seconds)
+        order = {phase: i for i, phase in enumerate(PHASES)}
+        return {
+            "total_seconds": round(self.now() - self.origin, 6),
+            "phases": {phase: {k: round(v, 6) if isinstance(v, float) else v for k, v in phases[phase].items()}
+                       for phase in sorted(phases, key=lambda p: (order.get(p, len(order)), p))},
+            "jobs": {job: {phase: round(seconds, 6) for phase, seconds in job_phases.items()}
+                     for job, job_phases in totals.items()},
+        }
+
+    def trace(self):
+        """Returns the spans as Chrome trace events, one row per concurrently running job."""
+        with self.lock:
+            spans = list(self.spans)
+        extents = {}
+        for job, _, start, end, _ in spans:
+            first, last = extents.get(job, (start, end))
+            extents[job] = (min(first, start), max(last, end))
+        # Jobs that do not overlap share a row.
+        rows, lane_ends = {}, []
+        for job, (start, end) in sorted(extents.items(), key=lambda item: item[1]):
+            for lane, lane_end in enumerate(lane_ends):
+                if lane_end <= start:
+                    break
+            else:
+                lane = len(lane_ends)
+                lane_ends.append(0.0)
+            lane_ends[lane] = end
+            rows[job] = lane + 1
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": os.path.basename(sys.argv[0])}}]
+        for job, phase, start, end, args in spans:
+            events.append({
+                "name": phase,
+                "cat": phase,
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 3),
+                "dur": round((end - start) * 1e6, 3),
+                "pid": pid,
+                "tid": rows[job],
+                "args": dict(args, job=job),
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def report(self, file=sys.stderr):
+        """Prints the per-phase totals."""
+        summary = self.summary()
+        print(f"Total time: {summary['total_seconds']:.2f}s", file=file)
+        for phase, entry in summary["phases"].items():
+            print(f"  {phase:<10} {entry['seconds']:10.2f}s  in {entry['jobs']} jobs (max {entry['max']:.2f}s)", file=file)
+
+    def write(self, summary_path=None, trace_path=None):
+        for path, data in ((summary_path, self.summary), (trace_path, self.trace)):
+            if path:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(data(), f, indent=1 if path == summary_path else None)
+                    f.write("\n")
+
+# The recorder shared by the modules of a script.
+TIMINGS = Timings()
+
+def add_timing_arguments(parser):
+    """Adds the shared --timings/--trace options to an argparse parser."""
+    parser.add_argument("--timings", metavar="FILE", help="Write a JSON summary of the time spent per phase and per job")
+    parser.add_argument("--trace", metavar="FILE", help="Write the phase timings as a Chrome trace-event file (chrome://tracing, ui.perfetto.dev)")
+
+def timing_options(args):
+    """Writes the requested timing outputs (and, with `--debug`, prints the summary) at exit."""
+    debug = getattr(args, "debug", False)
+    if not (args.timings or args.trace or debug):
+        return
+
+    def finish():
+        if debug:
+            TIMINGS.report()
+        TIMINGS.write(args.timings, args.trace)
+    atexit.register(finish)
@@ -8,6 +8,9 @@ fi
 
 moon test --target all
 
+# The pure-Python engine must match the MoonBit goldens:
+python3 -m unittest discover -s scripts
+
 # Ensure that all fonts load without error:
 # export MOONBIT_FONTS_DIR="$(dirname "$(readlink -f "$0")")"
 # pushd tests/load-all-fonts && moon run . && popd